@@ -0,0 +1,302 @@
+"""Time complete search cycles against a local Marketplace-shaped fixture server.
+
+A MarketplaceApp is built in a scratch directory with [Marketplace] base_url pointing at the
+fixture server and SMTP pointing at a local sink. It then runs N full run_search_cycle
+iterations. Each one covers browser startup, navigation, lazy-loaded results, extraction, detail
+page enrichment, dedupe, the database and email delivery. Every cycle after the first sees churn
+new listings.
+
+The first cycle is reported as cold and the rest as warm, along with per-stage latencies. With a
+stored baseline (--update-baseline writes one) the script exits with status 1 if the cold cycle,
+the median warm cycle or any stage's median is slower than the baseline by more than --tolerance.
+
+Usage: python benchmarks/bench_cycle.py [--cycles 5] [--listings 24] [--pages 2] [--churn 0.25]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from bench_pipeline import StageStats, instrument, peak_rss_mb
+from fixtures import make_listing, render_card, render_results_page
+from standins import SMTPSink
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cycle_baseline.json")
+# Smallest valid GIF, served for every thumbnail
+PIXEL_GIF = (b"GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00\x00\x00\x00"
+             b",\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;")
+ITEM_PATH = re.compile(r"^/marketplace/item/([^/]+)/?$")
+
+
+class FixtureServer(ThreadingHTTPServer):
+    """Serves result pages that lazy-load further pages on scroll, item detail pages and thumbnails.
+
+    Every search request starts a new cycle in which churn of the listings are replaced by new ones.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, listings_per_page=24, pages=2, churn=0.25, seed=0):
+        super().__init__(("127.0.0.1", 0), FixtureHandler)
+        self.listings_per_page = listings_per_page
+        self.pages = pages
+        self.churn = churn
+        self.rng = random.Random(seed)
+        self.next_id = 100000000000000
+        self.listings = [self._new_listing() for _ in range(listings_per_page * pages)]
+        self.searches = 0
+        self.lock = threading.Lock()
+
+    def _new_listing(self):
+        listing = make_listing(self.rng, self.next_id)
+        self.next_id += 1
+        return listing
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start_search(self):
+        with self.lock:
+            if self.searches:
+                for index in self.rng.sample(range(len(self.listings)), round(len(self.listings) * self.churn)):
+                    self.listings[index] = self._new_listing()
+            self.searches += 1
+            return list(self.listings)
+
+    def page(self, number):
+        with self.lock:
+            start = number * self.listings_per_page
+            return self.listings[start:start + self.listings_per_page]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        server = self.server
+        image_base_url = f"{server.base_url}/images/"
+
+        if parts.path.endswith("/search"):
+            listings = server.start_search()[:server.listings_per_page]
+            next_page = "/more?page=1" if server.pages > 1 else None
+            self.reply(render_results_page(listings, next_page, image_base_url).encode(), "text/html")
+        elif parts.path == "/more":
+            number = int(parse_qs(parts.query).get('page', ["1"])[0])
+            cards = "\n".join(render_card(listing, image_base_url) for listing in server.page(number))
+            headers = {'X-Next-Page': f"/more?page={number + 1}"} if number + 1 < server.pages else {}
+            self.reply(cards.encode(), "text/html", headers)
+        elif ITEM_PATH.match(parts.path):
+            item_id = ITEM_PATH.match(parts.path).group(1)
+            body = (f"<html><head><meta property='og:description' content='Listing {item_id}'></head><body>"
+                    f"<div>Listed 2 days ago in Vancouver, BC</div>"
+                    f"<a href='/marketplace/profile/{item_id[-4:]}/'>Seller {item_id[-4:]}</a>"
+                    f"<div>Description</div><div>Barely used, pick up only.</div></body></html>")
+            self.reply(body.encode(), "text/html")
+        elif parts.path.startswith("/images/"):
+            self.reply(PIXEL_GIF, "image/gif")
+        else:
+            self.reply(b"not found", "text/plain", status=404)
+
+    def reply(self, body, content_type, headers=None, status=200):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def write_config(directory, base_url, smtp_port):
+    with open(os.path.join(directory, "search_config.ini"), "w") as f:
+        f.write(f"""[Search]
+active = True
+keywords = office chair
+location = vancouver
+min_price = 0
+max_price = 0
+search_radius = 40
+frequency = 15
+email = owner@example.com
+subject_template = Found: {{item_title}} at ${{price}}
+message_template = Found a {{item_title}} selling for ${{price}} in {{location}}. Here's the link: {{url}}
+
+[Marketplace]
+base_url = {base_url}/marketplace/
+
+[SMTP]
+server = 127.0.0.1
+port = {smtp_port}
+security = none
+
+[Outbox]
+batch_size = 200
+poll_interval = 0
+per_recipient_interval = 0
+""")
+    with open(os.path.join(directory, "password.ini"), "w") as f:
+        f.write("[Email]\nsender_email = scraper@example.com\nsender_password = secret\n")
+
+
+async def run(args, stats):
+    import browser
+    from extraction import ExtractionManager
+    from logging_setup import stop_logging
+    from main import MarketplaceApp
+
+    if not args.keep_waits:
+        # The randomised human-like pauses are sleeps, not work; without them regressions stand out
+        async def no_wait(self, min_time=0, max_time=0, reason=None):
+            await asyncio.sleep(0)
+        browser.BrowserManager.random_wait = no_wait
+
+    app = MarketplaceApp()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    browser_manager = app.scraper.browser_manager
+    instrument(stats, "browser.initialize", browser_manager, "initialize")
+    instrument(stats, "browser.close", browser_manager, "close")
+    instrument(stats, "search_marketplace", app.scraper, "search_marketplace")
+    instrument(stats, "extraction", ExtractionManager, "extract_via_multiple_strategies")
+    instrument(stats, "enrichment", app.scraper, "enrich_new_listings", lambda results, *_: len(results))
+    instrument(stats, "process_search_results", app, "process_search_results", lambda results, *_: len(results))
+    instrument(stats, "notify", app.outbox_sender, "drain_once")
+
+    cycle_times = []
+    try:
+        if app.repost_detector:
+            await app.repost_detector.index_missing()
+        if app.image_detector:
+            await app.image_detector.load()
+        if app.price_tracker:
+            await app.price_tracker.load()
+        if app.deal_scorer:
+            await app.deal_scorer.load()
+        if app.scraper.strategy_stats:
+            await app.scraper.strategy_stats.load()
+
+        for cycle in range(args.cycles):
+            start = time.perf_counter()
+            if not await app.run_search_cycle(force=True):
+                raise RuntimeError(f"Search cycle {cycle + 1} failed; see marketplace_scraper.log in the scratch directory")
+            while await app.outbox_sender.drain_once():
+                pass
+            cycle_times.append(time.perf_counter() - start)
+            stats.record("cycle", cycle_times[-1])
+    finally:
+        app.dispatcher.close()
+        app.scraper.close()
+        if app.image_detector:
+            app.image_detector.close()
+        app.db.close()
+        stop_logging(app.log_listener)
+
+    return cycle_times
+
+
+def find_regressions(report, baseline, tolerance, min_delta_ms):
+    """Describe every measurement slower than the baseline by more than tolerance (and min_delta_ms)."""
+    measurements = {'cold_cycle_ms': report['cold_cycle_ms'], 'warm_cycle_p50_ms': report['warm_cycle_p50_ms']}
+    measurements.update({f"{stage}.p50_ms": values['p50_ms'] for stage, values in report['stages'].items()})
+    expected = {'cold_cycle_ms': baseline.get('cold_cycle_ms'), 'warm_cycle_p50_ms': baseline.get('warm_cycle_p50_ms')}
+    expected.update({f"{stage}.p50_ms": values['p50_ms'] for stage, values in baseline.get('stages', {}).items()})
+
+    regressions = []
+    for name, value in measurements.items():
+        limit = expected.get(name)
+        if limit is None or value is None:
+            continue
+        if value > limit * (1 + tolerance) and value - limit > min_delta_ms:
+            regressions.append(f"{name}: {value:.1f}ms vs baseline {limit:.1f}ms (+{(value / limit - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cycles", type=int, default=5)
+    parser.add_argument("--listings", type=int, default=24, help="Listings per lazily loaded page")
+    parser.add_argument("--pages", type=int, default=2, help="Pages loaded on scroll, including the first")
+    parser.add_argument("--churn", type=float, default=0.25, help="Share of listings replaced between cycles")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep-waits", action="store_true", help="Keep the scraper's randomised pauses")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before failing, as a fraction")
+    parser.add_argument("--min-delta-ms", type=float, default=5, help="Ignore slowdowns smaller than this")
+    args = parser.parse_args()
+    if args.cycles < 2:
+        parser.error("--cycles must be at least 2 to measure warm cycles")
+
+    fixtures = FixtureServer(args.listings, args.pages, args.churn, args.seed).start()
+    smtp = SMTPSink().start()
+    stats = StageStats()
+    original_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="bench-cycle-") as directory:
+        write_config(directory, fixtures.base_url, smtp.port)
+        os.chdir(directory)
+        try:
+            cycle_times = asyncio.run(run(args, stats))
+        finally:
+            os.chdir(original_cwd)
+            fixtures.stop()
+            smtp.stop()
+
+    report = {
+        'parameters': {key: getattr(args, key) for key in ('cycles', 'listings', 'pages', 'churn', 'seed', 'keep_waits')},
+        'cold_cycle_ms': round(cycle_times[0] * 1e3, 1),
+        'warm_cycle_p50_ms': round(statistics.median(cycle_times[1:]) * 1e3, 1),
+        'warm_cycle_max_ms': round(max(cycle_times[1:]) * 1e3, 1),
+        'emails_received': smtp.received,
+        'peak_rss_mb': peak_rss_mb(),
+        'stages': stats.report(),
+    }
+    print(json.dumps(report, indent=2))
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}", file=sys.stderr)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to store one", file=sys.stderr)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('parameters') != report['parameters']:
+        print("Warning: baseline was recorded with different parameters", file=sys.stderr)
+    regressions = find_regressions(report, baseline, args.tolerance, args.min_delta_ms)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
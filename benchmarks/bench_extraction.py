@@ -0,0 +1,108 @@
+"""Compare extraction engines on the same synthetic result pages.
+
+Times the Python HTML parser (lxml when installed, else html.parser) inline and through a
+ProcessPoolExecutor, and, when Playwright is installed, the in-page XPath and JavaScript
+strategies on the same fixture loaded into Chromium.
+
+Usage: python benchmarks/bench_extraction.py [--listings 200] [--rounds 20]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from fixtures import generate_listings, render_results_page
+from html_parser import available_engine, parse_listings_html
+
+BASE_URL = "https://www.facebook.com/marketplace/vancouver/search?query=chair"
+
+
+def summarize(name, samples, listings_found):
+    return {
+        'engine': name,
+        'median_ms': round(statistics.median(samples) * 1e3, 3),
+        'p95_ms': round(sorted(samples)[int(len(samples) * 0.95) - 1] * 1e3, 3),
+        'listings': listings_found,
+    }
+
+
+def bench_python_inline(page_html, rounds):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        results = parse_listings_html(page_html, BASE_URL)
+        samples.append(time.perf_counter() - start)
+    return summarize(f"python/{available_engine()} inline", samples, len(results))
+
+
+async def bench_python_pool(page_html, rounds, workers):
+    loop = asyncio.get_running_loop()
+    samples = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Warm the workers so process start-up is not counted
+        await loop.run_in_executor(executor, parse_listings_html, page_html, BASE_URL)
+        for _ in range(rounds):
+            start = time.perf_counter()
+            results = await loop.run_in_executor(executor, parse_listings_html, page_html, BASE_URL)
+            samples.append(time.perf_counter() - start)
+    return summarize(f"python/{available_engine()} process pool", samples, len(results))
+
+
+async def bench_in_page(page_html, rounds):
+    try:
+        from playwright.async_api import async_playwright
+    except ImportError:
+        return []
+    from extraction import ExtractionManager
+
+    results = []
+    async with async_playwright() as playwright:
+        browser = await playwright.chromium.launch(headless=True)
+        page = await browser.new_page()
+        await page.set_content(page_html)
+        manager = ExtractionManager(page)
+        for name, strategy in (("dom/xpath", manager.extract_listings_via_xpath),
+                               ("dom/javascript", manager.extract_listings_via_javascript)):
+            samples = []
+            for _ in range(rounds):
+                start = time.perf_counter()
+                found = await strategy()
+                samples.append(time.perf_counter() - start)
+            results.append(summarize(name, samples, len(found)))
+
+        samples = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            await page.content()
+            samples.append(time.perf_counter() - start)
+        results.append(summarize("page.content() only", samples, 0))
+        await browser.close()
+    return results
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--listings", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    page_html = render_results_page(generate_listings(args.listings))
+    report = [bench_python_inline(page_html, args.rounds)]
+    report.append(await bench_python_pool(page_html, args.rounds, args.workers))
+    in_page = await bench_in_page(page_html, args.rounds)
+    if not in_page:
+        print("Playwright is not installed; skipping in-page strategies", file=sys.stderr)
+    report.extend(in_page)
+
+    print(json.dumps({'listings': args.listings, 'page_bytes': len(page_html), 'results': report}, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
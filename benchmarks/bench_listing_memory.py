@@ -0,0 +1,74 @@
+"""Compare the memory held by listings as dicts, as slotted Listing records and as a columnar ListingBatch.
+
+Each form is built from the same generated listings and measured with tracemalloc, which counts
+only the allocations made while building it. The report is JSON with the bytes per listing.
+
+Usage: python benchmarks/bench_listing_memory.py [--listings 100000]
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from fixtures import ADJECTIVES, BRANDS, CITIES, NOUNS
+from listing import Listing, ListingBatch
+
+
+def raw_listings(count, seed):
+    rng = random.Random(seed)
+    for i in range(count):
+        item_id = str(100000000000000 + i)
+        yield {
+            'id': item_id,
+            'title': f"{rng.choice(ADJECTIVES)} {rng.choice(BRANDS)} {rng.choice(NOUNS)}",
+            'price': float(rng.randint(5, 2000)),
+            'currency': "$",
+            'url': f"https://www.facebook.com/marketplace/item/{item_id}",
+            'location': rng.choice(CITIES),
+            'image_url': f"https://cdn.example.com/{item_id}.jpg",
+        }
+
+
+def measure(build):
+    """Bytes still allocated after build() returns, with its result kept alive."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--listings", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    forms = {
+        'dicts': lambda: list(raw_listings(args.listings, args.seed)),
+        'listings': lambda: [Listing.from_mapping(item) for item in raw_listings(args.listings, args.seed)],
+        'batch': lambda: ListingBatch(Listing.from_mapping(item) for item in raw_listings(args.listings, args.seed)),
+    }
+    sizes = {name: measure(build) for name, build in forms.items()}
+
+    report = {
+        'listings': args.listings,
+        'forms': {
+            name: {'total_mb': round(size / 1e6, 1), 'bytes_per_listing': round(size / args.listings)}
+            for name, size in sizes.items()
+        },
+        'listings_vs_dicts': round(sizes['listings'] / sizes['dicts'], 2),
+        'batch_vs_dicts': round(sizes['batch'] / sizes['dicts'], 2),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
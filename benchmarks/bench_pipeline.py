@@ -0,0 +1,306 @@
+"""Drive synthetic listing streams through the real post-scrape pipeline and report per-stage cost.
+
+A MarketplaceApp is built in a scratch directory from a generated config. Its SMTP server and a
+webhook notifier point at local stand-ins. Pages of synthetic search results then go through
+process_search_results, which covers subscription matching, dedupe, persistence and the outbox,
+and the outbox is drained to the stand-ins after every page.
+
+The stream is tunable: churn (share of each page that is new), in-page duplicates, reposts
+(reworded titles at a nearby price) and the price distribution. The report is JSON with
+throughput, latency percentiles and peak RSS per stage.
+
+Usage: python benchmarks/bench_pipeline.py [--listings 10000] [--page-size 200] [--churn 0.3]
+"""
+import argparse
+import asyncio
+import functools
+import inspect
+import json
+import logging
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from database import DatabaseManager
+from fixtures import ADJECTIVES, BRANDS, CITIES, NOUNS
+from listing import Listing
+from standins import HTTPSink, SMTPSink
+
+SEARCH = {'keywords': "furniture", 'location': "vancouver", 'min_price': 0, 'max_price': 0}
+
+
+def peak_rss_mb():
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def draw_price(rng, distribution):
+    if distribution == "uniform":
+        return float(rng.randint(5, 2000))
+    if distribution == "bimodal":
+        return float(round(rng.gauss(60, 20) if rng.random() < 0.6 else rng.gauss(900, 250)))
+    # Most listings are cheap with a long tail of expensive ones
+    return float(round(min(20000, rng.lognormvariate(4.5, 1.1))))
+
+
+def reword(rng, title):
+    words = title.split()
+    rng.shuffle(words)
+    return " ".join(words) + rng.choice(["", " - must go", " OBO", " (like new)"])
+
+
+def generate_pages(total, page_size, churn, duplicate_ratio, repost_ratio, prices, seed=0):
+    """Yield result pages until total new listings have been produced.
+
+    Each page holds churn * page_size new listings, a share of them reposts of earlier ones. The
+    rest of the page is listings from earlier pages, and duplicate_ratio of it repeats cards from
+    the same page.
+    """
+    rng = random.Random(seed)
+    seen = []
+    next_id = 100000000000000
+    produced = 0
+    while produced < total:
+        new_count = min(total - produced, max(1, round(page_size * churn)))
+        new_listings = []
+        for _ in range(new_count):
+            if seen and rng.random() < repost_ratio:
+                original = rng.choice(seen)
+                title = reword(rng, original['title'])
+                price = float(round(original['price'] * rng.uniform(0.95, 1.05)))
+            else:
+                title = f"{rng.choice(ADJECTIVES)} {rng.choice(BRANDS)} {rng.choice(NOUNS)}"
+                price = draw_price(rng, prices)
+            listing = {
+                'id': str(next_id),
+                'title': title,
+                'price': price,
+                'url': f"https://www.facebook.com/marketplace/item/{next_id}/",
+                'location': rng.choice(CITIES),
+            }
+            next_id += 1
+            new_listings.append(listing)
+
+        page = list(new_listings)
+        old_count = max(0, page_size - new_count - round(page_size * duplicate_ratio))
+        recent = seen[-5000:]
+        if recent and old_count:
+            page.extend(dict(listing) for listing in rng.sample(recent, min(old_count, len(recent))))
+        page.extend(dict(rng.choice(page)) for _ in range(page_size - len(page)))
+        rng.shuffle(page)
+
+        seen.extend(new_listings)
+        produced += new_count
+        yield page
+
+
+class StageStats:
+    def __init__(self):
+        self.samples = {}
+        self.items = {}
+        self.rss = {}
+
+    def record(self, stage, seconds, items=1):
+        self.samples.setdefault(stage, []).append(seconds)
+        self.items[stage] = self.items.get(stage, 0) + items
+        self.rss[stage] = peak_rss_mb()
+
+    def report(self):
+        stages = {}
+        for stage, samples in self.samples.items():
+            ordered = sorted(samples)
+            total = sum(samples)
+            stages[stage] = {
+                'calls': len(samples),
+                'items': self.items[stage],
+                'total_s': round(total, 3),
+                'items_per_s': round(self.items[stage] / total, 1) if total else None,
+                'p50_ms': round(statistics.median(ordered) * 1e3, 3),
+                'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1e3, 3),
+                'p99_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1e3, 3),
+                'max_ms': round(ordered[-1] * 1e3, 3),
+                'peak_rss_mb': self.rss[stage],
+            }
+        return stages
+
+
+def instrument(stats, stage, obj, attr, count_items=None):
+    """Replace obj.attr with a wrapper that records each call's duration under stage."""
+    original = getattr(obj, attr)
+
+    if inspect.iscoroutinefunction(original):
+        @functools.wraps(original)
+        async def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await original(*args, **kwargs)
+            finally:
+                stats.record(stage, time.perf_counter() - start, count_items(*args) if count_items else 1)
+    else:
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                stats.record(stage, time.perf_counter() - start, count_items(*args) if count_items else 1)
+
+    setattr(obj, attr, timed)
+
+
+def write_config(directory, smtp_port, webhook_port, include):
+    with open(os.path.join(directory, "search_config.ini"), "w") as f:
+        f.write(f"""[Search]
+active = True
+keywords = {SEARCH['keywords']}
+location = {SEARCH['location']}
+min_price = 0
+max_price = 0
+search_radius = 40
+frequency = 15
+email = owner@example.com
+subject_template = Found: {{item_title}} at ${{price}}
+message_template = Found a {{item_title}} selling for ${{price}} in {{location}}. Here's the link: {{url}}
+
+[Filters]
+include = {include}
+
+[SMTP]
+server = 127.0.0.1
+port = {smtp_port}
+security = none
+
+[Notifier:hook]
+type = webhook
+url = http://127.0.0.1:{webhook_port}/hook
+format = json
+
+[Outbox]
+batch_size = 500
+poll_interval = 0
+per_recipient_interval = 0
+
+[ImageHash]
+enabled = False
+
+[Extraction]
+engine = dom
+""")
+    with open(os.path.join(directory, "password.ini"), "w") as f:
+        f.write("[Email]\nsender_email = scraper@example.com\nsender_password = secret\n")
+
+
+def add_subscriptions(path, count, seed):
+    rng = random.Random(seed)
+    db = DatabaseManager(path)
+    for i in range(count):
+        include = ", ".join(rng.sample(BRANDS, 2))
+        exclude = rng.choice(NOUNS)
+        db.add_subscription(f"subscriber{i}@example.com", SEARCH['keywords'], SEARCH['location'],
+                            rules=json.dumps({'include': include, 'exclude': exclude}))
+    db.close()
+
+
+async def run(args, stats):
+    from main import MarketplaceApp
+    from subscriptions import SubscriptionIndex
+
+    app = MarketplaceApp()
+    # The app logs every stored listing; keep the benchmark's own output readable
+    logging.getLogger().setLevel(logging.WARNING)
+
+    instrument(stats, "process_search_results", app, "process_search_results", lambda results, *_: len(results))
+    instrument(stats, "db.existing_ids", app.db, "existing_ids", lambda ids: len(ids))
+    instrument(stats, "db.add_items_with_notifications", app.db, "add_items_with_notifications", lambda items, *_: len(items))
+    instrument(stats, "db.log_search", app.db, "log_search")
+    if app.repost_detector:
+        instrument(stats, "dedupe.find_repost", app.repost_detector, "find_repost")
+        instrument(stats, "dedupe.add", app.repost_detector, "add")
+    instrument(stats, "outbox.drain_once", app.outbox_sender, "drain_once")
+
+    generated = 0
+    try:
+        start = time.perf_counter()
+        subscriptions = SubscriptionIndex(await app.db.get_subscriptions())
+        instrument(stats, "subscriptions.match", subscriptions, "match", lambda _, items: len(items))
+
+        pages = generate_pages(args.listings, args.page_size, args.churn, args.duplicate_ratio,
+                               args.repost_ratio, args.prices, args.seed)
+        while True:
+            generate_start = time.perf_counter()
+            page = next(pages, None)
+            if page is None:
+                break
+            stats.record("generate", time.perf_counter() - generate_start, len(page))
+            generated += len(page)
+            # The scraper hands the pipeline Listing records built at the extraction boundary
+            page = [Listing.from_mapping(item) for item in page]
+
+            await app.process_search_results(page, app.scraper.search_params, subscriptions)
+            while await app.outbox_sender.drain_once():
+                pass
+        elapsed = time.perf_counter() - start
+        outbox = await app.db.get_outbox_counts()
+    finally:
+        app.dispatcher.close()
+        app.scraper.close()
+        app.db.close()
+
+    return elapsed, generated, outbox
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--listings", type=int, default=10000, help="New listings to generate (10k-1M)")
+    parser.add_argument("--page-size", type=int, default=200)
+    parser.add_argument("--churn", type=float, default=0.3, help="Share of each page that is new listings")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.05, help="Share of each page repeating a card on it")
+    parser.add_argument("--repost-ratio", type=float, default=0.1, help="Share of new listings that repost an earlier one")
+    parser.add_argument("--prices", choices=("lognormal", "uniform", "bimodal"), default="lognormal")
+    parser.add_argument("--subscriptions", type=int, default=50)
+    parser.add_argument("--include", default="Herman Miller, Steelcase", help="Owner's [Filters] include keywords")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    smtp, webhook = SMTPSink().start(), HTTPSink().start()
+    stats = StageStats()
+    original_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="bench-pipeline-") as directory:
+        write_config(directory, smtp.port, webhook.port, args.include)
+        add_subscriptions(os.path.join(directory, "marketplace_scraper.db"), args.subscriptions, args.seed)
+        os.chdir(directory)
+        try:
+            elapsed, generated, outbox = asyncio.run(run(args, stats))
+        finally:
+            os.chdir(original_cwd)
+            smtp.stop()
+            webhook.stop()
+
+    report = {
+        'parameters': {key: value for key, value in vars(args).items() if key != 'output'},
+        'total_s': round(elapsed, 3),
+        'listings_processed': generated,
+        'listings_per_s': round(generated / elapsed, 1),
+        'peak_rss_mb': peak_rss_mb(),
+        'outbox': outbox,
+        'emails_received': smtp.received,
+        'webhooks_received': webhook.received,
+        'stages': stats.report(),
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Measure per-listing cost of the compiled filter rules with hundreds of rules.
+
+Usage: python benchmarks/bench_rules.py [--rules 500] [--listings 100000]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from listing import Listing
+from rules import RuleSet, tokenize
+
+
+def random_word(rng):
+    return "".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=rng.randint(3, 9)))
+
+
+def build_rules(rng, rule_count, vocabulary):
+    keywords = rng.sample(vocabulary, rule_count)
+    # Mix of single words and two-word phrases, split between include and exclude lists
+    phrases = [kw if i % 3 else f"{kw} {rng.choice(vocabulary)}" for i, kw in enumerate(keywords)]
+    half = rule_count // 2
+    regex_count = max(1, rule_count // 20)
+    return {
+        'include': ", ".join(phrases[:half]),
+        'exclude': ", ".join(phrases[half:]),
+        'exclude_regex': "\n".join(f"\\b{random_word(rng)}\\d+\\b" for _ in range(regex_count)),
+        'price_bands': "10-200, 300-600, 800-",
+        'min_title_length': "5"
+    }
+
+
+def compile_naive(options):
+    """One precompiled pattern per rule, checked in a loop: the baseline for the combined matcher."""
+    def keyword_patterns(value):
+        return [re.compile(rf"\b{re.escape(keyword.strip())}\b", re.IGNORECASE) for keyword in value.split(',')]
+
+    exclude = [re.compile(p, re.IGNORECASE) for p in options['exclude_regex'].splitlines()]
+    exclude += keyword_patterns(options['exclude'])
+    include = keyword_patterns(options['include'])
+
+    def matches(item):
+        title = item.title
+        if any(pattern.search(title) for pattern in exclude):
+            return False
+        return any(pattern.search(title) for pattern in include)
+
+    return matches
+
+
+def time_per_listing(fn, items):
+    start = time.perf_counter()
+    kept = sum(1 for item in items if fn(item))
+    elapsed = time.perf_counter() - start
+    return elapsed / len(items) * 1e6, kept
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rules", type=int, default=500)
+    parser.add_argument("--listings", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = list({random_word(rng) for _ in range(max(5000, args.rules * 4))})
+    options = build_rules(rng, args.rules, vocabulary)
+    items = [
+        Listing(str(i), " ".join(rng.choices(vocabulary, k=rng.randint(3, 10))), rng.uniform(0, 1000))
+        for i in range(args.listings)
+    ]
+
+    start = time.perf_counter()
+    rules = RuleSet.from_mapping(options)
+    compile_ms = (time.perf_counter() - start) * 1e3
+
+    compiled_us, compiled_kept = time_per_listing(rules.matches, items)
+    print(f"rules={args.rules} listings={args.listings} compile={compile_ms:.1f}ms")
+    print(f"compiled matcher: {compiled_us:.2f} us/listing ({compiled_kept} kept)")
+
+    sample = items[:max(1, args.listings // 100)]
+    naive_us, _ = time_per_listing(compile_naive(options), sample)
+    print(f"naive per-rule loop: {naive_us:.2f} us/listing (on {len(sample)} listings, text rules only)")
+    print(f"tokenize alone: {time_per_listing(lambda item: tokenize(item.title), items)[0]:.2f} us/listing")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Synthetic Marketplace-shaped result pages shared by the benchmarks."""
+import html
+import random
+
+ADJECTIVES = ["Vintage", "Modern", "Used", "Mint", "Solid wood", "Ergonomic", "Compact", "Large", "Antique", "Gaming"]
+NOUNS = ["office chair", "desk", "road bike", "sofa", "bookshelf", "monitor", "dresser", "dining table", "lamp", "camera"]
+BRANDS = ["Herman Miller", "IKEA", "Steelcase", "Trek", "Dell", "Sony", "West Elm", "Canon", "Specialized", "Muji"]
+CITIES = ["Vancouver, BC", "Burnaby, BC", "Richmond, BC", "Surrey, BC", "North Vancouver, BC"]
+
+
+def make_listing(rng, listing_id):
+    return {
+        'id': str(listing_id),
+        'title': f"{rng.choice(ADJECTIVES)} {rng.choice(BRANDS)} {rng.choice(NOUNS)}",
+        'price': float(rng.randint(5, 2000)),
+        'location': rng.choice(CITIES),
+    }
+
+
+def render_card(listing, image_base_url="https://scontent.example.com/v/t45/"):
+    return (
+        '<div class="x9f619 x78zum5"><div class="x3ct3a4">'
+        f'<a href="/marketplace/item/{listing["id"]}/?ref=search&amp;referral_code=null" role="link" tabindex="0">'
+        '<div class="xhk9q7s"><img class="xt7dq6l" '
+        f'src="{image_base_url}{listing["id"]}_n.jpg?stp=c0.43" alt="{html.escape(listing["title"])}"></div>'
+        f'<div class="x1gslohp"><span dir="auto">CA${listing["price"]:,.0f}</span></div>'
+        f'<div class="x1iorvi4"><span dir="auto">{html.escape(listing["title"])}</span></div>'
+        f'<div class="x1iorvi4"><span dir="auto">{html.escape(listing["location"])}</span></div>'
+        '</a></div></div>'
+    )
+
+
+def render_results_page(listings, next_page_url=None, image_base_url="https://scontent.example.com/v/t45/"):
+    """A results page with one card per listing. next_page_url adds a lazy-load script fetching more cards on scroll."""
+    cards = "\n".join(render_card(listing, image_base_url) for listing in listings)
+    lazy_script = ""
+    if next_page_url:
+        lazy_script = f"""
+<script>
+  let loading = false;
+  let nextUrl = {next_page_url!r};
+  window.addEventListener('scroll', async () => {{
+    if (loading || !nextUrl || window.innerHeight + window.scrollY < document.body.scrollHeight - 400) return;
+    loading = true;
+    const response = await fetch(nextUrl);
+    nextUrl = response.headers.get('X-Next-Page');
+    document.getElementById('feed').insertAdjacentHTML('beforeend', await response.text());
+    loading = false;
+  }});
+</script>"""
+    return f"""<!DOCTYPE html>
+<html><head><title>Marketplace - Search results</title>
+<style>.x9f619 {{ min-height: 320px; }}</style></head>
+<body><div role="navigation"><a href="/marketplace/vancouver/">Vancouver</a><div role="button">Filters</div></div>
+<div role="main"><div id="feed" class="x1xfsgkm">
+{cards}
+</div></div>{lazy_script}
+</body></html>"""
+
+
+def generate_listings(count, seed=0, start_id=100000000000000):
+    rng = random.Random(seed)
+    return [make_listing(rng, start_id + i) for i in range(count)]
@@ -0,0 +1,197 @@
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import re
+from collections import OrderedDict
+from datetime import datetime
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+MAX_PAGE_SIZE = 500
+
+
+class BadRequest(Exception):
+    pass
+
+
+def encode_cursor(row):
+    return base64.urlsafe_b64encode(json.dumps([row['discovered_at'], row['id']]).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        discovered_at, item_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return str(discovered_at), str(item_id)
+    except (ValueError, TypeError) as e:
+        raise BadRequest(f"invalid cursor: {cursor}") from e
+
+
+def _param(params, name, convert=str, default=None):
+    if name not in params:
+        return default
+    value = params[name][-1]
+    try:
+        return convert(value)
+    except ValueError as e:
+        raise BadRequest(f"invalid {name}: {value}") from e
+
+
+def _search_text(params, name):
+    text = _param(params, name)
+    if text is not None and not re.search(r"\w", text):
+        raise BadRequest(f"invalid {name}: nothing to search for")
+    return text
+
+
+def _limit(params, default=50):
+    return max(1, min(MAX_PAGE_SIZE, _param(params, 'limit', int, default)))
+
+
+class ReadAPI:
+    """A read-only JSON API over listings and the search log, served on localhost from the app's event loop.
+
+    Responses carry an ETag. They are cached by URL until the next insert into listings or searches
+    changes the database's data version, so polling dashboards mostly get cached bodies or 304s.
+    """
+
+    def __init__(self, db, host="127.0.0.1", port=8765, cache_size=128):
+        self.db = db
+        self.host = host
+        self.port = port
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.server = None
+        self.routes = {
+            '/listings': self.listings,
+            '/listings/search': self.search_listings,
+            '/searches': self.searches,
+            '/searches/stats': self.search_stats,
+            '/extraction/stats': self.extraction_stats,
+        }
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        logging.info(f"Read API listening on http://{self.host}:{self.port}")
+
+    async def close(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def listings(self, params):
+        since = _param(params, 'since', datetime.fromisoformat)
+        until = _param(params, 'until', datetime.fromisoformat)
+        limit = _limit(params)
+        rows = await self.db.get_listings_page(
+            limit,
+            after=decode_cursor(params['cursor'][-1]) if 'cursor' in params else None,
+            min_price=_param(params, 'min_price', float),
+            max_price=_param(params, 'max_price', float),
+            since=since,
+            until=until,
+            title=_search_text(params, 'search')
+        )
+        return {'listings': rows, 'next_cursor': encode_cursor(rows[-1]) if len(rows) == limit else None}
+
+    async def search_listings(self, params):
+        text = _search_text(params, 'q')
+        if not text:
+            raise BadRequest("q is required")
+        rows = await self.db.search_listings(
+            text,
+            _limit(params),
+            min_price=_param(params, 'min_price', float),
+            max_price=_param(params, 'max_price', float),
+            since=_param(params, 'since', datetime.fromisoformat),
+            until=_param(params, 'until', datetime.fromisoformat)
+        )
+        return {'listings': rows}
+
+    async def searches(self, params):
+        limit = _limit(params)
+        rows = await self.db.get_searches_page(limit, _param(params, 'before', int), _param(params, 'search_terms'))
+        return {'searches': rows, 'next_before': rows[-1]['id'] if len(rows) == limit else None}
+
+    async def search_stats(self, params):
+        return {'stats': await self.db.get_search_stats()}
+
+    async def extraction_stats(self, params):
+        return {'stats': await self.db.get_extraction_stats()}
+
+    async def respond(self, method, target, headers):
+        """Return (status, extra headers, body) for one request."""
+        if method not in ("GET", "HEAD"):
+            return HTTPStatus.METHOD_NOT_ALLOWED, {'Allow': "GET, HEAD"}, b""
+        path = urlsplit(target).path.rstrip("/") or "/"
+        handler = self.routes.get(path)
+        if handler is None:
+            return HTTPStatus.NOT_FOUND, {}, json.dumps({'error': "not found"}).encode()
+
+        version = await self.db.get_data_version()
+        cached = self.cache.get(target)
+        if cached and cached[0] == version:
+            self.cache.move_to_end(target)
+            _, etag, body = cached
+        else:
+            try:
+                payload = await handler(parse_qs(urlsplit(target).query))
+            except BadRequest as e:
+                return HTTPStatus.BAD_REQUEST, {}, json.dumps({'error': str(e)}).encode()
+            body = json.dumps(payload, default=str).encode()
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            self.cache[target] = (version, etag, body)
+            self.cache.move_to_end(target)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+        if etag in (tag.strip() for tag in headers.get('if-none-match', '').split(",")):
+            return HTTPStatus.NOT_MODIFIED, {'ETag': etag}, b""
+        return HTTPStatus.OK, {'ETag': etag, 'Cache-Control': "no-cache"}, body
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode('latin-1').partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    status, extra, body = HTTPStatus.BAD_REQUEST, {}, b""
+                    method, version = "GET", "HTTP/1.0"
+                else:
+                    try:
+                        status, extra, body = await self.respond(method, target, headers)
+                    except Exception as e:
+                        logging.error(f"Read API error for {target}: {e}")
+                        status, extra, body = HTTPStatus.INTERNAL_SERVER_ERROR, {}, b""
+
+                keep_alive = version == "HTTP/1.1" and headers.get('connection', '').lower() != "close"
+                head = [f"HTTP/1.1 {status.value} {status.phrase}",
+                        f"Content-Length: {len(body)}",
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+                if body:
+                    head.append("Content-Type: application/json")
+                head.extend(f"{name}: {value}" for name, value in extra.items())
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1'))
+                if method != "HEAD":
+                    writer.write(body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionResetError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
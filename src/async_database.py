@@ -0,0 +1,140 @@
+import asyncio
+import concurrent.futures
+import functools
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from database import DatabaseManager
+
+# DatabaseManager methods that only read, and so run on the reader pool
+READ_METHODS = {
+    'item_exists', 'existing_ids', 'get_due_notifications', 'get_outbox_counts', 'get_listing_details',
+    'find_title_candidates', 'get_unindexed_listings', 'get_image_hashes', 'get_subscriptions',
+    'get_recent_searches', 'get_listings_page', 'get_searches_page', 'get_search_stats', 'get_data_version',
+    'get_table_columns', 'get_search_history', 'get_last_prices', 'search_listings',
+    'get_price_sketches', 'get_result_snapshot', 'get_extraction_stats',
+}
+WRITE_METHODS = {
+    'add_item', 'add_items_with_notifications', 'enqueue_notifications', 'mark_notification_sent',
+    'reschedule_notification', 'log_search', 'save_listing_details', 'add_title_signature', 'add_title_signatures',
+    'clear_title_index', 'add_image_hash', 'add_subscription', 'remove_subscription', 'record_price_changes',
+    'save_price_sketch', 'save_result_snapshot', 'prune_rows', 'incremental_vacuum', 'mark_listings_seen',
+    'record_extraction_attempt',
+}
+
+_STOP = object()
+
+
+class AsyncDatabase:
+    """Runs DatabaseManager calls off the event loop.
+
+    One writer thread owns the only write connection. It drains queued writes in groups of up
+    to max_batch, each group in a single transaction, so a burst of writes costs one commit.
+    Reads run on a small pool of read-only connections. In WAL mode readers are not blocked by
+    the writer. Every DatabaseManager read or write method is available here as a coroutine with
+    the same arguments.
+    """
+
+    def __init__(self, db_path="marketplace_scraper.db", readers=2, max_batch=64):
+        self.db_path = db_path
+        self.max_batch = max_batch
+        # Bumped by the writer after each group of writes, so readers can tell updates happened too
+        self.commits = 0
+        self.writes = queue.SimpleQueue()
+        self._local = threading.local()
+        self._reader_dbs = []
+        self._reader_lock = threading.Lock()
+
+        ready = concurrent.futures.Future()
+        self.writer = threading.Thread(target=self._writer_loop, args=(ready,), name="db-writer", daemon=True)
+        self.writer.start()
+        # Schema creation and migrations happen on the writer before anything else may connect
+        ready.result()
+
+        self.readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="db-reader",
+                                          initializer=self._open_reader)
+
+    def _writer_loop(self, ready):
+        try:
+            db = DatabaseManager(self.db_path)
+            # Read the pragma's result row so the statement finishes and releases its lock
+            db.cursor.execute("PRAGMA journal_mode = WAL").fetchone()
+        except Exception as e:
+            ready.set_exception(e)
+            return
+        ready.set_result(None)
+
+        stopping = False
+        while not stopping:
+            job = self.writes.get()
+            if job is _STOP:
+                break
+            jobs = [job]
+            while len(jobs) < self.max_batch:
+                try:
+                    job = self.writes.get_nowait()
+                except queue.Empty:
+                    break
+                if job is _STOP:
+                    stopping = True
+                    break
+                jobs.append(job)
+
+            try:
+                outcomes = db.run_batch([(name, args, kwargs) for _, name, args, kwargs in jobs])
+            except Exception as e:
+                logging.error(f"Database write batch of {len(jobs)} failed: {e}")
+                outcomes = [(False, e)] * len(jobs)
+            self.commits += 1
+            # Results are only handed back once the group has committed
+            for (future, *_), (ok, result) in zip(jobs, outcomes):
+                if ok:
+                    future.set_result(result)
+                else:
+                    future.set_exception(result)
+
+        db.close()
+
+    def _open_reader(self):
+        self._local.db = DatabaseManager(self.db_path, read_only=True)
+        with self._reader_lock:
+            self._reader_dbs.append(self._local.db)
+
+    def _read_sync(self, name, args, kwargs):
+        return getattr(self._local.db, name)(*args, **kwargs)
+
+    async def read(self, name, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.readers, self._read_sync, name, args, kwargs)
+
+    async def write(self, name, *args, **kwargs):
+        future = concurrent.futures.Future()
+        self.writes.put((future, name, args, kwargs))
+        return await asyncio.wrap_future(future)
+
+    async def get_data_version(self):
+        """Like DatabaseManager.get_data_version, but also changing on updates made through this writer.
+
+        The counter is read first, so a version can only be older than the data read with it.
+        """
+        commits = self.commits
+        return (commits, *await self.read('get_data_version'))
+
+    def __getattr__(self, name):
+        if name in READ_METHODS:
+            return functools.partial(self.read, name)
+        if name in WRITE_METHODS:
+            return functools.partial(self.write, name)
+        raise AttributeError(name)
+
+    def close(self):
+        """Finish queued writes, then close every connection."""
+        self.writes.put(_STOP)
+        self.writer.join()
+        self.readers.shutdown(wait=True)
+        with self._reader_lock:
+            for db in self._reader_dbs:
+                db.close()
+            self._reader_dbs = []
@@ -4,9 +4,13 @@ import random
 from playwright.async_api import async_playwright, TimeoutError
 
 class BrowserManager:
-    def __init__(self, user_data_dir, storage_state_path):
+    def __init__(self, user_data_dir, storage_state_path, endpoint=None, connect_timeout=5):
         self.user_data_dir = user_data_dir
         self.storage_state_path = storage_state_path
+        # CDP endpoint of a shared browser_server.py; None always launches a local Chromium
+        self.endpoint = endpoint
+        self.connect_timeout = connect_timeout
+        self.shared = False
         self.playwright = None
         self.browser = None
         self.context = None
@@ -14,15 +18,34 @@ class BrowserManager:
     
     async def random_wait(self, min_time=4, max_time=8, reason=None):
         wait_time = random.uniform(min_time, max_time)
+        # Logged on every scroll and pause, so the message is only built if the record is written
         if reason:
-            logging.info(f"Waiting for {wait_time:.2f} seconds: {reason}")
+            logging.info("Waiting for %.2f seconds: %s", wait_time, reason)
         else:
-            logging.info(f"Waiting for {wait_time:.2f} seconds")
+            logging.info("Waiting for %.2f seconds", wait_time)
         await asyncio.sleep(wait_time)
     
     async def initialize(self):
         self.playwright = await async_playwright().start()
-        
+        self.browser = await self._connect_shared_browser()
+        self.shared = self.browser is not None
+        if not self.shared:
+            self.browser = await self.playwright.chromium.launch(headless=True)
+        await self.open_context()
+    
+    async def _connect_shared_browser(self):
+        if not self.endpoint:
+            return None
+        try:
+            browser = await self.playwright.chromium.connect_over_cdp(self.endpoint, timeout=self.connect_timeout * 1000)
+            logging.info(f"Connected to shared browser at {self.endpoint}")
+            return browser
+        except Exception as e:
+            logging.warning(f"Shared browser at {self.endpoint} is unavailable, launching locally: {e}")
+            return None
+    
+    async def open_context(self):
+        """Open a fresh isolated context and page, restoring the saved session if there is one."""
         context_params = {
             "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/96.0.4664.110 Safari/537.36",
             "viewport": {"width": 1920, "height": 1080},
@@ -34,7 +57,6 @@ class BrowserManager:
         if os.path.exists(self.storage_state_path):
             context_params["storage_state"] = self.storage_state_path
             
-        self.browser = await self.playwright.chromium.launch(headless=True)
         self.context = await self.browser.new_context(**context_params)
         
         await self._apply_stealth_mode()
@@ -280,14 +302,35 @@ class BrowserManager:
             logging.warning(f"Error getting current location: {e}")
             return None
     
-    async def close(self):
+    async def recycle_page(self):
+        """Swap the page for a fresh one after a stage on it timed out; reopen the context if that fails too."""
+        page, self.page = self.page, None
+        try:
+            if page:
+                async with asyncio.timeout(10):
+                    await page.close()
+            self.page = await self.context.new_page()
+        except Exception as e:
+            logging.warning(f"Could not replace the page, reopening the browser context: {e}")
+            await self.close_context()
+            await self.open_context()
+    
+    async def close_context(self):
         if self.context:
             await self.save_session()
         if self.page:
             await self.page.close()
         if self.context:
             await self.context.close()
+        self.page = None
+        self.context = None
+    
+    async def close(self):
+        await self.close_context()
         if self.browser:
+            # For a shared browser this only disconnects; the server keeps Chromium running
             await self.browser.close()
         if self.playwright:
-            await self.playwright.stop()
\ No newline at end of file
+            await self.playwright.stop()
+        self.browser = None
+        self.playwright = None
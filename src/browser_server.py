@@ -0,0 +1,44 @@
+"""Run one headless Chromium that every scraper process on this host connects to.
+
+Playwright for Python has no launch_server, so the browser is launched with a remote debugging
+port and scrapers attach to it with connect_over_cdp, each in its own isolated context. A scraper
+falls back to launching its own Chromium when this server is not running.
+
+Usage: python browser_server.py [--port 9222]
+Then set endpoint = http://127.0.0.1:9222 in the [Browser] section of search_config.ini.
+"""
+import argparse
+import asyncio
+import logging
+import signal
+
+from playwright.async_api import async_playwright
+
+
+async def serve(port, headless=True):
+    async with async_playwright() as playwright:
+        # Chromium binds the debugging port to 127.0.0.1 only, so the browser is not exposed to the network
+        browser = await playwright.chromium.launch(headless=headless, args=[f"--remote-debugging-port={port}"])
+        logging.info(f"Shared browser {browser.version} listening on http://127.0.0.1:{port}")
+
+        stopped = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stopped.set)
+        browser.on("disconnected", lambda _: stopped.set())
+
+        await stopped.wait()
+        if browser.is_connected():
+            await browser.close()
+        logging.info("Shared browser stopped")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Run a shared Chromium for marketplace scrapers")
+    parser.add_argument("--port", type=int, default=9222)
+    parser.add_argument("--headed", action="store_true", help="Show the browser window")
+    args = parser.parse_args()
+
+    asyncio.run(serve(args.port, headless=not args.headed))
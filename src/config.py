@@ -3,6 +3,8 @@ import os
 import sys
 import logging
 
+from rules import RuleSet
+
 class ConfigManager:
     def __init__(self, config_path="search_config.ini"):
         self.config_path = config_path
@@ -17,6 +19,7 @@ class ConfigManager:
         try:
             self.config.read(self.config_path)
             self._validate_config()
+            self.filter_rules = RuleSet.from_mapping(self.config['Filters']) if 'Filters' in self.config else RuleSet()
         except Exception as e:
             logging.error(f"Error parsing configuration file: {e}")
             sys.exit(1)
@@ -58,6 +61,38 @@ class ConfigManager:
             'frequency': self.config.getint('Search', 'frequency')
         }
     
+    def get_filter_rules(self):
+        return self.filter_rules
+    
+    def get_base_url(self):
+        """Marketplace root that search URLs are built on; overridden to point at a local fixture server."""
+        return self.config.get('Marketplace', 'base_url', fallback='https://www.facebook.com/marketplace/')
+    
+    def get_browser_config(self):
+        return {
+            'endpoint': self.config.get('Browser', 'endpoint', fallback='') or None,
+            'connect_timeout': self.config.getfloat('Browser', 'connect_timeout', fallback=5)
+        }
+    
+    def get_timeout_config(self):
+        # Seconds per stage; 0 leaves a stage unbounded
+        return {
+            'navigation': self.config.getfloat('Timeouts', 'navigation', fallback=45),
+            'dialogs': self.config.getfloat('Timeouts', 'dialogs', fallback=20),
+            'extraction': self.config.getfloat('Timeouts', 'extraction', fallback=60),
+            'search': self.config.getfloat('Timeouts', 'search', fallback=180),
+            'enrichment': self.config.getfloat('Timeouts', 'enrichment', fallback=180),
+            'cycle': self.config.getfloat('Timeouts', 'cycle', fallback=900),
+            'retries': self.config.getint('Timeouts', 'retries', fallback=1)
+        }
+    
+    def get_extraction_config(self):
+        return {
+            'engine': self.config.get('Extraction', 'engine', fallback='dom'),
+            'workers': self.config.getint('Extraction', 'workers', fallback=2),
+            'exploration': self.config.getfloat('Extraction', 'exploration', fallback=0.1)
+        }
+    
     def get_notification_params(self):
         return {
             'email': self.config.get('Search', 'email'),
@@ -1,28 +1,101 @@
 import sqlite3
 import os
+import hashlib
+import json
 import logging
-from datetime import datetime
+import math
+import re
+import zlib
+from datetime import datetime, timedelta
+
+# Keep listings_fts in step with listings and with descriptions from enrichment, which may
+# be saved before or after the listing itself
+_SEARCH_INDEX_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS listings_fts_insert AFTER INSERT ON listings BEGIN
+        INSERT INTO listings_fts (rowid, title, description)
+        VALUES (new.rowid, new.title, (SELECT description FROM listing_details WHERE id = new.id));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS listings_fts_delete AFTER DELETE ON listings BEGIN
+        DELETE FROM listings_fts WHERE rowid = old.rowid;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS listings_fts_update AFTER UPDATE OF title ON listings BEGIN
+        UPDATE listings_fts SET title = new.title WHERE rowid = old.rowid;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS listing_details_fts AFTER INSERT ON listing_details BEGIN
+        UPDATE listings_fts SET description = new.description
+        WHERE rowid = (SELECT rowid FROM listings WHERE id = new.id);
+    END""",
+]
+
+
+# Tables that retention may prune, with the timestamp column their age is judged by
+RETENTION_COLUMNS = {
+    'searches': 'timestamp',
+    'listings': 'discovered_at',
+    'price_history': 'seen_at',
+    'listing_details': 'fetched_at',
+    'outbox': 'created_at',
+}
+# Notifications still waiting to go out are never pruned, nor are listings some query still shows,
+# which would otherwise be stored and alerted on again as new. ? is the cutoff.
+_RETENTION_CONDITIONS = {
+    'outbox': "status != 'pending'",
+    'listings': "(last_seen_at IS NULL OR last_seen_at < ?)",
+}
+# Rows keyed by listing ID that go when their listing does
+_LISTING_DEPENDENTS = ('listing_details', 'listing_signatures', 'lsh_buckets', 'image_hashes', 'price_history')
+
+
+def _nearest_rank(sorted_values, percent):
+    """The nearest-rank percentile of an ascending list, or None for an empty one."""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(percent / 100 * len(sorted_values)) - 1)]
+
+
+def fts_query(text):
+    """Turn free text into an FTS5 query matching every word, so user input is never parsed as FTS syntax."""
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        raise ValueError(f"nothing to search for in {text!r}")
+    return " ".join(f'"{word}"' for word in words)
+
 
 class DatabaseManager:
-    def __init__(self, db_path="marketplace_scraper.db"):
+    def __init__(self, db_path="marketplace_scraper.db", read_only=False):
         """Initialize database connection and create tables if they don't exist."""
         self.db_path = db_path
+        self.read_only = read_only
         self.conn = None
         self.cursor = None
+        self.archives = {}
+        # Set while run_batch groups several calls into one transaction
+        self.in_batch = False
         self.initialize()
         
     def initialize(self):
         """Create the database and tables if they don't exist."""
         db_exists = os.path.exists(self.db_path)
-        self.conn = sqlite3.connect(self.db_path)
+        # A read-only connection stays on its pool thread, but may be closed from the thread shutting the pool down
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=not self.read_only)
         self.cursor = self.conn.cursor()
         
+        if self.read_only:
+            # Read-only connections assume the writer has already created and migrated the schema
+            self.cursor.execute("PRAGMA query_only = ON")
+            self.has_search_index = self._table_exists("listings_fts")
+            return
+        
         if not db_exists:
             self.create_tables()
-            logging.info(f"Database created at {self.db_path}")
+            logging.info("Database created at %s", self.db_path)
+        
+        self.migrate()
         
     def create_tables(self):
         """Create the necessary tables for tracking listings and searches."""
+        # Must be set before the first table exists; existing databases are converted in migrate()
+        self.cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
         self.cursor.execute('''
         CREATE TABLE listings (
             id TEXT PRIMARY KEY,
@@ -45,40 +118,655 @@ class DatabaseManager:
         )
         ''')
         
-        self.conn.commit()
+        self._commit()
+        
+    def migrate(self):
+        """Create tables added after the initial schema, so existing databases keep working."""
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS listing_details (
+            id TEXT PRIMARY KEY,
+            location TEXT,
+            description TEXT,
+            seller TEXT,
+            posted_at TEXT,
+            fetched_at TIMESTAMP
+        )
+        ''')
+        
+        # MinHash signatures and their LSH band buckets, used for repost detection
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS listing_signatures (
+            id TEXT PRIMARY KEY,
+            signature BLOB,
+            price REAL,
+            repost_of TEXT
+        )
+        ''')
+        
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS lsh_buckets (
+            bucket INTEGER,
+            id TEXT,
+            PRIMARY KEY (bucket, id)
+        ) WITHOUT ROWID
+        ''')
+        
+        # 64-bit perceptual hashes of listing thumbnails, stored as signed integers
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS image_hashes (
+            id TEXT PRIMARY KEY,
+            phash INTEGER,
+            image_url TEXT
+        )
+        ''')
+        
+        # Recipients subscribed to a marketplace query, with their own filter rules as JSON
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS subscriptions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recipient TEXT NOT NULL,
+            keywords TEXT NOT NULL,
+            location TEXT,
+            min_price REAL,
+            max_price REAL,
+            rules TEXT,
+            active INTEGER DEFAULT 1,
+            created_at TIMESTAMP
+        )
+        ''')
+        
+        # Notifications waiting to be sent, written in the same transaction as their listings
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            idempotency_key TEXT UNIQUE NOT NULL,
+            recipient TEXT,
+            subject TEXT,
+            body TEXT,
+            status TEXT DEFAULT 'pending',
+            attempts INTEGER DEFAULT 0,
+            next_attempt_at TIMESTAMP,
+            created_at TIMESTAMP,
+            sent_at TIMESTAMP,
+            last_error TEXT
+        )
+        ''')
+        
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt_at)"
+        )
+        # Comma-separated notifier backends that already delivered the notification
+        self._add_column_if_missing("outbox", "delivered_to", "TEXT")
+        
+        # Every price a stored listing has changed to, after the one it was first stored with
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS price_history (
+            id TEXT NOT NULL,
+            price REAL,
+            seen_at TIMESTAMP
+        )
+        ''')
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_price_history_id ON price_history (id, seen_at)"
+        )
+        
+        # A serialized KLL sketch of the prices each query has shown, keyed by its query_key as JSON
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS price_sketches (
+            query TEXT PRIMARY KEY,
+            sketch BLOB,
+            updated_at TIMESTAMP
+        )
+        ''')
+        
+        # The sorted integer IDs each fetched query last showed, with a miss count per ID
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS result_snapshots (
+            query TEXT PRIMARY KEY,
+            ids BLOB,
+            misses BLOB,
+            updated_at TIMESTAMP
+        )
+        ''')
+        # Running totals per extraction strategy, for each search and across all searches ('*')
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS extraction_stats (
+            strategy TEXT,
+            search_key TEXT,
+            attempts INTEGER DEFAULT 0,
+            successes INTEGER DEFAULT 0,
+            total_ms REAL DEFAULT 0,
+            last_success_at TIMESTAMP,
+            PRIMARY KEY (strategy, search_key)
+        )
+        ''')
+        
+        # How long each search's page load took, for latency percentiles per status
+        self._add_column_if_missing("searches", "duration_ms", "REAL")
+        # Identifies the query beyond its keywords, so the scheduler can tell apart queries sharing them
+        self._add_column_if_missing("searches", "query_id", "TEXT")
+        # Set once a listing has been missing from its query's results for several cycles
+        self._add_column_if_missing("listings", "removed_at", "TIMESTAMP")
+        # When any query last showed the listing
+        self._add_column_if_missing("listings", "last_seen_at", "TIMESTAMP")
+        
+        # Newest-first keyset pagination for the read API
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_listings_discovered ON listings (discovered_at, id)"
+        )
+        # Incremental exports read the search log in timestamp order
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_searches_timestamp ON searches (timestamp)"
+        )
+        
+        self.has_search_index = self._create_search_index()
+        
+        self._commit()
+        self._enable_incremental_vacuum()
+    
+    def _enable_incremental_vacuum(self):
+        """Switch an existing database to incremental auto-vacuum, which takes one full VACUUM."""
+        self.cursor.execute("PRAGMA auto_vacuum")
+        if self.cursor.fetchone()[0] == 2:
+            return
+        logging.info("Enabling incremental vacuum; rebuilding the database once, which may take a while")
+        self.cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self.cursor.execute("VACUUM")
+        # VACUUM may renumber the rowids of tables without an INTEGER PRIMARY KEY, listings among them
+        if self.has_search_index:
+            self.rebuild_search_index()
+    
+    def _table_exists(self, name):
+        self.cursor.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,))
+        return self.cursor.fetchone() is not None
+    
+    def _create_search_index(self):
+        """Create the full-text index over listing titles and descriptions, backfilling it the first time.
+        
+        FTS rows share their listing's rowid, and triggers keep them in step with listings and
+        listing_details. Returns False when this SQLite build lacks FTS5.
+        """
+        exists = self._table_exists("listings_fts")
+        try:
+            self.cursor.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS listings_fts USING fts5("
+                "title, description, tokenize = 'unicode61 remove_diacritics 2')"
+            )
+        except sqlite3.OperationalError as e:
+            logging.warning(f"Full-text search unavailable, falling back to LIKE scans: {e}")
+            return False
+        
+        for statement in _SEARCH_INDEX_TRIGGERS:
+            self.cursor.execute(statement)
+        if not exists:
+            self.rebuild_search_index()
+        return True
+    
+    def rebuild_search_index(self):
+        """Refill the full-text index from listings and listing_details."""
+        self.cursor.execute("DELETE FROM listings_fts")
+        self.cursor.execute(
+            "INSERT INTO listings_fts (rowid, title, description) "
+            "SELECT listings.rowid, listings.title, listing_details.description FROM listings "
+            "LEFT JOIN listing_details ON listing_details.id = listings.id"
+        )
+        self._commit()
+        
+    def _commit(self):
+        # Inside run_batch the whole group commits at once
+        if not self.in_batch:
+            self.conn.commit()
+    
+    def _rollback(self):
+        if self.in_batch:
+            self.cursor.execute("ROLLBACK TO SAVEPOINT batch_call")
+        else:
+            self.conn.rollback()
+    
+    def run_batch(self, calls):
+        """Run (method name, args, kwargs) calls in one transaction with a single commit.
+        
+        Each call runs in its own savepoint, so a call that fails is rolled back without
+        affecting the others. Returns (ok, result or exception) per call, in order.
+        """
+        outcomes = []
+        self.in_batch = True
+        try:
+            if not self.conn.in_transaction:
+                self.cursor.execute("BEGIN")
+            for name, args, kwargs in calls:
+                self.cursor.execute("SAVEPOINT batch_call")
+                try:
+                    outcomes.append((True, getattr(self, name)(*args, **kwargs)))
+                except Exception as e:
+                    self.cursor.execute("ROLLBACK TO SAVEPOINT batch_call")
+                    outcomes.append((False, e))
+                self.cursor.execute("RELEASE SAVEPOINT batch_call")
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+        finally:
+            self.in_batch = False
+        return outcomes
+    
+    def _add_column_if_missing(self, table, column, column_type):
+        self.cursor.execute(f"PRAGMA table_info({table})")
+        if column not in {row[1] for row in self.cursor.fetchall()}:
+            self.cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
         
     def item_exists(self, item_id):
         """Check if an item already exists in the database."""
         self.cursor.execute("SELECT id FROM listings WHERE id = ?", (item_id,))
         return self.cursor.fetchone() is not None
+    
+    def existing_ids(self, item_ids):
+        """Return the subset of item_ids already in the database."""
+        existing = set()
+        item_ids = list(item_ids)
+        for start in range(0, len(item_ids), 500):
+            chunk = item_ids[start:start + 500]
+            placeholders = ", ".join("?" for _ in chunk)
+            self.cursor.execute(f"SELECT id FROM listings WHERE id IN ({placeholders})", chunk)
+            existing.update(row[0] for row in self.cursor.fetchall())
+        return existing
         
     def add_item(self, item_id, title, price, url, location):
         """Add a new item to the database."""
+        now = datetime.now()
         try:
             self.cursor.execute(
-                "INSERT INTO listings VALUES (?, ?, ?, ?, ?, ?)",
-                (item_id, title, price, url, location, datetime.now())
+                "INSERT INTO listings (id, title, price, url, location, discovered_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (item_id, title, price, url, location, now)
             )
-            self.conn.commit()
-            logging.info(f"Added new item to database: {title} (${price})")
+            self._record_first_prices(now)
+            self._commit()
+            logging.info("Added new item to database: %s ($%s)", title, price)
             return True
         except sqlite3.Error as e:
             logging.error(f"Database error when adding item: {e}")
             return False
             
-    def log_search(self, search_terms, items_found, new_items, status="completed"):
-        """Log a search attempt to the database."""
+    def add_items_with_notifications(self, items, notifications, title_signatures=(), image_hashes=()):
+        """Insert new listings, their outbox notifications and their repost index rows in one transaction.
+        
+        items are (id, title, price, url, location) tuples; notifications are
+        (idempotency_key, recipient, subject, body) tuples. A notification whose key is
+        already in the outbox is ignored. title_signatures are (id, signature, bucket_keys,
+        price, repost_of) entries and image_hashes (id, phash, image_url) rows, so the repost
+        indexes never hold a listing that was not stored.
+        """
+        now = datetime.now()
+        try:
+            self.cursor.executemany(
+                "INSERT OR IGNORE INTO listings (id, title, price, url, location, discovered_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [(*item, now) for item in items]
+            )
+            self._record_first_prices(now)
+            self._insert_notifications(notifications, now)
+            for entry in title_signatures:
+                self._insert_title_signature(*entry)
+            self.cursor.executemany("INSERT OR REPLACE INTO image_hashes VALUES (?, ?, ?)", image_hashes)
+            self._commit()
+            for _, title, price, _, _ in items:
+                logging.info("Added new item to database: %s ($%s)", title, price)
+            return True
+        except sqlite3.Error as e:
+            self._rollback()
+            logging.error(f"Database error when adding items: {e}")
+            return False
+    
+    def enqueue_notifications(self, notifications):
+        """Queue (idempotency_key, recipient, subject, body) notifications for the outbox sender."""
+        try:
+            self._insert_notifications(notifications, datetime.now())
+            self._commit()
+            return True
+        except sqlite3.Error as e:
+            self._rollback()
+            logging.error(f"Database error when queueing notifications: {e}")
+            return False
+    
+    def _insert_notifications(self, notifications, now):
+        self.cursor.executemany(
+            "INSERT OR IGNORE INTO outbox (idempotency_key, recipient, subject, body, status, attempts, next_attempt_at, created_at) "
+            "VALUES (?, ?, ?, ?, 'pending', 0, ?, ?)",
+            [(*notification, now, now) for notification in notifications]
+        )
+    
+    def get_due_notifications(self, limit=20):
+        """Return pending outbox rows whose next attempt is due, oldest first."""
+        self.cursor.execute(
+            "SELECT id, idempotency_key, recipient, subject, body, attempts, delivered_to FROM outbox "
+            "WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?",
+            (datetime.now(), limit)
+        )
+        columns = [description[0] for description in self.cursor.description]
+        return [dict(zip(columns, row)) for row in self.cursor.fetchall()]
+    
+    def mark_notification_sent(self, notification_id, delivered_to=None):
+        self.cursor.execute(
+            "UPDATE outbox SET status = 'sent', sent_at = ?, attempts = attempts + 1, delivered_to = COALESCE(?, delivered_to) WHERE id = ?",
+            (datetime.now(), delivered_to, notification_id)
+        )
+        self._commit()
+    
+    def reschedule_notification(self, notification_id, next_attempt_at, error=None, count_attempt=True, failed=False,
+                                delivered_to=None):
+        """Push a notification's next attempt back, or give up on it when failed is set."""
+        self.cursor.execute(
+            "UPDATE outbox SET status = ?, next_attempt_at = ?, attempts = attempts + ?, last_error = COALESCE(?, last_error), "
+            "delivered_to = COALESCE(?, delivered_to) WHERE id = ?",
+            ('failed' if failed else 'pending', next_attempt_at, 1 if count_attempt else 0, error, delivered_to, notification_id)
+        )
+        self._commit()
+    
+    def get_outbox_counts(self):
+        """Return {status: count} for the outbox."""
+        self.cursor.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status")
+        return dict(self.cursor.fetchall())
+    
+    def get_last_prices(self):
+        """Return (id, price) for every listing, taking the latest recorded price change over the original price."""
+        self.cursor.execute(
+            "SELECT listings.id, COALESCE(latest.price, listings.price) FROM listings "
+            "LEFT JOIN (SELECT id, price, MAX(seen_at) FROM price_history GROUP BY id) AS latest "
+            "ON latest.id = listings.id"
+        )
+        return self.cursor.fetchall()
+    
+    def _record_first_prices(self, discovered_at):
+        # The price a listing was stored with starts its history, since listings.price follows later changes
+        self.cursor.execute(
+            "INSERT INTO price_history (id, price, seen_at) "
+            "SELECT id, price, discovered_at FROM listings WHERE discovered_at = ? AND price IS NOT NULL",
+            (discovered_at,)
+        )
+    
+    def record_price_changes(self, changes, notifications=()):
+        """Record (id, price) changes and their drop notifications in one transaction.
+        
+        Each change is appended to price_history and becomes the listing's current price. A listing
+        stored before first prices were recorded gets its stored price added as the first entry.
+        """
+        now = datetime.now()
+        try:
+            self.cursor.executemany(
+                "INSERT INTO price_history (id, price, seen_at) "
+                "SELECT id, price, discovered_at FROM listings "
+                "WHERE id = ? AND price IS NOT NULL AND NOT EXISTS (SELECT 1 FROM price_history WHERE id = ?)",
+                [(item_id, item_id) for item_id, _ in changes]
+            )
+            self.cursor.executemany(
+                "INSERT INTO price_history (id, price, seen_at) VALUES (?, ?, ?)",
+                [(item_id, price, now) for item_id, price in changes]
+            )
+            self.cursor.executemany(
+                "UPDATE listings SET price = ? WHERE id = ?",
+                [(price, item_id) for item_id, price in changes]
+            )
+            self._insert_notifications(notifications, now)
+            self._commit()
+            return True
+        except sqlite3.Error as e:
+            self._rollback()
+            logging.error(f"Database error when recording price changes: {e}")
+            return False
+    
+    def get_price_sketches(self):
+        """Return (query, sketch bytes) for every stored price sketch."""
+        self.cursor.execute("SELECT query, sketch FROM price_sketches")
+        return self.cursor.fetchall()
+    
+    def save_price_sketch(self, query, sketch):
         try:
             self.cursor.execute(
-                "INSERT INTO searches (timestamp, search_terms, items_found, new_items, status) VALUES (?, ?, ?, ?, ?)",
-                (datetime.now(), search_terms, items_found, new_items, status)
+                "INSERT OR REPLACE INTO price_sketches VALUES (?, ?, ?)",
+                (query, sketch, datetime.now())
             )
-            self.conn.commit()
+            self._commit()
+            return True
+        except sqlite3.Error as e:
+            logging.error(f"Database error when saving price sketch: {e}")
+            return False
+    
+    def get_extraction_stats(self):
+        """Return every strategy's totals as dicts, the all-searches ('*') rows included."""
+        self.cursor.execute(
+            "SELECT strategy, search_key, attempts, successes, total_ms, last_success_at FROM extraction_stats "
+            "ORDER BY search_key, strategy"
+        )
+        columns = [description[0] for description in self.cursor.description]
+        return [dict(zip(columns, row)) for row in self.cursor.fetchall()]
+    
+    def record_extraction_attempt(self, strategy, search_key, success, elapsed_ms):
+        """Add one attempt to the strategy's totals for search_key and for all searches."""
+        last_success_at = datetime.now() if success else None
+        try:
+            for key in {search_key, '*'}:
+                self.cursor.execute(
+                    "INSERT INTO extraction_stats VALUES (?, ?, 1, ?, ?, ?) "
+                    "ON CONFLICT (strategy, search_key) DO UPDATE SET "
+                    "attempts = attempts + 1, successes = successes + excluded.successes, "
+                    "total_ms = total_ms + excluded.total_ms, "
+                    "last_success_at = COALESCE(excluded.last_success_at, last_success_at)",
+                    (strategy, key, int(success), elapsed_ms, last_success_at)
+                )
+            self._commit()
+            return True
+        except sqlite3.Error as e:
+            self._rollback()
+            logging.error(f"Database error when recording extraction attempt: {e}")
+            return False
+    
+    def get_result_snapshot(self, query):
+        """Return (ids, misses) blobs of the query's last result snapshot, or None."""
+        self.cursor.execute("SELECT ids, misses FROM result_snapshots WHERE query = ?", (query,))
+        return self.cursor.fetchone()
+    
+    def mark_listings_seen(self, ids, now):
+        """Set last_seen_at on the listings a page showed, and clear removed_at on them."""
+        try:
+            self._mark_seen(ids, now)
+            self._commit()
+            return True
+        except sqlite3.Error as e:
+            self._rollback()
+            logging.error(f"Database error when marking listings seen: {e}")
+            return False
+    
+    def _mark_seen(self, ids, now):
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ", ".join("?" for _ in chunk)
+            self.cursor.execute(
+                f"UPDATE listings SET last_seen_at = ?, removed_at = NULL WHERE id IN ({placeholders})",
+                [now, *chunk]
+            )
+    
+    def save_result_snapshot(self, query, ids, misses, removed, seen, now):
+        """Store a query's snapshot and update the listings it covers, in one transaction.
+        
+        IDs in seen get last_seen_at set and removed_at cleared. Removed IDs get removed_at set
+        unless some query has seen them since this query's previous snapshot.
+        """
+        try:
+            self.cursor.execute("SELECT updated_at FROM result_snapshots WHERE query = ?", (query,))
+            row = self.cursor.fetchone()
+            previous = row[0] if row else now
+            self.cursor.execute(
+                "INSERT OR REPLACE INTO result_snapshots VALUES (?, ?, ?, ?)",
+                (query, ids, misses, now)
+            )
+            for start in range(0, len(removed), 500):
+                chunk = removed[start:start + 500]
+                placeholders = ", ".join("?" for _ in chunk)
+                self.cursor.execute(
+                    f"UPDATE listings SET removed_at = ? WHERE removed_at IS NULL "
+                    f"AND (last_seen_at IS NULL OR last_seen_at <= ?) AND id IN ({placeholders})",
+                    [now, previous, *chunk]
+                )
+            self._mark_seen(seen, now)
+            self._commit()
+            return True
+        except sqlite3.Error as e:
+            self._rollback()
+            logging.error(f"Database error when saving result snapshot: {e}")
+            return False
+    
+    def log_search(self, search_terms, items_found, new_items, status="completed", duration_ms=None, query_id=None):
+        """Log a search attempt to the database.
+        
+        status is 'completed', 'timeout' or 'failed'; duration_ms is how long fetching its page took.
+        query_id is subscriptions.query_id of the full query the search ran.
+        """
+        try:
+            self.cursor.execute(
+                "INSERT INTO searches (timestamp, search_terms, items_found, new_items, status, duration_ms, query_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (datetime.now(), search_terms, items_found, new_items, status, duration_ms, query_id)
+            )
+            self._commit()
             return True
         except sqlite3.Error as e:
             logging.error(f"Database error when logging search: {e}")
             return False
     
+    def get_listing_details(self, item_ids, ttl_hours=168):
+        """Return cached detail-page data for the given IDs that is younger than the TTL."""
+        details = {}
+        cutoff = datetime.now() - timedelta(hours=ttl_hours)
+        item_ids = list(item_ids)
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(item_ids), 500):
+            chunk = item_ids[start:start + 500]
+            placeholders = ", ".join("?" for _ in chunk)
+            self.cursor.execute(
+                f"SELECT id, location, description, seller, posted_at FROM listing_details WHERE id IN ({placeholders}) AND fetched_at >= ?",
+                (*chunk, cutoff)
+            )
+            for item_id, location, description, seller, posted_at in self.cursor.fetchall():
+                details[item_id] = {
+                    'location': location,
+                    'description': description,
+                    'seller': seller,
+                    'posted_at': posted_at
+                }
+        return details
+    
+    def save_listing_details(self, item_id, details):
+        """Store (or refresh) detail-page data for a listing."""
+        try:
+            self.cursor.execute(
+                "INSERT OR REPLACE INTO listing_details VALUES (?, ?, ?, ?, ?, ?)",
+                (item_id, details.get('location'), details.get('description'),
+                 details.get('seller'), details.get('posted_at'), datetime.now())
+            )
+            self._commit()
+            return True
+        except sqlite3.Error as e:
+            logging.error(f"Database error when saving listing details: {e}")
+            return False
+    
+    def find_title_candidates(self, bucket_keys):
+        """Return (id, signature, price) for indexed listings sharing any LSH bucket."""
+        placeholders = ", ".join("?" for _ in bucket_keys)
+        self.cursor.execute(
+            f"SELECT id, signature, price FROM listing_signatures WHERE signature IS NOT NULL AND id IN "
+            f"(SELECT id FROM lsh_buckets WHERE bucket IN ({placeholders}))",
+            tuple(bucket_keys)
+        )
+        return self.cursor.fetchall()
+    
+    def add_title_signature(self, item_id, signature, bucket_keys, price, repost_of=None):
+        """Add one listing to the title index."""
+        try:
+            self._insert_title_signature(item_id, signature, bucket_keys, price, repost_of)
+            self._commit()
+            return True
+        except sqlite3.Error as e:
+            logging.error(f"Database error when indexing listing title: {e}")
+            return False
+    
+    def add_title_signatures(self, entries):
+        """Add a batch of (id, signature, bucket_keys, price) entries to the title index in one transaction."""
+        try:
+            for item_id, signature, bucket_keys, price in entries:
+                self._insert_title_signature(item_id, signature, bucket_keys, price)
+            self._commit()
+            return True
+        except sqlite3.Error as e:
+            self._rollback()
+            logging.error(f"Database error when indexing listing titles: {e}")
+            return False
+    
+    def _insert_title_signature(self, item_id, signature, bucket_keys, price, repost_of=None):
+        self.cursor.execute(
+            "INSERT OR REPLACE INTO listing_signatures VALUES (?, ?, ?, ?)",
+            (item_id, signature, price, repost_of)
+        )
+        self.cursor.executemany(
+            "INSERT OR IGNORE INTO lsh_buckets VALUES (?, ?)",
+            [(key, item_id) for key in bucket_keys]
+        )
+    
+    def get_unindexed_listings(self, limit=1000):
+        """Return (id, title, price) for listings missing from the title index."""
+        self.cursor.execute(
+            "SELECT l.id, l.title, l.price FROM listings l LEFT JOIN listing_signatures s ON s.id = l.id "
+            "WHERE s.id IS NULL LIMIT ?",
+            (limit,)
+        )
+        return self.cursor.fetchall()
+    
+    def clear_title_index(self):
+        """Drop all title signatures so the index can be rebuilt from the listings table."""
+        self.cursor.execute("DELETE FROM lsh_buckets")
+        self.cursor.execute("DELETE FROM listing_signatures")
+        self._commit()
+    
+    def get_image_hashes(self):
+        """Return (id, phash) for every stored thumbnail hash."""
+        self.cursor.execute("SELECT id, phash FROM image_hashes")
+        return self.cursor.fetchall()
+    
+    def add_image_hash(self, item_id, phash, image_url):
+        """Store the perceptual hash of a listing's thumbnail."""
+        try:
+            self.cursor.execute(
+                "INSERT OR REPLACE INTO image_hashes VALUES (?, ?, ?)",
+                (item_id, phash, image_url)
+            )
+            self._commit()
+            return True
+        except sqlite3.Error as e:
+            logging.error(f"Database error when adding image hash: {e}")
+            return False
+    
+    def add_subscription(self, recipient, keywords, location="", min_price=0, max_price=0, rules="{}"):
+        """Subscribe a recipient to a query and return the new subscription ID."""
+        self.cursor.execute(
+            "INSERT INTO subscriptions (recipient, keywords, location, min_price, max_price, rules, active, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, 1, ?)",
+            (recipient, keywords, location, min_price, max_price, rules, datetime.now())
+        )
+        self._commit()
+        return self.cursor.lastrowid
+    
+    def get_subscriptions(self, active_only=True):
+        """Return subscriptions as dicts."""
+        query = "SELECT id, recipient, keywords, location, min_price, max_price, rules FROM subscriptions"
+        if active_only:
+            query += " WHERE active = 1"
+        self.cursor.execute(query)
+        columns = [description[0] for description in self.cursor.description]
+        return [dict(zip(columns, row)) for row in self.cursor.fetchall()]
+    
+    def remove_subscription(self, subscription_id):
+        """Delete a subscription."""
+        self.cursor.execute("DELETE FROM subscriptions WHERE id = ?", (subscription_id,))
+        self._commit()
+    
     def get_recent_searches(self, limit=5):
         """Get recent search logs."""
         self.cursor.execute(
@@ -87,7 +775,243 @@ class DatabaseManager:
         )
         return self.cursor.fetchall()
         
+    def get_listings_page(self, limit=50, after=None, min_price=None, max_price=None, since=None, until=None,
+                          title=None):
+        """Return up to limit listings, newest first, as dicts.
+        
+        after is the (discovered_at, id) of the last row of the previous page, so later pages
+        seek through the index instead of skipping over an OFFSET.
+        """
+        query = "SELECT id, title, price, url, location, discovered_at, removed_at FROM listings"
+        conditions, params = self._listing_filters(min_price, max_price, since, until)
+        if after:
+            conditions.append("(discovered_at, id) < (?, ?)")
+            params.extend(after)
+        if title and self.has_search_index:
+            conditions.append("rowid IN (SELECT rowid FROM listings_fts WHERE listings_fts MATCH ?)")
+            params.append(fts_query(title))
+        elif title:
+            conditions.append("title LIKE ? ESCAPE '\\'")
+            params.append("%" + title.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY discovered_at DESC, id DESC LIMIT ?"
+        params.append(limit)
+        
+        self.cursor.execute(query, params)
+        columns = [description[0] for description in self.cursor.description]
+        return [dict(zip(columns, row)) for row in self.cursor.fetchall()]
+    
+    def search_listings(self, text, limit=50, min_price=None, max_price=None, since=None, until=None):
+        """Return up to limit listings whose title or description contains every word of text, best match first.
+        
+        The full-text index finds the matching rows, so only those are checked against the price and
+        date filters. Without FTS5 this falls back to a newest-first title scan.
+        """
+        if not self.has_search_index:
+            return self.get_listings_page(limit, min_price=min_price, max_price=max_price, since=since,
+                                          until=until, title=text)
+        
+        conditions, params = self._listing_filters(min_price, max_price, since, until, "listings.")
+        query = (
+            "SELECT listings.id, listings.title, listings.price, listings.url, listings.location, "
+            "listings.discovered_at, listings.removed_at FROM listings_fts JOIN listings ON listings.rowid = listings_fts.rowid "
+            "WHERE listings_fts MATCH ?"
+        )
+        query += "".join(f" AND {condition}" for condition in conditions)
+        query += " ORDER BY listings_fts.rank LIMIT ?"
+        
+        self.cursor.execute(query, [fts_query(text), *params, limit])
+        columns = [description[0] for description in self.cursor.description]
+        return [dict(zip(columns, row)) for row in self.cursor.fetchall()]
+    
+    def _listing_filters(self, min_price, max_price, since, until, prefix=""):
+        conditions, params = [], []
+        if min_price is not None:
+            conditions.append(f"{prefix}price >= ?")
+            params.append(min_price)
+        if max_price is not None:
+            conditions.append(f"{prefix}price <= ?")
+            params.append(max_price)
+        if since is not None:
+            conditions.append(f"{prefix}discovered_at >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append(f"{prefix}discovered_at < ?")
+            params.append(until)
+        return conditions, params
+    
+    def get_searches_page(self, limit=50, before_id=None, search_terms=None):
+        """Return up to limit search log rows, newest first, as dicts."""
+        query = "SELECT id, timestamp, search_terms, items_found, new_items, status, duration_ms FROM searches"
+        conditions, params = [], []
+        if before_id is not None:
+            conditions.append("id < ?")
+            params.append(before_id)
+        if search_terms:
+            conditions.append("search_terms = ?")
+            params.append(search_terms)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        
+        self.cursor.execute(query, params)
+        columns = [description[0] for description in self.cursor.description]
+        return [dict(zip(columns, row)) for row in self.cursor.fetchall()]
+    
+    def get_search_stats(self):
+        """Return per-search-terms totals from the search log, with median and p99 page load times."""
+        self.cursor.execute(
+            "SELECT search_terms, COUNT(*) AS runs, SUM(items_found) AS items_found, SUM(new_items) AS new_items, "
+            "SUM(status != 'completed') AS failed_runs, SUM(status = 'timeout') AS timeouts, "
+            "MAX(timestamp) AS last_run "
+            "FROM searches GROUP BY search_terms ORDER BY last_run DESC"
+        )
+        columns = [description[0] for description in self.cursor.description]
+        stats = [dict(zip(columns, row)) for row in self.cursor.fetchall()]
+        
+        self.cursor.execute(
+            "SELECT search_terms, duration_ms FROM searches WHERE duration_ms IS NOT NULL "
+            "ORDER BY search_terms, duration_ms"
+        )
+        durations = {}
+        for search_terms, duration_ms in self.cursor.fetchall():
+            durations.setdefault(search_terms, []).append(duration_ms)
+        for row in stats:
+            values = durations.get(row['search_terms'])
+            row['p50_ms'] = _nearest_rank(values, 50)
+            row['p99_ms'] = _nearest_rank(values, 99)
+        return stats
+    
+    def get_table_columns(self, table):
+        """Return [(name, declared type)] for a table's columns."""
+        self.cursor.execute(f"PRAGMA table_info({table})")
+        return [(row[1], row[2]) for row in self.cursor.fetchall()]
+    
+    def iter_rows(self, table, order_column, since=None, batch_size=1000):
+        """Yield lists of up to batch_size row tuples from table, ordered by order_column.
+        
+        Rows are fetched with fetchmany on a cursor of their own, so only one batch is held in
+        memory and other queries can run between batches. since keeps rows after a watermark.
+        """
+        query = f"SELECT * FROM {table}"
+        params = []
+        if since is not None:
+            query += f" WHERE {order_column} > ?"
+            params.append(since)
+        query += f" ORDER BY {order_column}"
+        
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+    
+    def get_search_history(self, since):
+        """Return (timestamp, query_id, new_items, status) for searches since a time, oldest first."""
+        self.cursor.execute(
+            "SELECT timestamp, query_id, new_items, status FROM searches WHERE timestamp >= ? ORDER BY timestamp",
+            (since,)
+        )
+        return self.cursor.fetchall()
+    
+    def get_data_version(self):
+        """A value that changes whenever listings or searches are inserted, by this or any other connection.
+        
+        PRAGMA data_version is not used: it differs from one connection to the next, so readers in
+        a pool would never agree on it.
+        """
+        self.cursor.execute(
+            "SELECT (SELECT MAX(rowid) FROM listings), (SELECT MAX(id) FROM searches)"
+        )
+        return tuple(self.cursor.fetchone())
+    
+    def prune_rows(self, table, before, limit=500, archive_path=None):
+        """Delete up to limit rows of table older than before, and return how many went.
+        
+        Listings take their details, title signatures, image hashes and price history with them.
+        With archive_path the rows are first appended, zlib-compressed, to that archive database.
+        """
+        column = RETENTION_COLUMNS[table]
+        condition = f"{column} < ?"
+        if table in _RETENTION_CONDITIONS:
+            condition += f" AND {_RETENTION_CONDITIONS[table]}"
+        # Ordered so a retried batch holds the same rows and archives to the same digest
+        self.cursor.execute(
+            f"SELECT rowid, * FROM {table} WHERE {condition} ORDER BY rowid LIMIT ?",
+            [before] * condition.count("?") + [limit]
+        )
+        columns = [description[0] for description in self.cursor.description][1:]
+        rows = self.cursor.fetchall()
+        if not rows:
+            return 0
+        
+        try:
+            if table == 'listings':
+                ids = [row[1 + columns.index('id')] for row in rows]
+                placeholders = ", ".join("?" for _ in ids)
+                for dependent in _LISTING_DEPENDENTS:
+                    self.cursor.execute(f"DELETE FROM {dependent} WHERE id IN ({placeholders})", ids)
+            placeholders = ", ".join("?" for _ in rows)
+            self.cursor.execute(f"DELETE FROM {table} WHERE rowid IN ({placeholders})", [row[0] for row in rows])
+            # The archive is another database, so it commits between the deletes and their commit
+            if archive_path:
+                self._archive_rows(archive_path, table, columns, [row[1:] for row in rows])
+            self._commit()
+        except sqlite3.Error as e:
+            self._rollback()
+            logging.error(f"Database error when pruning {table}: {e}")
+            return 0
+        return len(rows)
+    
+    def _archive_rows(self, archive_path, table, columns, rows):
+        archive = self.archives.get(archive_path)
+        if archive is None:
+            archive = self.archives[archive_path] = sqlite3.connect(archive_path)
+            archive.execute('''
+            CREATE TABLE IF NOT EXISTS archived_rows (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                table_name TEXT,
+                archived_at TIMESTAMP,
+                row_count INTEGER,
+                columns TEXT,
+                data BLOB,
+                digest TEXT
+            )
+            ''')
+            # Archives written before batches carried a digest get the column added
+            if 'digest' not in [column[1] for column in archive.execute("PRAGMA table_info(archived_rows)")]:
+                archive.execute("ALTER TABLE archived_rows ADD COLUMN digest TEXT")
+            archive.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_archived_rows_digest ON archived_rows(digest)")
+        data = zlib.compress(json.dumps(rows, default=str).encode(), 9)
+        # A batch whose delete failed after it was archived comes back identical; it is stored once
+        digest = hashlib.sha256(table.encode() + data).hexdigest()
+        archive.execute(
+            "INSERT OR IGNORE INTO archived_rows (table_name, archived_at, row_count, columns, data, digest) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (table, datetime.now(), len(rows), json.dumps(columns), data, digest)
+        )
+        archive.commit()
+    
+    def incremental_vacuum(self, pages=0):
+        """Hand up to pages free pages back to the filesystem (all of them when 0); returns how many were freed."""
+        self.cursor.execute("PRAGMA freelist_count")
+        before = self.cursor.fetchone()[0]
+        # The pragma frees one page per result row, so it only runs to completion once they are all read
+        self.cursor.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+        self._commit()
+        self.cursor.execute("PRAGMA freelist_count")
+        return before - self.cursor.fetchone()[0]
+    
     def close(self):
         """Close the database connection."""
+        for archive in self.archives.values():
+            archive.close()
         if self.conn:
             self.conn.close()
\ No newline at end of file
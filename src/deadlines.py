@@ -0,0 +1,56 @@
+import asyncio
+import contextlib
+
+# Messages of Playwright errors that come from the page or connection rather than the search
+TRANSIENT_MARKERS = (
+    "net::ERR_",
+    "Target closed",
+    "has been closed",
+    "Execution context was destroyed",
+    "Navigation failed because page crashed",
+)
+
+
+class StageTimeout(TimeoutError):
+    """Raised when a stage runs past its time budget."""
+
+    def __init__(self, stage, seconds):
+        super().__init__(f"{stage} took longer than {seconds:g}s")
+        self.stage = stage
+        self.seconds = seconds
+
+
+@contextlib.asynccontextmanager
+async def stage(name, seconds):
+    """Cancel the block after seconds and raise StageTimeout; a budget of 0 or None leaves it unbounded.
+
+    Stages nest: only the one whose own deadline expired turns the cancellation into StageTimeout,
+    an inner stage's StageTimeout passes through the outer ones unchanged.
+    """
+    if not seconds:
+        yield
+        return
+    deadline = asyncio.timeout(seconds)
+    try:
+        async with deadline:
+            yield
+    except TimeoutError as e:
+        if deadline.expired() and not isinstance(e, StageTimeout):
+            raise StageTimeout(name, seconds) from e
+        raise
+
+
+def is_timeout(error):
+    # Playwright's TimeoutError is not a subclass of the built-in one, so it is matched by name
+    return isinstance(error, TimeoutError) or type(error).__name__ == "TimeoutError"
+
+
+def is_transient(error):
+    """Whether retrying on a fresh page is likely to work: timeouts, dropped connections, crashed pages.
+
+    Anything else, such as a bad search URL or a changed login flow, will fail the same way again.
+    """
+    if is_timeout(error) or isinstance(error, ConnectionError):
+        return True
+    message = str(error)
+    return any(marker in message for marker in TRANSIENT_MARKERS)
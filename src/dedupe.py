@@ -0,0 +1,160 @@
+import hashlib
+import logging
+import operator
+import random
+import re
+import unicodedata
+from array import array
+
+# Signature layout is baked into the persisted index; changing these requires DatabaseManager.clear_title_index()
+NUM_PERM = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+
+# Fixed seed so signatures stay comparable across restarts. Each "permutation" XORs the 64-bit
+# shingle hashes with a random mask, which keeps the min() loop in C.
+_rng = random.Random(1337)
+_PERMUTATION_MASKS = [_rng.getrandbits(64) for _ in range(NUM_PERM)]
+
+# Filler words sellers add or drop between reposts
+STOP_WORDS = {
+    'a', 'an', 'and', 'the', 'for', 'with', 'in', 'of', 'obo', 'firm', 'sale',
+    'selling', 'new', 'like', 'great', 'condition', 'must', 'go', 'price', 'reduced'
+}
+
+
+def normalize_title(title):
+    """Lowercase, strip accents and punctuation, and drop filler words."""
+    if not title:
+        return ""
+    title = unicodedata.normalize('NFKD', title)
+    title = "".join(ch for ch in title if not unicodedata.combining(ch)).lower()
+    words = re.findall(r"[a-z0-9]+", title)
+    return " ".join(word for word in words if word not in STOP_WORDS)
+
+
+def _hash64(text):
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), 'little')
+
+
+def shingles(normalized_title):
+    """Character shingles of a normalized title, hashed to 64-bit integers."""
+    text = normalized_title.replace(" ", "")
+    if len(text) <= SHINGLE_SIZE:
+        return {_hash64(text)} if text else set()
+    return {_hash64(text[i:i + SHINGLE_SIZE]) for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def minhash_signature(title):
+    """Compute the MinHash signature of a title, or None when there is nothing to hash."""
+    hashed_shingles = shingles(normalize_title(title))
+    if not hashed_shingles:
+        return None
+    return array('Q', [min(map(mask.__xor__, hashed_shingles)) for mask in _PERMUTATION_MASKS])
+
+
+def band_keys(signature):
+    """Hash each band of a signature to a signed 64-bit key suitable for an SQLite INTEGER column."""
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(rows.tobytes(), digest_size=8, person=band.to_bytes(2, 'little')).digest()
+        keys.append(int.from_bytes(digest, 'little', signed=True))
+    return keys
+
+
+def estimate_similarity(signature_a, signature_b):
+    """Estimate the Jaccard similarity of two titles from their signatures."""
+    return sum(map(operator.eq, signature_a, signature_b)) / NUM_PERM
+
+
+def signature_to_blob(signature):
+    return signature.tobytes()
+
+
+def signature_from_blob(blob):
+    signature = array('Q')
+    signature.frombytes(blob)
+    return signature
+
+
+class RepostDetector:
+    """Flags listings whose title and price closely match a listing we have already seen."""
+
+    def __init__(self, db, similarity_threshold=0.6, price_tolerance=0.15):
+        self.db = db
+        self.similarity_threshold = similarity_threshold
+        self.price_tolerance = price_tolerance
+
+    def _price_matches(self, price, other_price):
+        if not price or not other_price:
+            return True
+        return abs(price - other_price) <= self.price_tolerance * max(price, other_price)
+
+    async def find_repost(self, item, pending=()):
+        """Return the ID of the listing this item most likely reposts, or None.
+
+        pending holds index_entry() tuples of listings in the same batch that are not stored yet.
+        """
+        signature = minhash_signature(item.title)
+        if signature is None:
+            return None
+
+        keys = band_keys(signature)
+        candidates = await self.db.find_title_candidates(keys)
+        key_set = set(keys)
+        candidates.extend(
+            (entry_id, blob, price) for entry_id, blob, entry_keys, price, _ in pending
+            if key_set.intersection(entry_keys)
+        )
+
+        best_id = None
+        best_similarity = self.similarity_threshold
+        for candidate_id, blob, candidate_price in candidates:
+            if candidate_id == item.id or not self._price_matches(item.price or 0, candidate_price):
+                continue
+            similarity = estimate_similarity(signature, signature_from_blob(blob))
+            if similarity >= best_similarity:
+                best_id, best_similarity = candidate_id, similarity
+
+        return best_id
+
+    def index_entry(self, item, repost_of=None):
+        """The (id, signature, bucket keys, price, repost_of) title index entry for a listing, or None."""
+        signature = minhash_signature(item.title)
+        if signature is None:
+            return None
+        return item.id, signature_to_blob(signature), band_keys(signature), item.price or 0, repost_of
+
+    async def add(self, item, repost_of=None):
+        """Index a stored listing so later reposts of it can be found."""
+        entry = self.index_entry(item, repost_of)
+        if entry is None:
+            return False
+        return await self.db.add_title_signature(*entry)
+
+    async def index_missing(self, batch_size=1000):
+        """Incrementally index listings that are in the database but not yet in the title index."""
+        indexed = 0
+        while True:
+            rows = await self.db.get_unindexed_listings(batch_size)
+            if not rows:
+                break
+            entries = []
+            for item_id, title, price in rows:
+                signature = minhash_signature(title)
+                # Untitled listings still get a row so they are not rescanned every batch
+                entries.append((
+                    item_id,
+                    signature_to_blob(signature) if signature is not None else None,
+                    band_keys(signature) if signature is not None else [],
+                    price
+                ))
+            if not await self.db.add_title_signatures(entries):
+                break
+            indexed += len(entries)
+
+        if indexed:
+            logging.info(f"Indexed {indexed} existing listings for repost detection")
+        return indexed
@@ -0,0 +1,254 @@
+import abc
+import asyncio
+import http.client
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+
+class HTTPConnectionPool:
+    """Keep-alive HTTP(S) connections to one host, reused across requests from worker threads."""
+
+    def __init__(self, url, size=4, timeout=10):
+        parts = urlsplit(url)
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.timeout = timeout
+        self.size = size
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _new_connection(self):
+        if self.scheme == 'https':
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def request(self, method, path, body=None, headers=None):
+        """Send a request and return (status, body). Blocking; call from a worker thread."""
+        with self._lock:
+            connection = self._idle.pop() if self._idle else self._new_connection()
+        try:
+            try:
+                connection.request(method, path, body=body, headers=headers or {})
+                response = connection.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # The server closed an idle keep-alive connection; retry once on a fresh one
+                connection.close()
+                connection = self._new_connection()
+                connection.request(method, path, body=body, headers=headers or {})
+                response = connection.getresponse()
+            data = response.read()
+        except Exception:
+            connection.close()
+            raise
+
+        if response.will_close:
+            connection.close()
+        else:
+            with self._lock:
+                if len(self._idle) < self.size:
+                    self._idle.append(connection)
+                    connection = None
+            if connection:
+                connection.close()
+        return response.status, data
+
+    def close(self):
+        with self._lock:
+            for connection in self._idle:
+                connection.close()
+            self._idle = []
+
+
+# Alert kinds, the idempotency key's prefix, that may go to shared channels such as a team chat
+BROADCAST_KINDS = ('item', 'drop')
+
+
+class Notifier(abc.ABC):
+    """A notification backend. Subclasses implement deliver_sync, which runs on the backend's own threads."""
+
+    # Whether the backend delivers to the alert's own recipient; the others post to one shared channel
+    addressed = False
+
+    def __init__(self, name, timeout=10, max_concurrency=4):
+        self.name = name
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        # Each backend gets its own threads, so a slow endpoint cannot starve the others
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix=f"notifier-{name}")
+        self.semaphore = None
+        # Deliveries by idempotency key that timed out while their thread kept going
+        self.in_flight = {}
+
+    @abc.abstractmethod
+    def deliver_sync(self, alert):
+        """Deliver one alert; blocking, raises on failure."""
+
+    async def deliver(self, alert):
+        """Deliver on a worker thread, raising TimeoutError after timeout.
+
+        A timed-out thread cannot be stopped, so a retry of the same alert waits on that delivery
+        instead of starting another; if it succeeded late, the retry succeeds without sending twice.
+        """
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        key = alert.get('idempotency_key')
+        async with self.semaphore:
+            future = self.in_flight.pop(key, None)
+            if future is None or (future.done() and future.exception() is not None):
+                future = self.executor.submit(self.deliver_sync, alert)
+            try:
+                await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.timeout)
+            except TimeoutError:
+                if key is not None:
+                    self.in_flight[key] = future
+                raise
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+class EmailBackend(Notifier):
+    """Sends each alert to its recipient through an EmailNotifier."""
+
+    addressed = True
+
+    def __init__(self, email_notifier, name="email", timeout=60, max_concurrency=2):
+        super().__init__(name, timeout, max_concurrency)
+        self.email = email_notifier
+
+    def deliver_sync(self, alert):
+        self.email.send_message(alert['recipient'], alert['subject'], alert['body'], alert.get('message_id'))
+
+
+class HTTPBackend(Notifier):
+    def __init__(self, name, url, timeout=10, max_concurrency=4):
+        super().__init__(name, timeout, max_concurrency)
+        self.url = url
+        parts = urlsplit(url)
+        self.path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        self.pool = HTTPConnectionPool(url, size=max_concurrency, timeout=timeout)
+
+    def post(self, body, headers):
+        status, data = self.pool.request("POST", self.path, body, headers)
+        if status >= 300:
+            raise RuntimeError(f"{self.name} returned HTTP {status}: {data[:200]!r}")
+
+    def close(self):
+        super().close()
+        self.pool.close()
+
+
+class WebhookNotifier(HTTPBackend):
+    """Posts alerts to a chat webhook. format is 'slack' ({"text": ...}), 'matrix' or 'json' (the whole alert)."""
+
+    def __init__(self, name, url, format="slack", timeout=10, max_concurrency=4):
+        super().__init__(name, url, timeout, max_concurrency)
+        self.format = format
+
+    def deliver_sync(self, alert):
+        text = f"{alert['subject']}\n{alert['body']}"
+        if self.format == "slack":
+            payload = {'text': text}
+        elif self.format == "matrix":
+            payload = {'msgtype': "m.text", 'body': text}
+        else:
+            payload = {key: alert.get(key) for key in ('recipient', 'subject', 'body', 'idempotency_key')}
+        self.post(json.dumps(payload).encode(), {'Content-Type': "application/json"})
+
+
+class NtfyNotifier(HTTPBackend):
+    """Publishes alerts to an ntfy-style topic URL: the body is the message, the subject goes in a header."""
+
+    def __init__(self, name, url, token=None, priority=None, timeout=10, max_concurrency=4):
+        super().__init__(name, url, timeout, max_concurrency)
+        self.token = token
+        self.priority = priority
+
+    def deliver_sync(self, alert):
+        # HTTP headers must be latin-1
+        headers = {'Title': alert['subject'].encode('latin-1', 'replace').decode('latin-1')}
+        if self.token:
+            headers['Authorization'] = f"Bearer {self.token}"
+        if self.priority:
+            headers['Priority'] = str(self.priority)
+        self.post(alert['body'].encode(), headers)
+
+
+class JsonlNotifier(Notifier):
+    """Appends each alert as one JSON line to a local file."""
+
+    def __init__(self, name, path, timeout=10, max_concurrency=1):
+        super().__init__(name, timeout, max_concurrency)
+        self.path = path
+        self._lock = threading.Lock()
+
+    def deliver_sync(self, alert):
+        line = json.dumps(alert, default=str) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+
+BACKEND_TYPES = {
+    'webhook': WebhookNotifier,
+    'ntfy': NtfyNotifier,
+    'jsonl': JsonlNotifier,
+}
+
+
+def create_backend(name, options):
+    """Build a backend from a [Notifier:<name>] config section's options."""
+    options = dict(options)
+    backend_type = options.pop('type', None)
+    if backend_type not in BACKEND_TYPES:
+        raise ValueError(f"Unknown notifier type for {name}: {backend_type}")
+    if 'timeout' in options:
+        options['timeout'] = float(options['timeout'])
+    if 'max_concurrency' in options:
+        options['max_concurrency'] = int(options['max_concurrency'])
+    return BACKEND_TYPES[backend_type](name, **options)
+
+
+class NotificationDispatcher:
+    """Fans each alert out to its backends concurrently, each with its own timeout and concurrency limit.
+
+    Addressed backends such as email get every alert. Shared channels only get the owner's item and
+    price drop alerts, never subscribers' alerts, digests or error reports.
+    """
+
+    def __init__(self, backends, owner=None):
+        self.backends = {backend.name: backend for backend in backends}
+        self.owner = owner
+
+    def routes(self, alert, backend):
+        if backend.addressed:
+            return True
+        kind = (alert.get('idempotency_key') or '').split(':', 1)[0]
+        return alert.get('recipient') == self.owner and kind in BROADCAST_KINDS
+
+    async def dispatch(self, alert, skip=()):
+        """Deliver to every backend routed the alert and not in skip; return {backend name: error or None}."""
+        targets = [backend for name, backend in self.backends.items()
+                   if name not in skip and self.routes(alert, backend)]
+        outcomes = await asyncio.gather(*(backend.deliver(alert) for backend in targets), return_exceptions=True)
+
+        results = {}
+        for backend, outcome in zip(targets, outcomes):
+            if isinstance(outcome, BaseException):
+                error = "timed out" if isinstance(outcome, asyncio.TimeoutError) else str(outcome) or type(outcome).__name__
+                logging.warning(f"Notifier {backend.name} failed for {alert.get('idempotency_key')}: {error}")
+                results[backend.name] = error
+            else:
+                results[backend.name] = None
+        return results
+
+    def close(self):
+        for backend in self.backends.values():
+            backend.close()
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+
+from listing import Listing
+
+DETAIL_EXTRACTION_SCRIPT = """
+    () => {
+        const text = document.body ? (document.body.innerText || '') : '';
+        const lines = text.split('\\n').map(line => line.trim()).filter(Boolean);
+
+        const meta = (name) => {
+            const el = document.querySelector(`meta[property="${name}"], meta[name="${name}"]`);
+            return el ? el.content : null;
+        };
+
+        // "Listed 3 days ago in Vancouver, BC"
+        let location = null;
+        let posted_at = null;
+        for (const line of lines) {
+            const listedMatch = line.match(/^Listed (.+?) in (.+)$/);
+            if (listedMatch) {
+                posted_at = listedMatch[1].trim();
+                location = listedMatch[2].trim();
+                break;
+            }
+            const postedMatch = line.match(/^Listed (.+)$/);
+            if (postedMatch && !posted_at) {
+                posted_at = postedMatch[1].trim();
+            }
+        }
+
+        let seller = null;
+        const sellerLink = document.querySelector('a[href*="/marketplace/profile/"]');
+        if (sellerLink) {
+            seller = (sellerLink.innerText || sellerLink.getAttribute('aria-label') || '').trim() || null;
+        }
+
+        let description = null;
+        const headingIndex = lines.findIndex(line =>
+            line === 'Description' || line === 'Details' || line === "Seller's description");
+        if (headingIndex >= 0 && headingIndex + 1 < lines.length) {
+            description = lines[headingIndex + 1];
+        }
+        if (!description) {
+            description = meta('og:description');
+        }
+
+        return { location, description, seller, posted_at };
+    }
+"""
+
+
+class DetailEnricher:
+    """Visits item pages for new listings and fills in the fields the results page lacks."""
+
+    def __init__(self, context, db, max_concurrency=3, ttl_hours=168, timeout_ms=30000):
+        self.context = context
+        self.db = db
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.ttl_hours = ttl_hours
+        self.timeout_ms = timeout_ms
+
+    async def enrich(self, items):
+        """Attach location, description, seller and posted time to each item in place."""
+        if not items:
+            return items
+
+        details_by_id = await self.db.get_listing_details([item.id for item in items], self.ttl_hours)
+        to_fetch = [item for item in items if item.id not in details_by_id]
+
+        if to_fetch:
+            logging.info("Fetching detail pages for %d new listings (%d cached)", len(to_fetch), len(items) - len(to_fetch))
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            fetched = await asyncio.gather(*(self._fetch_with_limit(semaphore, item) for item in to_fetch))
+
+            fetched = [(item, details) for item, details in zip(to_fetch, fetched) if details]
+            # Queued together, the saves land in one group commit
+            await asyncio.gather(*(self.db.save_listing_details(item.id, details) for item, details in fetched))
+            for item, details in fetched:
+                details_by_id[item.id] = details
+
+        for item in items:
+            details = details_by_id.get(item.id)
+            if not details:
+                continue
+            for key, value in details.items():
+                if value and key in Listing.__slots__:
+                    setattr(item, key, value)
+
+        return items
+
+    async def _fetch_with_limit(self, semaphore, item):
+        async with semaphore:
+            return await self._fetch_details(item)
+
+    async def _fetch_details(self, item):
+        page = None
+        try:
+            page = await self.context.new_page()
+            await page.goto(item.url, wait_until="domcontentloaded", timeout=self.timeout_ms)
+            return await page.evaluate(DETAIL_EXTRACTION_SCRIPT)
+        except Exception as e:
+            logging.warning(f"Could not fetch details for listing {item.id}: {e}")
+            return None
+        finally:
+            if page:
+                await page.close()
@@ -0,0 +1,144 @@
+"""Stream the listings and searches tables to CSV, JSONL or Parquet.
+
+Rows flow from a fetchmany cursor through generators into the writer one batch at a time, so
+memory use does not grow with the table. A watermark file makes repeated exports incremental.
+"""
+import csv
+import json
+import logging
+import os
+import sys
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Table -> the timestamp column exports are ordered and watermarked by
+EXPORT_TABLES = {
+    'listings': 'discovered_at',
+    'searches': 'timestamp',
+}
+FORMATS = ('csv', 'jsonl', 'parquet')
+PARQUET_ROW_GROUP_ROWS = 50000
+
+
+def track_watermark(batches, position, state):
+    """Pass batches through, remembering the last value of the column at position in state['watermark']."""
+    for rows in batches:
+        state['watermark'] = rows[-1][position]
+        state['rows'] += len(rows)
+        yield rows
+
+
+def iter_records(columns, batches):
+    for rows in batches:
+        for row in rows:
+            yield dict(zip(columns, row))
+
+
+def write_csv(columns, batches, output):
+    writer = csv.writer(output)
+    writer.writerow(columns)
+    for rows in batches:
+        writer.writerows(rows)
+
+
+def write_jsonl(columns, batches, output):
+    for record in iter_records(columns, batches):
+        output.write(json.dumps(record, default=str) + "\n")
+
+
+def _parquet_type(declared_type):
+    declared_type = declared_type.upper()
+    if "INT" in declared_type:
+        return pyarrow.int64()
+    if "REAL" in declared_type or "FLOA" in declared_type or "DOUB" in declared_type:
+        return pyarrow.float64()
+    return pyarrow.string()
+
+
+def write_parquet(table_columns, batches, path):
+    """Write batches as Parquet row groups of up to PARQUET_ROW_GROUP_ROWS rows."""
+    schema = pyarrow.schema([(name, _parquet_type(declared)) for name, declared in table_columns])
+    names = [name for name, _ in table_columns]
+    pending, pending_rows = [], 0
+
+    with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+        def flush():
+            writer.write_table(pyarrow.Table.from_batches(pending, schema=schema))
+            pending.clear()
+
+        for rows in batches:
+            columns = list(zip(*rows))
+            pending.append(pyarrow.RecordBatch.from_arrays(
+                [pyarrow.array(values, type=field.type) for values, field in zip(columns, schema)],
+                names=names
+            ))
+            pending_rows += len(rows)
+            if pending_rows >= PARQUET_ROW_GROUP_ROWS:
+                flush()
+                pending_rows = 0
+        if pending:
+            flush()
+
+
+def read_watermark(path):
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return f.read().strip() or None
+    return None
+
+
+def write_watermark(path, value):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(str(value))
+    os.replace(temp_path, path)
+
+
+def export_table(db, table, format, output, since=None, batch_size=1000):
+    """Export rows of table newer than since and return (rows written, new watermark or None)."""
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"Unknown table: {table}")
+    if format not in FORMATS:
+        raise ValueError(f"Unknown format: {format}")
+    if format == "parquet" and pyarrow is None:
+        raise RuntimeError("Parquet export needs pyarrow: pip install pyarrow")
+
+    order_column = EXPORT_TABLES[table]
+    table_columns = db.get_table_columns(table)
+    columns = [name for name, _ in table_columns]
+    state = {'watermark': None, 'rows': 0}
+    batches = track_watermark(db.iter_rows(table, order_column, since, batch_size), columns.index(order_column), state)
+
+    if format == "parquet":
+        if output == "-":
+            raise ValueError("Parquet export needs an output file")
+        write_parquet(table_columns, batches, output)
+    elif output == "-":
+        (write_csv if format == "csv" else write_jsonl)(columns, batches, sys.stdout)
+    else:
+        with open(output, "w", newline="", encoding="utf-8") as f:
+            (write_csv if format == "csv" else write_jsonl)(columns, batches, f)
+
+    return state['rows'], state['watermark']
+
+
+def add_arguments(parser):
+    parser.add_argument("table", choices=sorted(EXPORT_TABLES))
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--output", "-o", default="-", help="Output file, or - for stdout (CSV and JSONL only)")
+    parser.add_argument("--since", help="Only rows newer than this timestamp, e.g. 2024-05-01 or 2024-05-01 12:00:00")
+    parser.add_argument("--watermark", help="File holding the last exported timestamp; read as --since and updated after the export")
+    parser.add_argument("--batch-size", type=int, default=1000)
+
+
+def run(args, db):
+    since = args.since or read_watermark(args.watermark)
+    rows, watermark = export_table(db, args.table, args.format, args.output, since, args.batch_size)
+    if args.watermark and watermark is not None:
+        write_watermark(args.watermark, watermark)
+    logging.info(f"Exported {rows} {args.table} rows" + (f" newer than {since}" if since else ""))
+    return rows
@@ -1,4 +1,18 @@
+import asyncio
 import logging
+import time
+
+from listing import Listing
+
+XPATH_STRATEGIES = {
+    'price_text': "//div[.//a[contains(@href, '/marketplace/item/')] and .//*[contains(text(), '$')]]",
+    'article': "//div[@role='article' and .//a[contains(@href, '/marketplace/item/')]]",
+    'feed_item': "//*[@data-testid='marketplace_feed_item']",
+    'price_label': "//div[.//a[contains(@href, '/marketplace/item/')] and .//*[contains(@aria-label, 'Price')]]",
+}
+
+# In-page strategies in their default order; StrategyStats reorders them from what has worked before
+IN_PAGE_STRATEGIES = [f"xpath:{name}" for name in XPATH_STRATEGIES] + ["javascript"]
 
 def clean_marketplace_url(url):
     if not url:
@@ -12,8 +26,21 @@ def clean_marketplace_url(url):
     return base_url_parts
 
 class ExtractionManager:
-    def __init__(self, page):
+    def __init__(self, page, engine="dom", executor=None, stats=None, search_key=None):
+        # engine "dom" evaluates the strategies inside the page; "python" parses page.content() in executor
         self.page = page
+        self.engine = engine
+        self.executor = executor
+        self.stats = stats
+        self.search_key = search_key or ""
+    
+    async def extract_listings_via_python(self):
+        # Imported here because html_parser reuses clean_marketplace_url from this module
+        from html_parser import parse_listings_html
+        
+        html = await self.page.content()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, parse_listings_html, html, self.page.url)
     
     async def extract_listings_via_javascript(self):
         raw_results = await self.page.evaluate("""
@@ -25,6 +52,11 @@ class ExtractionManager:
                     return priceMatch ? parseFloat(priceMatch[1].replace(/,/g, '')) : 0;
                 };
                 
+                const extractCurrency = (text) => {
+                    const currencyMatch = text.match(/(CA\\$|£|\\$|€)[0-9,.]+/);
+                    return currencyMatch ? currencyMatch[1] : null;
+                };
+                
                 const extractTitle = (text) => {
                     const lines = text.split('\\n').map(line => line.trim()).filter(Boolean);
                     for (const line of lines) {
@@ -60,13 +92,18 @@ class ExtractionManager:
                             // This container has price text, so it might be our listing container
                             const title = extractTitle(containerText);
                             const price = extractPrice(containerText);
+                            const currency = extractCurrency(containerText);
                             const id = extractListingId(url);
+                            const image = container.querySelector('img');
+                            const image_url = image ? image.src : null;
                             
                             results.push({
                                 id,
                                 title,
                                 price,
-                                url
+                                currency,
+                                url,
+                                image_url
                             });
                             
                             break;
@@ -96,138 +133,169 @@ class ExtractionManager:
         return raw_results
     
     async def extract_listings_via_xpath(self):
+        """Try each XPath strategy in order and return the first one's listings."""
+        try:
+            for xpath in XPATH_STRATEGIES.values():
+                results = await self.extract_listings_with_xpath(xpath)
+                if results:
+                    return results
+            return []
+        except Exception as e:
+            logging.warning(f"Error extracting listings via XPath: {e}")
+            return []
+    
+    async def extract_listings_with_xpath(self, xpath):
         results = []
         
-        try:
-            xpath_strategies = [
-                "//div[.//a[contains(@href, '/marketplace/item/')] and .//*[contains(text(), '$')]]",
-                "//div[@role='article' and .//a[contains(@href, '/marketplace/item/')]]",
-                "//*[@data-testid='marketplace_feed_item']",
-                "//div[.//a[contains(@href, '/marketplace/item/')] and .//*[contains(@aria-label, 'Price')]]"
-            ]
+        containers = await self.page.evaluate(f"""
+            (xpath) => {{
+                const containers = [];
+                const elements = document.evaluate(xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+                for (let i = 0; i < elements.snapshotLength; i++) {{
+                    containers.push(elements.snapshotItem(i));
+                }}
+                return containers.length;
+            }}
+        """, xpath)
+        
+        if containers > 0:
+            logging.info("Found %d containers using XPath: %s", containers, xpath)
             
-            for strategy in xpath_strategies:
-                containers = await self.page.evaluate(f"""
-                    (xpath) => {{
-                        const containers = [];
-                        const elements = document.evaluate(xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
-                        for (let i = 0; i < elements.snapshotLength; i++) {{
-                            containers.push(elements.snapshotItem(i));
-                        }}
-                        return containers.length;
+            listing_data = await self.page.evaluate(f"""
+                (xpath) => {{
+                    const results = [];
+                    const extractPrice = (text) => {{
+                        const priceMatch = text.match(/(?:CA\\$|£|\\$|€)([0-9,.]+)/);
+                        return priceMatch ? parseFloat(priceMatch[1].replace(/,/g, '')) : 0;
+                    }};
+                    const extractCurrency = (text) => {{
+                        const currencyMatch = text.match(/(CA\\$|£|\\$|€)[0-9,.]+/);
+                        return currencyMatch ? currencyMatch[1] : null;
+                    }};
+                    
+                    const containers = [];
+                    const elements = document.evaluate(xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+                    for (let i = 0; i < elements.snapshotLength; i++) {{
+                        containers.push(elements.snapshotItem(i));
                     }}
-                """, strategy)
-                
-                if containers > 0:
-                    logging.info(f"Found {containers} containers using XPath: {strategy}")
                     
-                    listing_data = await self.page.evaluate(f"""
-                        (xpath) => {{
-                            const results = [];
-                            const extractPrice = (text) => {{
-                                const priceMatch = text.match(/(?:CA\\$|£|\\$|€)([0-9,.]+)/);
-                                return priceMatch ? parseFloat(priceMatch[1].replace(/,/g, '')) : 0;
-                            }};
-                            
-                            const containers = [];
-                            const elements = document.evaluate(xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
-                            for (let i = 0; i < elements.snapshotLength; i++) {{
-                                containers.push(elements.snapshotItem(i));
-                            }}
-                            
-                            for (const container of containers) {{
-                                // Find the link to the item
-                                const linkElement = document.evaluate(".//a[contains(@href, '/marketplace/item/')]", container, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
-                                if (!linkElement) continue;
-                                
-                                const url = linkElement.href;
-                                const containerText = container.innerText || '';
-                                
-                                // Extract listing ID
-                                const idMatch = url.match(/\\/item\\/([^\\/\\?]+)/);
-                                const id = idMatch ? idMatch[1] : "unknown";
-                                
-                                // Extract price
-                                let price = 0;
-                                // Try to find price by aria-label first
-                                const priceElement = document.evaluate(".//*[@aria-label='Price' or contains(@data-ms, 'price')]", container, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
-                                if (priceElement) {{
-                                    price = extractPrice(priceElement.textContent);
-                                }} else {{
-                                    // Fall back to extracting from all text
-                                    price = extractPrice(containerText);
-                                }}
-                                
-                                // Extract title
-                                let title = "Unknown Title";
-                                // Try to find title by aria-label or data attribute
-                                const titleElement = document.evaluate(".//*[@aria-label='Title' or contains(@data-ms, 'title')]", container, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
-                                if (titleElement) {{
-                                    title = titleElement.textContent.trim();
-                                }} else {{
-                                    // Try the link's aria-label
-                                    const linkLabel = linkElement.getAttribute('aria-label');
-                                    if (linkLabel && linkLabel.length > 3) {{
-                                        title = linkLabel;
-                                    }} else {{
-                                        // Fall back to parsing container text
-                                        const lines = containerText.split('\\n').map(line => line.trim()).filter(Boolean);
-                                        for (const line of lines) {{
-                                            if (!line.match(/(?:CA\\$|£|\\$|€)[0-9,.]+/)) {{
-                                                if (line.length > 3) {{
-                                                    title = line;
-                                                    break;
-                                                }}
-                                            }}
+                    for (const container of containers) {{
+                        // Find the link to the item
+                        const linkElement = document.evaluate(".//a[contains(@href, '/marketplace/item/')]", container, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+                        if (!linkElement) continue;
+                        
+                        const url = linkElement.href;
+                        const containerText = container.innerText || '';
+                        
+                        // Extract listing ID
+                        const idMatch = url.match(/\\/item\\/([^\\/\\?]+)/);
+                        const id = idMatch ? idMatch[1] : "unknown";
+                        
+                        // Extract price
+                        let price = 0;
+                        // Try to find price by aria-label first
+                        const priceElement = document.evaluate(".//*[@aria-label='Price' or contains(@data-ms, 'price')]", container, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+                        if (priceElement) {{
+                            price = extractPrice(priceElement.textContent);
+                        }} else {{
+                            // Fall back to extracting from all text
+                            price = extractPrice(containerText);
+                        }}
+                        const currency = extractCurrency(priceElement ? priceElement.textContent : containerText);
+                        
+                        // Extract title
+                        let title = "Unknown Title";
+                        // Try to find title by aria-label or data attribute
+                        const titleElement = document.evaluate(".//*[@aria-label='Title' or contains(@data-ms, 'title')]", container, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+                        if (titleElement) {{
+                            title = titleElement.textContent.trim();
+                        }} else {{
+                            // Try the link's aria-label
+                            const linkLabel = linkElement.getAttribute('aria-label');
+                            if (linkLabel && linkLabel.length > 3) {{
+                                title = linkLabel;
+                            }} else {{
+                                // Fall back to parsing container text
+                                const lines = containerText.split('\\n').map(line => line.trim()).filter(Boolean);
+                                for (const line of lines) {{
+                                    if (!line.match(/(?:CA\\$|£|\\$|€)[0-9,.]+/)) {{
+                                        if (line.length > 3) {{
+                                            title = line;
+                                            break;
                                         }}
                                     }}
                                 }}
-                                
-                                results.push({{
-                                    id,
-                                    title,
-                                    price,
-                                    url
-                                }});
                             }}
-                            
-                            return results;
                         }}
-                    """, strategy)
+                        
+                        // Thumbnail, used for perceptual repost detection
+                        const image = container.querySelector('img');
+                        const image_url = image ? image.src : null;
+                        
+                        results.push({{
+                            id,
+                            title,
+                            price,
+                            currency,
+                            url,
+                            image_url
+                        }});
+                    }}
                     
-                    if listing_data and len(listing_data) > 0:
-                        # Clean the URLs
-                        for item in listing_data:
-                            item['url'] = clean_marketplace_url(item['url'])
-                        results.extend(listing_data)
-                        break
+                    return results;
+                }}
+            """, xpath)
             
-            return results
-            
-        except Exception as e:
-            logging.warning(f"Error extracting listings via XPath: {e}")
-            return []
+            if listing_data and len(listing_data) > 0:
+                # Clean the URLs
+                for item in listing_data:
+                    item['url'] = clean_marketplace_url(item['url'])
+                results.extend(listing_data)
+
+        return results
     
     async def extract_via_multiple_strategies(self):
-        results = []
-        
-        try:
-            logging.info("Trying XPath extraction strategy...")
-            xpath_results = await self.extract_listings_via_xpath()
-            if xpath_results:
-                logging.info(f"Found {len(xpath_results)} listings via XPath")
-                results.extend(xpath_results)
-        except Exception as e:
-            logging.warning(f"XPath extraction failed: {e}")
+        """Run the extraction strategies in turn and return Listing records, built here once for the whole pipeline."""
+        return [Listing.from_mapping(item) for item in await self._extract_raw()]
+    
+    async def _extract_raw(self):
+        if self.engine == "python":
+            try:
+                results = await self._timed("python", self.extract_listings_via_python)
+                if results:
+                    logging.info("Found %d listings via Python HTML parsing", len(results))
+                    return results
+                # Changed markup parses to nothing rather than failing; the in-page strategies may still work
+                logging.warning("Python HTML parsing found no listings, falling back to in-page strategies")
+            except Exception as e:
+                logging.warning(f"Python HTML parsing failed, falling back to in-page strategies: {e}")
         
-        if not results:
+        order = self.stats.order(IN_PAGE_STRATEGIES, self.search_key) if self.stats else IN_PAGE_STRATEGIES
+        for strategy in order:
             try:
-                logging.info("Trying JavaScript extraction strategy...")
-                js_results = await self.extract_listings_via_javascript()
-                if js_results:
-                    logging.info(f"Found {len(js_results)} listings via JavaScript")
-                    results.extend(js_results)
+                logging.info("Trying %s extraction strategy...", strategy)
+                results = await self._timed(strategy, lambda: self._run_strategy(strategy))
+                if results:
+                    logging.info("Found %d listings via %s", len(results), strategy)
+                    return results
             except Exception as e:
-                logging.warning(f"JavaScript extraction failed: {e}")
+                logging.warning(f"{strategy} extraction failed: {e}")
         
-        return results
\ No newline at end of file
+        return []
+    
+    def _run_strategy(self, strategy):
+        if strategy == "javascript":
+            return self.extract_listings_via_javascript()
+        return self.extract_listings_with_xpath(XPATH_STRATEGIES[strategy.split(":", 1)[1]])
+    
+    async def _timed(self, strategy, extract):
+        """Run one strategy and record whether it found listings and how long it took."""
+        start = time.perf_counter()
+        results = []
+        try:
+            results = await extract()
+            return results
+        finally:
+            if self.stats:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                await self.stats.record(strategy, self.search_key, bool(results), elapsed_ms)
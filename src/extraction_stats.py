@@ -0,0 +1,58 @@
+import logging
+import random
+
+ALL_SEARCHES = '*'
+# Latency assumed for a strategy that has never been timed
+DEFAULT_MS = 1000.0
+
+
+class StrategyStats:
+    """Orders extraction strategies by how well they have worked, per search and overall.
+
+    Each strategy keeps attempts, successes and total time, both for the search it ran on and
+    across all searches, mirrored in the extraction_stats table so the order survives restarts.
+    Strategies are tried until one finds listings, so they are ranked by smoothed success rate
+    per millisecond: the cheapest expected route to a result goes first. A search's own totals
+    are used once it has min_attempts of them, the all-searches totals before that. With
+    probability exploration a random other strategy is moved to the front, so one that starts
+    working again after a page change gets noticed.
+    """
+
+    def __init__(self, db, exploration=0.1, min_attempts=5, rng=None):
+        self.db = db
+        self.exploration = exploration
+        self.min_attempts = min_attempts
+        self.rng = rng or random.Random()
+        self.totals = {}
+
+    async def load(self):
+        for row in await self.db.get_extraction_stats():
+            self.totals[(row['strategy'], row['search_key'])] = [row['attempts'], row['successes'], row['total_ms']]
+        logging.info(f"Loaded extraction stats for {len(self.totals)} strategy/search pairs")
+
+    def _totals(self, strategy, search_key):
+        totals = self.totals.get((strategy, search_key))
+        if totals and totals[0] >= self.min_attempts:
+            return totals
+        return self.totals.get((strategy, ALL_SEARCHES), [0, 0, 0.0])
+
+    def score(self, strategy, search_key):
+        attempts, successes, total_ms = self._totals(strategy, search_key)
+        success_rate = (successes + 1) / (attempts + 2)
+        mean_ms = total_ms / attempts if attempts else DEFAULT_MS
+        return success_rate / max(mean_ms, 1.0)
+
+    def order(self, strategies, search_key):
+        """Return the strategies best first; ties keep their given order."""
+        ranked = sorted(strategies, key=lambda strategy: -self.score(strategy, search_key))
+        if len(ranked) > 1 and self.rng.random() < self.exploration:
+            ranked.insert(0, ranked.pop(self.rng.randrange(1, len(ranked))))
+        return ranked
+
+    async def record(self, strategy, search_key, success, elapsed_ms):
+        for key in {search_key, ALL_SEARCHES}:
+            totals = self.totals.setdefault((strategy, key), [0, 0, 0.0])
+            totals[0] += 1
+            totals[1] += int(success)
+            totals[2] += elapsed_ms
+        await self.db.record_extraction_attempt(strategy, search_key, success, elapsed_ms)
@@ -0,0 +1,178 @@
+"""Parse Marketplace result pages in Python instead of inside the browser.
+
+Uses lxml when it is installed and falls back to the standard library's html.parser. Both build a
+tree with the same small interface (getparent, itertext, iter, get), so one extraction routine
+produces the same listing dicts as the in-page JavaScript strategy.
+"""
+import re
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+from extraction import clean_marketplace_url
+
+PRICE_PATTERN = re.compile(r"(CA\$|£|\$|€)([0-9,.]+)")
+ITEM_ID_PATTERN = re.compile(r"/item/([^/?]+)")
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+SKIPPED_TAGS = {'script', 'style', 'noscript', 'template'}
+# Block-level tags start a new line in innerText; other text runs together
+BLOCK_TAGS = {'div', 'p', 'li', 'ul', 'ol', 'section', 'article', 'header', 'footer', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'br', 'tr', 'table'}
+
+
+def available_engine():
+    return "lxml" if lxml is not None else "html.parser"
+
+
+class _Node:
+    __slots__ = ('tag', 'attrs', 'children', 'parent')
+
+    def __init__(self, tag, attrs, parent):
+        self.tag = tag
+        self.attrs = attrs
+        self.children = []
+        self.parent = parent
+
+    def getparent(self):
+        return self.parent
+
+    def get(self, name, default=None):
+        return self.attrs.get(name, default)
+
+    def iter(self, tag=None):
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, _Node):
+                if tag is None or node.tag == tag:
+                    yield node
+                stack.extend(reversed(node.children))
+
+    def itertext(self):
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                yield node
+            elif node.tag not in SKIPPED_TAGS:
+                if node.tag in BLOCK_TAGS:
+                    yield "\n"
+                stack.extend(reversed(node.children))
+
+
+class _TreeBuilder(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = _Node('document', {}, None)
+        self.current = self.root
+
+    def handle_starttag(self, tag, attrs):
+        node = _Node(tag, dict(attrs), self.current)
+        self.current.children.append(node)
+        if tag not in VOID_TAGS:
+            self.current = node
+
+    def handle_endtag(self, tag):
+        node = self.current
+        while node is not self.root and node.tag != tag:
+            node = node.parent
+        if node is not self.root:
+            self.current = node.parent
+
+    def handle_data(self, data):
+        self.current.children.append(data)
+
+
+def _parse(html):
+    if lxml is not None:
+        return lxml.html.fromstring(html)
+    builder = _TreeBuilder()
+    builder.feed(html)
+    builder.close()
+    return builder.root
+
+
+def _iter_item_links(root):
+    for link in root.iter('a'):
+        if '/marketplace/item/' in (link.get('href') or ''):
+            yield link
+
+
+def _text_lines(element):
+    text = "".join(element.itertext()) if lxml is None else _lxml_inner_text(element)
+    return [line.strip() for line in text.split("\n") if line.strip()]
+
+
+def _lxml_inner_text(element):
+    parts = []
+    for node in element.iter():
+        if isinstance(node.tag, str) and node.tag not in SKIPPED_TAGS:
+            if node.tag in BLOCK_TAGS:
+                parts.append("\n")
+            if node.text:
+                parts.append(node.text)
+        if node is not element and node.tail:
+            parts.append(node.tail)
+    return "".join(parts)
+
+
+def _extract_price(text):
+    match = PRICE_PATTERN.search(text)
+    if not match:
+        return 0
+    try:
+        return float(match.group(2).replace(',', ''))
+    except ValueError:
+        return 0
+
+
+def _extract_currency(text):
+    match = PRICE_PATTERN.search(text)
+    return match.group(1) if match else None
+
+
+def _extract_title(lines):
+    for line in lines:
+        if not PRICE_PATTERN.search(line) and len(line) > 3:
+            return line
+    return "Unknown Title"
+
+
+def parse_listings_html(html, base_url="https://www.facebook.com/"):
+    """Extract listing dicts from a results page's HTML. Top-level so it can run in a worker process."""
+    root = _parse(html)
+    results = []
+    seen_urls = set()
+
+    for link in _iter_item_links(root):
+        url = clean_marketplace_url(urljoin(base_url, link.get('href')))
+        if url in seen_urls:
+            continue
+
+        # Walk up to the first ancestor whose text contains a price, as the in-page strategy does
+        container = link
+        for _ in range(5):
+            container = container.getparent()
+            if container is None:
+                break
+            lines = _text_lines(container)
+            container_text = "\n".join(lines)
+            if PRICE_PATTERN.search(container_text):
+                id_match = ITEM_ID_PATTERN.search(url)
+                image = next(iter(container.iter('img')), None)
+                image_url = image.get('src') if image is not None else None
+                seen_urls.add(url)
+                results.append({
+                    'id': id_match.group(1) if id_match else "unknown",
+                    'title': _extract_title(lines),
+                    'price': _extract_price(container_text),
+                    'currency': _extract_currency(container_text),
+                    'url': url,
+                    'image_url': urljoin(base_url, image_url) if image_url else None
+                })
+                break
+
+    return results
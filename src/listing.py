@@ -0,0 +1,88 @@
+from array import array
+
+
+class Listing:
+    """One marketplace listing, built once from an extractor's raw dict.
+
+    Slots keep a listing to a fixed handful of attributes with no per-instance dict. Fields filled
+    in later stages (detail-page enrichment, thumbnail hashing, deal scoring) start as None.
+    """
+
+    __slots__ = ('id', 'title', 'price', 'currency', 'url', 'location', 'image_url', 'description', 'seller',
+                 'posted_at', 'phash', 'percentile')
+
+    def __init__(self, id, title="Unknown Title", price=0.0, currency=None, url="", location=None, image_url=None,
+                 description=None, seller=None, posted_at=None, phash=None, percentile=None):
+        self.id = id
+        self.title = title
+        self.price = price
+        self.currency = currency
+        self.url = url
+        self.location = location
+        self.image_url = image_url
+        self.description = description
+        self.seller = seller
+        self.posted_at = posted_at
+        self.phash = phash
+        self.percentile = percentile
+
+    @classmethod
+    def from_mapping(cls, data):
+        """Build a listing from an extractor's dict, normalising the types the strategies disagree on."""
+        try:
+            price = float(data.get('price') or 0)
+        except (TypeError, ValueError):
+            price = 0.0
+        return cls(
+            str(data.get('id') or "unknown"),
+            data.get('title') or "Unknown Title",
+            price,
+            data.get('currency'),
+            data.get('url') or "",
+            data.get('location'),
+            data.get('image_url')
+        )
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__ if getattr(self, name) is not None}
+
+    def __repr__(self):
+        return f"Listing({self.id!r}, {self.title!r}, {self.price!r})"
+
+    @property
+    def row(self):
+        """The (id, title, price, url, location) row the listings table stores."""
+        return (self.id, self.title, self.price, self.url, self.location or "Unknown location")
+
+
+class ListingBatch:
+    """Listings to store, held as parallel columns rather than one object per listing.
+
+    Iterating yields (id, title, price, url, location) rows, so a batch can be handed straight to
+    executemany; prices stay in a packed array for the numeric consumers.
+    """
+
+    __slots__ = ('ids', 'titles', 'prices', 'urls', 'locations')
+
+    def __init__(self, listings=()):
+        self.ids = []
+        self.titles = []
+        self.prices = array('d')
+        self.urls = []
+        self.locations = []
+        for listing in listings:
+            self.append(listing)
+
+    def append(self, listing):
+        item_id, title, price, url, location = listing.row
+        self.ids.append(item_id)
+        self.titles.append(title)
+        self.prices.append(price or 0.0)
+        self.urls.append(url)
+        self.locations.append(location)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return zip(self.ids, self.titles, self.prices, self.urls, self.locations)
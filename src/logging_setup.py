@@ -0,0 +1,146 @@
+import contextlib
+import contextvars
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import uuid
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# IDs of the cycle and search being worked on, attached to every record logged meanwhile
+CONTEXT_IDS = {
+    'cycle_id': contextvars.ContextVar('cycle_id', default=None),
+    'search_id': contextvars.ContextVar('search_id', default=None),
+}
+
+
+def new_log_id():
+    return uuid.uuid4().hex[:8]
+
+
+@contextlib.contextmanager
+def log_context(**ids):
+    """Tag records logged inside the block, from this task and the tasks it starts, with the given IDs."""
+    tokens = [(CONTEXT_IDS[name], CONTEXT_IDS[name].set(value)) for name, value in ids.items()]
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Copies the context IDs onto each record before it is queued, while still in the caller's context."""
+
+    def filter(self, record):
+        for name, var in CONTEXT_IDS.items():
+            setattr(record, name, var.get())
+        return True
+
+
+# Argument types that cannot change after the call, so their records can be formatted later
+_IMMUTABLE_ARGS = (str, int, float, bool, type(None))
+
+
+class DeferredQueueHandler(QueueHandler):
+    """Queues records with immutable arguments unformatted, leaving the work to the listener thread.
+
+    Anything else is snapshotted on the caller's thread as QueueHandler.prepare would: arguments
+    that could change before the listener gets to them are rendered into the message, and a
+    traceback is rendered to text so its frames are not kept alive in the queue.
+    """
+
+    _formatter = logging.Formatter()
+
+    def prepare(self, record):
+        args = record.args
+        if isinstance(args, dict):
+            args = args.values()
+        if args and not all(isinstance(arg, _IMMUTABLE_ARGS) for arg in args):
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            record.exc_text = self._formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, cycle and search IDs and any traceback."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for name in CONTEXT_IDS:
+            value = getattr(record, name, None)
+            if value:
+                entry[name] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+def _gzip_name(name):
+    return name + ".gz"
+
+
+def _gzip_rotate(source, dest):
+    with open(source, 'rb') as source_file, gzip.open(dest, 'wb') as dest_file:
+        shutil.copyfileobj(source_file, dest_file)
+    os.remove(source)
+
+
+def setup_logging(path="marketplace_scraper.log", level="INFO", format="text", max_mb=10, backups=5,
+                  compress=True, console=True):
+    """Route the root logger through a queue to a background thread that formats and writes records.
+
+    The file rolls over at max_mb (0 never rolls over), keeping backups old files, gzipped when
+    compress is set. format "json" writes the file as JSON lines; the console stays plain text.
+    Returns the started QueueListener; stop it at shutdown to flush what is still queued.
+    """
+    handlers = []
+    if path:
+        file_handler = RotatingFileHandler(path, maxBytes=int(max_mb * 1024 * 1024), backupCount=backups,
+                                           encoding="utf-8", delay=True)
+        file_handler.setFormatter(JsonFormatter() if format == "json" else logging.Formatter(TEXT_FORMAT))
+        if compress:
+            file_handler.namer = _gzip_name
+            file_handler.rotator = _gzip_rotate
+        handlers.append(file_handler)
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        handlers.append(console_handler)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+    root = logging.getLogger()
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = QueueListener(log_queue, *handlers)
+    listener.start()
+    return listener
+
+
+def stop_logging(listener):
+    """Write out what is still queued, detach the queue from the root logger and close the files."""
+    listener.stop()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, QueueHandler) and handler.queue is listener.queue:
+            root.removeHandler(handler)
+    for handler in listener.handlers:
+        handler.close()
@@ -1,17 +1,33 @@
 import asyncio
+import hashlib
 import logging
 import os
 import sys
-import random
 import time
 from datetime import datetime, timedelta
 import configparser
-import sqlite3
 import threading
 import queue
 
 from scraper import MarketplaceScraper
 from notifier import EmailNotifier
+from database import DatabaseManager
+from async_database import AsyncDatabase
+from dedupe import RepostDetector
+from deadlines import is_timeout, is_transient, stage
+from logging_setup import log_context, new_log_id, setup_logging, stop_logging
+import phash
+from rules import RuleSet
+from subscriptions import GroupFilter, SubscriptionIndex, coalesce_queries, in_price_range, query_id, query_key
+from api import ReadAPI
+from scheduler import AdaptiveScheduler
+from listing import ListingBatch
+from prices import PriceTracker, PriceUpdate
+from quantiles import DealScorer
+from snapshots import RemovalTracker
+from retention import RetentionJob
+from outbox import OutboxSender
+from dispatcher import EmailBackend, NotificationDispatcher, create_backend
 
 
 class ConfigManager:
@@ -27,6 +43,9 @@ class ConfigManager:
         self.config.read(self.config_path)
         if 'Search' not in self.config:
             raise ValueError("Config file missing [Search] section")
+        
+        # Compiled once here so each batch only pays for matching
+        self.filter_rules = RuleSet.from_mapping(self.config['Filters']) if 'Filters' in self.config else RuleSet()
     
     def get_search_params(self):
         params = {}
@@ -41,8 +60,155 @@ class ConfigManager:
             'subject_template': self.config['Search'].get('subject_template', 'Found: {item_title} at ${price}'),
             'message_template': self.config['Search'].get('message_template', 'Found a {item_title} selling for ${price} in {location}. Here\'s the link: {url}')
         }
+        if 'SMTP' in self.config:
+            for key in ('server', 'port', 'security', 'timeout'):
+                if key in self.config['SMTP']:
+                    email_config[f'smtp_{key}'] = self.config['SMTP'][key]
         return email_config
     
+    def get_notifier_configs(self):
+        """Options of each extra [Notifier:<name>] backend section, by name."""
+        return {
+            section.split(':', 1)[1].strip(): dict(self.config[section])
+            for section in self.config.sections()
+            if section.startswith('Notifier:')
+        }
+    
+    def get_filter_rules(self):
+        return self.filter_rules
+    
+    def get_base_url(self):
+        """Marketplace root that search URLs are built on; overridden to point at a local fixture server."""
+        return self.config.get('Marketplace', 'base_url', fallback='https://www.facebook.com/marketplace/')
+    
+    def get_browser_config(self):
+        return {
+            'endpoint': self.config.get('Browser', 'endpoint', fallback='') or None,
+            'connect_timeout': self.config.getfloat('Browser', 'connect_timeout', fallback=5)
+        }
+    
+    def get_logging_config(self):
+        return {
+            'path': self.config.get('Logging', 'file', fallback='marketplace_scraper.log'),
+            'level': self.config.get('Logging', 'level', fallback='INFO').upper(),
+            'format': self.config.get('Logging', 'format', fallback='text'),
+            'max_mb': self.config.getfloat('Logging', 'max_mb', fallback=10),
+            'backups': self.config.getint('Logging', 'backups', fallback=5),
+            'compress': self.config.getboolean('Logging', 'compress', fallback=True)
+        }
+    
+    def get_timeout_config(self):
+        # Seconds per stage; 0 leaves a stage unbounded
+        return {
+            'navigation': self.config.getfloat('Timeouts', 'navigation', fallback=45),
+            'dialogs': self.config.getfloat('Timeouts', 'dialogs', fallback=20),
+            'extraction': self.config.getfloat('Timeouts', 'extraction', fallback=60),
+            'search': self.config.getfloat('Timeouts', 'search', fallback=180),
+            'enrichment': self.config.getfloat('Timeouts', 'enrichment', fallback=180),
+            'cycle': self.config.getfloat('Timeouts', 'cycle', fallback=900),
+            'retries': self.config.getint('Timeouts', 'retries', fallback=1)
+        }
+    
+    def get_extraction_config(self):
+        return {
+            'engine': self.config.get('Extraction', 'engine', fallback='dom'),
+            'workers': self.config.getint('Extraction', 'workers', fallback=2),
+            'exploration': self.config.getfloat('Extraction', 'exploration', fallback=0.1)
+        }
+    
+    def get_enrichment_config(self):
+        return {
+            'enabled': self.config.getboolean('Enrichment', 'enabled', fallback=True),
+            'max_concurrency': self.config.getint('Enrichment', 'max_concurrency', fallback=3),
+            'ttl_hours': self.config.getfloat('Enrichment', 'ttl_hours', fallback=168),
+            'timeout_ms': self.config.getint('Enrichment', 'timeout_ms', fallback=30000)
+        }
+    
+    def get_dedupe_config(self):
+        return {
+            'enabled': self.config.getboolean('Dedupe', 'enabled', fallback=True),
+            'similarity_threshold': self.config.getfloat('Dedupe', 'similarity_threshold', fallback=0.6),
+            'price_tolerance': self.config.getfloat('Dedupe', 'price_tolerance', fallback=0.15)
+        }
+    
+    def get_image_hash_config(self):
+        return {
+            'enabled': self.config.getboolean('ImageHash', 'enabled', fallback=True),
+            'max_distance': self.config.getint('ImageHash', 'max_distance', fallback=4),
+            'workers': self.config.getint('ImageHash', 'workers', fallback=2),
+            'fetch_concurrency': self.config.getint('ImageHash', 'fetch_concurrency', fallback=4),
+            'timeout': self.config.getfloat('ImageHash', 'timeout', fallback=15)
+        }
+    
+    def get_outbox_config(self):
+        return {
+            'batch_size': self.config.getint('Outbox', 'batch_size', fallback=20),
+            'poll_interval': self.config.getfloat('Outbox', 'poll_interval', fallback=5),
+            'base_delay': self.config.getfloat('Outbox', 'base_delay', fallback=30),
+            'max_delay': self.config.getfloat('Outbox', 'max_delay', fallback=3600),
+            'max_attempts': self.config.getint('Outbox', 'max_attempts', fallback=8),
+            'per_recipient_interval': self.config.getfloat('Outbox', 'per_recipient_interval', fallback=10)
+        }
+    
+    def get_api_config(self):
+        return {
+            'enabled': self.config.getboolean('API', 'enabled', fallback=False),
+            'host': self.config.get('API', 'host', fallback='127.0.0.1'),
+            'port': self.config.getint('API', 'port', fallback=8765),
+            'cache_size': self.config.getint('API', 'cache_size', fallback=128)
+        }
+    
+    def get_schedule_config(self):
+        return {
+            'adaptive': self.config.getboolean('Schedule', 'adaptive', fallback=True),
+            'base_interval': self.get_frequency(),
+            'min_interval': self.config.getfloat('Schedule', 'min_interval', fallback=5),
+            'max_interval': self.config.getfloat('Schedule', 'max_interval', fallback=60),
+            'target_new_per_run': self.config.getfloat('Schedule', 'target_new_per_run', fallback=1.0),
+            'bucket_hours': self.config.getint('Schedule', 'bucket_hours', fallback=3),
+            'alpha': self.config.getfloat('Schedule', 'alpha', fallback=0.3),
+            'history_days': self.config.getfloat('Schedule', 'history_days', fallback=14),
+            'jitter_minutes': self.config.getfloat('Schedule', 'jitter_minutes', fallback=5)
+        }
+    
+    def get_price_config(self):
+        return {
+            'enabled': self.config.getboolean('Prices', 'enabled', fallback=True),
+            'drop_alert_percent': self.config.getfloat('Prices', 'drop_alert_percent', fallback=0)
+        }
+    
+    def get_deal_config(self):
+        return {
+            'enabled': self.config.getboolean('Deals', 'enabled', fallback=True),
+            'max_percentile': self.config.getfloat('Deals', 'max_percentile', fallback=0),
+            'min_samples': self.config.getint('Deals', 'min_samples', fallback=30),
+            'sketch_size': self.config.getint('Deals', 'sketch_size', fallback=200)
+        }
+    
+    def get_removal_config(self):
+        return {
+            'enabled': self.config.getboolean('Removals', 'enabled', fallback=True),
+            'missing_cycles': self.config.getint('Removals', 'missing_cycles', fallback=3)
+        }
+    
+    def get_retention_config(self):
+        defaults = {'searches': 90, 'listings': 0, 'price_history': 365, 'listing_details': 30, 'outbox': 30}
+        policies = {}
+        for table, days in defaults.items():
+            days = self.config.getfloat('Retention', f'{table}_days', fallback=days)
+            # 0 keeps a table's rows forever
+            if days > 0:
+                policies[table] = days
+        return {
+            'enabled': self.config.getboolean('Retention', 'enabled', fallback=False),
+            'policies': policies,
+            'batch_size': self.config.getint('Retention', 'batch_size', fallback=500),
+            'batch_pause': self.config.getfloat('Retention', 'batch_pause', fallback=0.2),
+            'interval_hours': self.config.getfloat('Retention', 'interval_hours', fallback=6),
+            'vacuum_pages': self.config.getint('Retention', 'vacuum_pages', fallback=2000),
+            'archive_path': self.config.get('Retention', 'archive', fallback='') or None
+        }
+    
     def get_frequency(self):
         return int(self.config['Search'].get('frequency', 15))
     
@@ -55,88 +221,6 @@ class ConfigManager:
             self.config.write(config_file)
 
 
-class DatabaseManager:
-    def __init__(self, db_path="marketplace_scraper.db"):
-        self.db_path = db_path
-        self.conn = None
-        self.cursor = None
-        self.initialize()
-        
-    def initialize(self):
-        db_exists = os.path.exists(self.db_path)
-        self.conn = sqlite3.connect(self.db_path)
-        self.cursor = self.conn.cursor()
-        
-        if not db_exists:
-            self.create_tables()
-            logging.info(f"Database created at {self.db_path}")
-        
-    def create_tables(self):
-        self.cursor.execute('''
-        CREATE TABLE listings (
-            id TEXT PRIMARY KEY,
-            title TEXT,
-            price REAL,
-            url TEXT,
-            location TEXT,
-            discovered_at TIMESTAMP
-        )
-        ''')
-        
-        self.cursor.execute('''
-        CREATE TABLE searches (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TIMESTAMP,
-            search_terms TEXT,
-            items_found INTEGER,
-            new_items INTEGER,
-            status TEXT
-        )
-        ''')
-        
-        self.conn.commit()
-        
-    def item_exists(self, item_id):
-        self.cursor.execute("SELECT id FROM listings WHERE id = ?", (item_id,))
-        return self.cursor.fetchone() is not None
-        
-    def add_item(self, item_id, title, price, url, location="Unknown"):
-        try:
-            self.cursor.execute(
-                "INSERT INTO listings VALUES (?, ?, ?, ?, ?, ?)",
-                (item_id, title, price, url, location, datetime.now())
-            )
-            self.conn.commit()
-            logging.info(f"Added new item to database: {title} (${price})")
-            return True
-        except sqlite3.Error as e:
-            logging.error(f"Database error when adding item: {e}")
-            return False
-            
-    def log_search(self, search_terms, items_found, new_items, status="completed"):
-        try:
-            self.cursor.execute(
-                "INSERT INTO searches (timestamp, search_terms, items_found, new_items, status) VALUES (?, ?, ?, ?, ?)",
-                (datetime.now(), search_terms, items_found, new_items, status)
-            )
-            self.conn.commit()
-            return True
-        except sqlite3.Error as e:
-            logging.error(f"Database error when logging search: {e}")
-            return False
-    
-    def get_recent_searches(self, limit=5):
-        self.cursor.execute(
-            "SELECT timestamp, search_terms, items_found, new_items, status FROM searches ORDER BY timestamp DESC LIMIT ?", 
-            (limit,)
-        )
-        return self.cursor.fetchall()
-        
-    def close(self):
-        if self.conn:
-            self.conn.close()
-
-
 class SimpleTerminalInterface:
     def __init__(self):
         self.status = "Initializing..."
@@ -251,87 +335,317 @@ class SimpleTerminalInterface:
 
 class MarketplaceApp:
     def __init__(self):
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler("marketplace_scraper.log"),
-                logging.StreamHandler()
-            ]
-        )
-        
+        self.log_listener = None
         try:
             self.config = ConfigManager()
-            self.db = DatabaseManager()
+            self.log_listener = setup_logging(**self.config.get_logging_config())
+            self.db = AsyncDatabase()
             self.email = EmailNotifier(self.config.get_email_config())
             self.terminal = SimpleTerminalInterface()
-            self.scraper = MarketplaceScraper(self.config)
+            self.scraper = MarketplaceScraper(self.config, self.db)
+            self.timeouts = self.config.get_timeout_config()
+            
+            dedupe_config = self.config.get_dedupe_config()
+            self.repost_detector = None
+            if dedupe_config.pop('enabled'):
+                self.repost_detector = RepostDetector(self.db, **dedupe_config)
+            
+            image_hash_config = self.config.get_image_hash_config()
+            self.image_detector = None
+            if image_hash_config.pop('enabled'):
+                if phash.is_available():
+                    self.image_detector = phash.ImageRepostDetector(self.db, **image_hash_config)
+                else:
+                    logging.warning("NumPy and Pillow are required for image repost detection; it is disabled")
+            
+            price_config = self.config.get_price_config()
+            self.price_tracker = PriceTracker(self.db, **price_config) if price_config.pop('enabled') else None
+            
+            deal_config = self.config.get_deal_config()
+            self.deal_scorer = DealScorer(self.db, **deal_config) if deal_config.pop('enabled') else None
+            
+            removal_config = self.config.get_removal_config()
+            self.removal_tracker = RemovalTracker(self.db, **removal_config) if removal_config.pop('enabled') else None
+            
+            backends = [EmailBackend(self.email)]
+            for name, options in self.config.get_notifier_configs().items():
+                backends.append(create_backend(name, options))
+            self.dispatcher = NotificationDispatcher(backends, owner=self.email.recipient_email)
+            self.outbox_sender = OutboxSender(self.db, self.dispatcher, **self.config.get_outbox_config())
+            self.outbox_task = None
             
+            retention_config = self.config.get_retention_config()
+            self.retention_job = RetentionJob(self.db, **retention_config) if retention_config.pop('enabled') else None
+            self.retention_task = None
+            
+            api_config = self.config.get_api_config()
+            self.api = ReadAPI(self.db, **api_config) if api_config.pop('enabled') else None
+            
+            self.scheduler = AdaptiveScheduler(**self.config.get_schedule_config())
+            self.planned_queries = [self.scraper.search_params]
             self.next_run_time = datetime.now()
             self.running = True
             
             logging.info("Application initialized successfully")
         except Exception as e:
+            # Without a readable config, log with the defaults
+            self.log_listener = self.log_listener or setup_logging()
             logging.critical(f"Failed to initialize application: {e}")
+            stop_logging(self.log_listener)
             sys.exit(1)
     
     def calculate_next_run_time(self):
-        base_minutes = self.config.get_frequency()
-        random_minutes = random.uniform(0, 5)
-        total_minutes = base_minutes + random_minutes
-        
-        next_run = datetime.now() + timedelta(minutes=total_minutes)
-        logging.info(f"Next run scheduled for: {next_run.strftime('%Y-%m-%d %H:%M:%S')} (base: {base_minutes}m + random: {random_minutes:.2f}m)")
-        
+        """When the next search is due; each search has its own adaptive interval."""
+        next_run = self.scheduler.next_run_time(self.planned_queries)
+        logging.info("Next run scheduled for: %s", next_run.strftime('%Y-%m-%d %H:%M:%S'))
         return next_run
     
-    async def process_search_results(self, results):
+    def plan_queries(self, subscriptions):
+        """The configured search plus every distinct subscribed query, so each is scraped only once."""
+        configured = self.scraper.search_params
+        queries = [configured]
+        seen = {query_key(configured)}
+        for key, search_params in subscriptions.queries.items():
+            if key not in seen:
+                seen.add(key)
+                queries.append(search_params)
+        return queries
+    
+    def queue_price_drops(self, price_update, owner_items, subscriber_matches):
+        """Queue drop alerts on price_update for every recipient of this search who was shown a dropped listing."""
+        recipients_items = [(self.email.recipient_email, owner_items)] + list(subscriber_matches.items())
+        for recipient, items in recipients_items:
+            for item in items:
+                change = price_update.changes.get(item.id)
+                if change and self.price_tracker.is_drop(change[1], item.price):
+                    price_update.notifications.append((
+                        f"drop:{item.id}:{item.price}:{recipient}", recipient,
+                        *self.email.build_price_drop_notification(item, change[1])
+                    ))
+    
+    async def record_price_changes(self, price_update):
+        """Store price changes with their drop alerts; only then are the new prices taken as the last known."""
+        changes = list(price_update.changes.values())
+        if not changes:
+            return
+        logging.info("%d listings changed price, %d drop alerts queued", len(changes), len(price_update.notifications))
+        if await self.db.record_price_changes([(item.id, item.price) for item, _ in changes],
+                                              price_update.notifications):
+            self.price_tracker.apply(changes)
+    
+    def score_deals(self, items, fresh_ids, search_params):
+        """Set each new listing's price percentile for its query and return the fresh IDs priced as deals."""
+        deals = set()
+        for item in items:
+            item.percentile = self.deal_scorer.percentile(search_params, item.price)
+            if item.id in fresh_ids:
+                if self.deal_scorer.is_deal(item.percentile):
+                    deals.add(item.id)
+                else:
+                    logging.info("Not alerting on %s: price at percentile %s", item.title, item.percentile)
+        return deals
+    
+    async def process_search_results(self, results, search_params=None, subscriptions=None, outcome=None,
+                                     price_update=None):
+        """Store a search's new listings and queue its alerts; returns how many listings were new.
+        
+        price_update carries the price changes of the page the results came from, shared by every
+        search split from it; without one, the changes in results are found and stored here.
+        """
+        search_params = search_params or self.scraper.search_params
+        status, duration_ms = outcome or ("completed", None)
         if not results:
             logging.info("No results found in this search")
+            if status != "completed":
+                await self.db.log_search(search_params.get('keywords', ''), 0, 0, status, duration_ms,
+                                         query_id(search_params))
             return 0
         
-        new_items = 0
-        for item in results:
-            item_id = item.get('id', 'unknown')
+        # The configured search's own filters decide what its owner is emailed about
+        is_configured_search = query_key(search_params) == query_key(self.scraper.search_params)
+        owner_items = self.config.get_filter_rules().filter(results) if is_configured_search else []
+        subscriber_matches = subscriptions.match(search_params, results) if subscriptions else {}
+        
+        if self.price_tracker:
+            own_update = price_update is None
+            if own_update:
+                price_update = PriceUpdate(self.price_tracker.changes(results))
+            self.queue_price_drops(price_update, owner_items, subscriber_matches)
+            if own_update:
+                await self.record_price_changes(price_update)
+        
+        wanted_ids = {item.id for item in owner_items}
+        for items in subscriber_matches.values():
+            wanted_ids.update(item.id for item in items)
+        
+        new_rows = ListingBatch()
+        fresh_ids = set()
+        stored_ids = set()
+        existing = await self.db.existing_ids(wanted_ids)
+        unseen = [
+            item for item in results
+            if item.id in wanted_ids and item.id not in existing
+        ]
+        if self.image_detector and unseen:
+            await self.image_detector.hash_items(unseen)
+        
+        # Index rows commit with the listings below; until then the batch is checked for reposts in memory
+        title_entries = []
+        hashed_items = []
+        for item in unseen:
+            item_id = item.id
             
-            if not self.db.item_exists(item_id):
-                self.db.add_item(
-                    item_id,
-                    item.get('title', 'Unknown Title'),
-                    item.get('price', 0),
-                    item.get('url', ''),
-                    item.get('location', 'Unknown location')
-                )
-                
-                self.email.send_item_notification(item)
-                new_items += 1
+            # Listings can repeat within a batch
+            if item_id in stored_ids:
+                continue
+            stored_ids.add(item_id)
+            
+            repost_of = await self.repost_detector.find_repost(item, title_entries) if self.repost_detector else None
+            if not repost_of and self.image_detector:
+                repost_of = self.image_detector.find_repost(item, hashed_items)
+            
+            new_rows.append(item)
+            if self.repost_detector:
+                entry = self.repost_detector.index_entry(item, repost_of)
+                if entry:
+                    title_entries.append(entry)
+            if self.image_detector and item.phash is not None:
+                hashed_items.append(item)
+            
+            if repost_of:
+                logging.info("Skipping notification for likely repost of %s: %s", repost_of, item.title)
+            else:
+                fresh_ids.add(item_id)
         
-        logging.info(f"Found {len(results)} items, {new_items} new")
-        self.db.log_search(
-            self.config.get_search_params().get('keywords', ''),
+        # [Deals] is the owner's setting, so subscribers still get every fresh listing they match
+        owner_fresh_ids = self.score_deals(unseen, fresh_ids, search_params) if self.deal_scorer else fresh_ids
+        
+        notifications = []
+        for item in owner_items:
+            if item.id in owner_fresh_ids:
+                recipient = self.email.recipient_email
+                notifications.append((f"item:{item.id}:{recipient}", recipient, *self.email.build_item_notification(item)))
+        
+        for recipient, items in subscriber_matches.items():
+            fresh = [item for item in items if item.id in fresh_ids]
+            if fresh:
+                ids_digest = hashlib.sha1(",".join(sorted(item.id for item in fresh)).encode()).hexdigest()
+                notifications.append((f"digest:{recipient}:{ids_digest}", recipient, *self.email.build_digest_notification(fresh)))
+        
+        # Listings and their notifications commit together, so an alert is never lost once its listing is stored
+        image_rows = [self.image_detector.hash_row(item) for item in hashed_items] if self.image_detector else []
+        if new_rows and not await self.db.add_items_with_notifications(new_rows, notifications, title_entries, image_rows):
+            new_rows = ListingBatch()
+        elif self.image_detector:
+            self.image_detector.remember(hashed_items)
+        new_items = len(new_rows)
+        if self.price_tracker:
+            self.price_tracker.remember(new_rows)
+        if self.deal_scorer:
+            await self.deal_scorer.observe(search_params, new_rows.prices)
+        
+        logging.info("Found %d items, %d new", len(results), new_items)
+        await self.db.log_search(
+            search_params.get('keywords', ''),
             len(results),
-            new_items
+            new_items,
+            status,
+            duration_ms,
+            query_id(search_params)
         )
         
         return new_items
     
-    async def run_search_cycle(self):
+    async def _finish_search(self, results, search_params, subscriptions, outcome=None, price_update=None):
+        """Process one search's results and schedule its next run; returns (new items, items found)."""
+        with log_context(search_id=query_id(search_params)):
+            search_new_items = await self.process_search_results(results, search_params, subscriptions, outcome,
+                                                                 price_update)
+        now = datetime.now()
+        if results:
+            self.scheduler.observe(query_id(search_params), now, search_new_items)
+        self.scheduler.schedule(search_params, now)
+        return search_new_items, len(results)
+    
+    async def run_search_cycle(self, force=False):
+        """Run the searches that are due, or all of them when force is set."""
+        with log_context(cycle_id=new_log_id()):
+            return await self._run_search_cycle(force)
+    
+    async def _run_search_cycle(self, force):
         if not self.config.is_active():
             self.terminal.update_status("Search is not active. Waiting...")
             return False
         
+        unfinished = []
         try:
-            self.terminal.update_status("Browsing marketplace...")
-            results = await self.scraper.run_search()
-            new_items = await self.process_search_results(results)
+            # The whole cycle shares one deadline, so a stuck stage cannot hold back the next cycle
+            async with stage("cycle", self.timeouts['cycle']):
+                subscriptions = SubscriptionIndex(await self.db.get_subscriptions())
+                self.planned_queries = self.plan_queries(subscriptions)
+                queries = self.planned_queries if force else self.scheduler.due(self.planned_queries)
+                if not queries:
+                    return True
+                
+                # Searches differing only in price band share one page load and are split up afterwards
+                plan = coalesce_queries(queries)
+                if len(plan) < len(queries):
+                    logging.info("Coalesced %d searches into %d page loads", len(queries), len(plan))
+                unfinished = [search_params for _, members in plan for search_params in members]
+                
+                self.terminal.update_status("Browsing marketplace...")
+                # A group's fetch params are its own, so the configured search's rules go along with its members
+                owner_key = query_key(self.scraper.search_params)
+                group_rules = [GroupFilter(members, owner_key, self.config.get_filter_rules()) for _, members in plan]
+                all_results = await self.scraper.run_searches([fetch_params for fetch_params, _ in plan], group_rules)
+                
+                items_found = 0
+                new_items = 0
+                # Stored once all pages are processed, so a listing on several pages alerts each page's recipients
+                price_update = PriceUpdate() if self.price_tracker else None
+                for (fetch_params, members), fetched, outcome in zip(plan, all_results, self.scraper.outcomes):
+                    page_full = len(fetched) >= self.scraper.MAX_RESULTS
+                    if price_update:
+                        price_update.add(self.price_tracker.changes(fetched))
+                    if not self.removal_tracker:
+                        # Removal tracking records this itself; retention needs it to keep listings still shown
+                        await self.db.mark_listings_seen([item.id for item in fetched], datetime.now())
+                    for search_params in members:
+                        results = fetched if search_params is fetch_params else [
+                            item for item in fetched if in_price_range(item, search_params)
+                        ]
+                        # Snapshots follow each member's own query, which stays the same however it is grouped
+                        if self.removal_tracker:
+                            await self.removal_tracker.observe(search_params, results, fetched, page_full)
+                        search_new_items, found = await self._finish_search(
+                            results, search_params, subscriptions, outcome, price_update
+                        )
+                        unfinished.pop(0)
+                        new_items += search_new_items
+                        items_found += found
+                if price_update:
+                    await self.record_price_changes(price_update)
             
-            self.terminal.update_status(f"Search completed, found {len(results)} items ({new_items} new)")
+            self.terminal.update_status(f"Search completed, found {items_found} items ({new_items} new)")
             return True
             
         except Exception as e:
+            if is_transient(e):
+                # Searching stays active; the searches left over are still due next cycle
+                status = "timeout" if is_timeout(e) else "failed"
+                logging.warning(f"Search cycle cut short with {len(unfinished)} searches left: {e}")
+                for search_params in unfinished:
+                    await self.db.log_search(search_params.get('keywords', ''), 0, 0, status,
+                                             query_id=query_id(search_params))
+                self.terminal.update_status(f"Search cycle cut short: {e}")
+                return False
+            
             error_msg = f"Error during search cycle: {e}"
             logging.error(error_msg)
-            self.email.send_error_notification(error_msg)
+            recipient = self.email.recipient_email
+            await self.db.enqueue_notifications([
+                (f"error:{datetime.now().isoformat()}", recipient, *self.email.build_error_notification(error_msg))
+            ])
             self.config.set_active(False)
             self.terminal.update_status(f"ERROR: {str(e)}")
             return False
@@ -339,12 +653,29 @@ class MarketplaceApp:
     async def main_loop(self):
         self.terminal.start()
         self.terminal.update_status("Application started")
+        if self.repost_detector:
+            await self.repost_detector.index_missing()
+        if self.image_detector:
+            await self.image_detector.load()
+        await self.scheduler.load(self.db)
+        if self.price_tracker:
+            await self.price_tracker.load()
+        if self.deal_scorer:
+            await self.deal_scorer.load()
+        if self.scraper.strategy_stats:
+            await self.scraper.strategy_stats.load()
+        self.outbox_task = asyncio.create_task(self.outbox_sender.run())
+        if self.retention_job:
+            self.retention_task = asyncio.create_task(self.retention_job.run())
+        if self.api:
+            await self.api.start()
         
         while self.running:
             current_time = datetime.now()
             
-            if self.terminal.check_for_force_run() or current_time >= self.next_run_time:
-                await self.run_search_cycle()
+            force_run = self.terminal.check_for_force_run()
+            if force_run or current_time >= self.next_run_time:
+                await self.run_search_cycle(force=force_run)
                 self.next_run_time = self.calculate_next_run_time()
                 self.terminal.set_next_run_time(self.next_run_time)
             
@@ -360,15 +691,59 @@ class MarketplaceApp:
         try:
             await self.main_loop()
         finally:
+            self.outbox_sender.stop()
+            if self.api:
+                await self.api.close()
+            if self.outbox_task:
+                self.outbox_task.cancel()
+            if self.retention_task:
+                self.retention_job.stop()
+                self.retention_task.cancel()
+            self.dispatcher.close()
+            self.scraper.close()
             self.terminal.stop()
+            if self.image_detector:
+                self.image_detector.close()
             self.db.close()
             logging.info("Application shut down")
+            stop_logging(self.log_listener)
 
 
 if __name__ == "__main__":
+    import argparse
     import select
     import termios
     import tty
     
-    app = MarketplaceApp()
-    asyncio.run(app.run())
\ No newline at end of file
+    import export
+    import search
+    
+    parser = argparse.ArgumentParser(description="Facebook Marketplace email alerts")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("run", help="Run the scraper (the default)")
+    export.add_arguments(commands.add_parser("export", help="Stream a table to CSV, JSONL or Parquet"))
+    search.add_arguments(commands.add_parser("search", help="Search stored listings by title and description"))
+    args = parser.parse_args()
+    
+    if args.command == "export":
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        db = DatabaseManager()
+        try:
+            export.run(args, db)
+        except (ValueError, RuntimeError) as e:
+            logging.error(f"Export failed: {e}")
+            sys.exit(1)
+        finally:
+            db.close()
+    elif args.command == "search":
+        db = DatabaseManager()
+        try:
+            search.run(args, db)
+        except ValueError as e:
+            print(f"Search failed: {e}", file=sys.stderr)
+            sys.exit(1)
+        finally:
+            db.close()
+    else:
+        app = MarketplaceApp()
+        asyncio.run(app.run())
\ No newline at end of file
@@ -6,6 +6,11 @@ from email.mime.multipart import MIMEMultipart
 import os
 from datetime import datetime
 
+def _percentile_text(item):
+    """The listing's price percentile for {percentile} in templates, or n/a before the query has enough history."""
+    percentile = item.percentile
+    return "n/a" if percentile is None else f"{percentile:.0f}"
+
 class EmailNotifier:
     def __init__(self, email_config):
         self.recipient_email = email_config.get('recipient_email')
@@ -14,6 +19,9 @@ class EmailNotifier:
                                                'Found a {item_title} selling for ${price} in {location}.\nHere\'s the link: {url}')
         self.smtp_server = email_config.get('smtp_server', 'smtp.gmail.com')
         self.smtp_port = int(email_config.get('smtp_port', 465))
+        # 'ssl' (implicit TLS), 'starttls' or 'none' for a local relay; defaults follow the port as before
+        self.smtp_security = email_config.get('smtp_security') or ('ssl' if self.smtp_port == 465 else 'starttls')
+        self.smtp_timeout = float(email_config.get('smtp_timeout', 30))
         
         self._load_credentials()
             
@@ -30,56 +38,123 @@ class EmailNotifier:
             self.sender_email = config['Email'].get('sender_email')
             self.sender_password = config['Email'].get('sender_password')
             
-            if not self.sender_email or not self.sender_password:
+            # A local relay may accept mail without logging in, so only the sender is required there
+            if not self.sender_email or (not self.sender_password and self.smtp_security != 'none'):
                 raise ValueError("Email credentials not found in password.ini file")
         except Exception as e:
             logging.error(f"Error loading email credentials: {e}")
             raise
             
-    def send_item_notification(self, item):
+    def build_item_notification(self, item):
+        """Render the (subject, body) of the email for one listing."""
+        percentile = _percentile_text(item)
         subject = self.subject_template.format(
-            item_title=item['title'],
-            price=item['price']
+            item_title=item.title,
+            price=item.price,
+            percentile=percentile
         )
         
-        location = item.get('location', 'Unknown location')
+        location = item.location or 'Unknown location'
         message_text = self.message_template.format(
-            item_title=item['title'],
-            price=item['price'],
+            item_title=item.title,
+            price=item.price,
             location=location,
-            url=item['url']
+            url=item.url,
+            percentile=percentile
         )
         
-        return self._send_email(subject, message_text)
+        return subject, message_text
     
-    def send_error_notification(self, error_message):
+    def build_digest_notification(self, items):
+        """Render the (subject, body) of one email listing every matching item for a subscriber."""
+        if len(items) == 1:
+            item = items[0]
+            subject = self.subject_template.format(item_title=item.title, price=item.price,
+                                                   percentile=_percentile_text(item))
+        else:
+            subject = f"Found {len(items)} new marketplace listings"
+        
+        lines = []
+        for item in items:
+            location = item.location or 'Unknown location'
+            lines.append(f"- {item.title} - ${item.price} in {location}\n  {item.url}")
+        message_text = "New listings matching your subscription:\n\n" + "\n".join(lines)
+        
+        return subject, message_text
+    
+    def build_price_drop_notification(self, item, old_price):
+        """Render the (subject, body) of the email for a listing whose price has dropped."""
+        subject = f"Price drop: {item.title} now ${item.price} (was ${old_price})"
+        location = item.location or 'Unknown location'
+        message_text = (f"{item.title} in {location} dropped from ${old_price} to ${item.price}.\n\n"
+                        f"Here's the link: {item.url}")
+        
+        return subject, message_text
+    
+    def build_error_notification(self, error_message):
         subject = "ERROR: Facebook Marketplace Scraper"
         message_text = f"The marketplace scraper encountered an error at {datetime.now()}:\n\n{error_message}\n\nThe scraper has been deactivated. Please check the logs and restart manually."
         
+        return subject, message_text
+    
+    def send_item_notification(self, item):
+        subject, message_text = self.build_item_notification(item)
         return self._send_email(subject, message_text)
     
-    def _send_email(self, subject, message_text):
+    def send_digest_notification(self, recipient, items):
+        subject, message_text = self.build_digest_notification(items)
+        return self._send_email(subject, message_text, recipient)
+    
+    def send_error_notification(self, error_message):
+        subject, message_text = self.build_error_notification(error_message)
+        return self._send_email(subject, message_text)
+    
+    def _connect(self):
+        """Open an SMTP connection according to smtp_security, logged in unless it is an open relay.
+        
+        With 'none', login is skipped when no password is configured or the server offers no AUTH.
+        """
+        if self.smtp_security == 'ssl':
+            server = smtplib.SMTP_SSL(self.smtp_server, self.smtp_port, timeout=self.smtp_timeout)
+        else:
+            server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=self.smtp_timeout)
         try:
-            message = MIMEMultipart()
-            message['Subject'] = subject
-            message['From'] = self.sender_email
-            message['To'] = self.recipient_email
-            
-            message.attach(MIMEText(message_text, 'plain'))
-            
-            if self.smtp_port == 465:
-                with smtplib.SMTP_SSL(self.smtp_server, self.smtp_port) as server:
-                    server.login(self.sender_email, self.sender_password)
-                    server.sendmail(self.sender_email, self.recipient_email, message.as_string())
+            if self.smtp_security == 'starttls':
+                server.ehlo()
+                server.starttls()
+                server.ehlo()
+            if self.smtp_security == 'none':
+                server.ehlo_or_helo_if_needed()
+                needs_login = bool(self.sender_password) and server.has_extn('auth')
             else:
-                with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                    server.ehlo()
-                    server.starttls()
-                    server.ehlo()
-                    server.login(self.sender_email, self.sender_password)
-                    server.sendmail(self.sender_email, self.recipient_email, message.as_string())
-                
-            logging.info(f"Email notification sent: {subject}")
+                needs_login = True
+            if needs_login:
+                server.login(self.sender_email, self.sender_password)
+        except Exception:
+            server.close()
+            raise
+        return server
+    
+    def send_message(self, recipient, subject, message_text, message_id=None):
+        """Send one email, raising on failure so callers can retry."""
+        message = MIMEMultipart()
+        message['Subject'] = subject
+        message['From'] = self.sender_email
+        message['To'] = recipient
+        if message_id:
+            # A stable Message-ID lets mail clients drop duplicates of a retried send
+            message['Message-ID'] = message_id
+        
+        message.attach(MIMEText(message_text, 'plain'))
+        
+        with self._connect() as server:
+            server.sendmail(self.sender_email, recipient, message.as_string())
+        
+        logging.info(f"Email notification sent: {subject}")
+    
+    def _send_email(self, subject, message_text, recipient=None):
+        try:
+            self.send_message(recipient or self.recipient_email, subject, message_text)
             return True
         
         except Exception as e:
@@ -88,15 +163,8 @@ class EmailNotifier:
 
     def test_connection(self):
         try:
-            if self.smtp_port == 465:
-                with smtplib.SMTP_SSL(self.smtp_server, self.smtp_port) as server:
-                    server.login(self.sender_email, self.sender_password)
-            else:
-                with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                    server.ehlo()
-                    server.starttls()
-                    server.ehlo()
-                    server.login(self.sender_email, self.sender_password)
+            with self._connect():
+                pass
             
             logging.info("SMTP connection test successful")
             return True
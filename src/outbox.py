@@ -0,0 +1,100 @@
+import asyncio
+import hashlib
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+
+
+def message_id_for(idempotency_key):
+    """A stable Message-ID, so a notification that is retried after a crash is still one message."""
+    digest = hashlib.sha1(idempotency_key.encode()).hexdigest()
+    return f"<{digest}@marketplace-scraper>"
+
+
+class OutboxSender:
+    """Drains the outbox table in the background with exponential backoff and per-recipient rate limits.
+
+    Each row is fanned out through the dispatcher; backends that already delivered it are recorded,
+    so a retry only goes to the ones that failed.
+    """
+
+    def __init__(self, db, dispatcher, batch_size=20, poll_interval=5, base_delay=30, max_delay=3600,
+                 max_attempts=8, per_recipient_interval=10):
+        self.db = db
+        self.dispatcher = dispatcher
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.per_recipient_interval = per_recipient_interval
+        self.last_sent = {}
+        self.running = False
+
+    def backoff_delay(self, attempts):
+        """Seconds to wait before attempt number attempts + 1, with jitter so retries do not bunch up."""
+        delay = min(self.max_delay, self.base_delay * (2 ** max(0, attempts - 1)))
+        return delay * random.uniform(0.8, 1.2)
+
+    async def drain_once(self):
+        """Try every due notification once, concurrently, and return how many were sent."""
+        ready = []
+        for row in await self.db.get_due_notifications(self.batch_size):
+            recipient = row['recipient']
+            wait = self.last_sent.get(recipient, 0) + self.per_recipient_interval - time.monotonic()
+            if wait > 0:
+                # Rate limited: try again once the recipient's interval has passed, without using up an attempt
+                await self.db.reschedule_notification(row['id'], datetime.now() + timedelta(seconds=wait),
+                                                      count_attempt=False)
+                continue
+            self.last_sent[recipient] = time.monotonic()
+            ready.append(row)
+
+        outcomes = await asyncio.gather(*(self._deliver(row) for row in ready))
+        return sum(outcomes)
+
+    async def _deliver(self, row):
+        delivered = set(filter(None, (row['delivered_to'] or '').split(',')))
+        alert = {
+            'recipient': row['recipient'],
+            'subject': row['subject'],
+            'body': row['body'],
+            'idempotency_key': row['idempotency_key'],
+            'message_id': message_id_for(row['idempotency_key'])
+        }
+        outcomes = await self.dispatcher.dispatch(alert, skip=delivered)
+        delivered.update(name for name, error in outcomes.items() if error is None)
+        errors = {name: error for name, error in outcomes.items() if error is not None}
+        delivered_to = ",".join(sorted(delivered))
+
+        if not errors:
+            await self.db.mark_notification_sent(row['id'], delivered_to)
+            return True
+
+        error = "; ".join(f"{name}: {message}" for name, message in errors.items())
+        attempts = row['attempts'] + 1
+        if attempts >= self.max_attempts:
+            logging.error(f"Giving up on notification {row['idempotency_key']} after {attempts} attempts: {error}")
+            await self.db.reschedule_notification(row['id'], datetime.now(), error, failed=True, delivered_to=delivered_to)
+        else:
+            delay = self.backoff_delay(attempts)
+            logging.warning(f"Notification {row['idempotency_key']} failed (attempt {attempts}), retrying in {delay:.0f}s: {error}")
+            await self.db.reschedule_notification(row['id'], datetime.now() + timedelta(seconds=delay), error,
+                                                  delivered_to=delivered_to)
+        return False
+
+    async def run(self):
+        """Keep draining until stop() is called. Pending rows left by a crash are picked up on the first pass."""
+        self.running = True
+        while self.running:
+            try:
+                sent = await self.drain_once()
+            except Exception as e:
+                logging.error(f"Outbox sender error: {e}")
+                sent = 0
+            if not sent:
+                await asyncio.sleep(self.poll_interval)
+
+    def stop(self):
+        self.running = False
@@ -0,0 +1,167 @@
+import asyncio
+import io
+import logging
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy as np
+    from PIL import Image
+except ImportError:
+    np = None
+    Image = None
+
+HASH_SIZE = 8
+IMAGE_SIZE = 32
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/96.0.4664.110 Safari/537.36"
+
+
+def is_available():
+    """Perceptual hashing needs NumPy and Pillow, which are optional dependencies."""
+    return np is not None and Image is not None
+
+
+def _dct_matrix(n):
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.sqrt(2.0 / n) * np.cos(np.pi * (2 * i + 1) * k / (2 * n))
+    matrix[0, :] /= np.sqrt(2.0)
+    return matrix
+
+
+_DCT = _dct_matrix(IMAGE_SIZE) if np is not None else None
+
+
+def compute_phash(image_bytes):
+    """Reduce an image to a 64-bit DCT perceptual hash. Runs in a worker process."""
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        pixels = np.asarray(image.convert('L').resize((IMAGE_SIZE, IMAGE_SIZE), Image.LANCZOS), dtype=np.float64)
+
+    # 2-D DCT as two matrix products, keeping only the lowest frequencies
+    low_frequencies = (_DCT @ pixels @ _DCT.T)[:HASH_SIZE, :HASH_SIZE]
+    bits = (low_frequencies > np.median(low_frequencies)).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def to_signed64(value):
+    """SQLite INTEGER columns are signed 64-bit."""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def from_signed64(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+class HammingIndex:
+    """Multi-index hash table for Hamming-distance search over 64-bit hashes.
+
+    A hash is split into max_distance + 1 chunks; by the pigeonhole principle any hash within
+    max_distance bits shares at least one chunk exactly, so only those buckets are checked.
+    """
+
+    def __init__(self, max_distance=4, bits=64):
+        self.max_distance = max_distance
+        chunk_count = max_distance + 1
+        base, extra = divmod(bits, chunk_count)
+        self.chunks = []
+        shift = 0
+        for i in range(chunk_count):
+            width = base + (1 if i < extra else 0)
+            self.chunks.append((shift, (1 << width) - 1))
+            shift += width
+        self.tables = [{} for _ in self.chunks]
+        self.hashes = {}
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def add(self, item_id, value):
+        self.hashes[item_id] = value
+        for table, (shift, mask) in zip(self.tables, self.chunks):
+            table.setdefault((value >> shift) & mask, []).append(item_id)
+
+    def search(self, value):
+        """Return (distance, id) pairs within max_distance, nearest first."""
+        matches = {}
+        for table, (shift, mask) in zip(self.tables, self.chunks):
+            for item_id in table.get((value >> shift) & mask, ()):
+                if item_id in matches:
+                    continue
+                distance = (value ^ self.hashes[item_id]).bit_count()
+                if distance <= self.max_distance:
+                    matches[item_id] = distance
+        return sorted((distance, item_id) for item_id, distance in matches.items())
+
+
+def _fetch_image(url, timeout):
+    request = urllib.request.Request(url, headers={'User-Agent': USER_AGENT})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.read()
+
+
+class ImageRepostDetector:
+    """Flags new listings whose thumbnail is perceptually identical to one we have already stored."""
+
+    def __init__(self, db, max_distance=4, workers=2, fetch_concurrency=4, timeout=15):
+        self.db = db
+        self.fetch_concurrency = max(1, fetch_concurrency)
+        self.timeout = timeout
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        self.index = HammingIndex(max_distance)
+
+    async def load(self):
+        """Fill the in-memory index from the stored hashes. Call once before the first search."""
+        for item_id, value in await self.db.get_image_hashes():
+            self.index.add(item_id, from_signed64(value))
+        logging.info(f"Loaded {len(self.index)} image hashes for repost detection")
+
+    async def hash_items(self, items):
+        """Fetch thumbnails for the given (new) items and set item.phash without blocking the event loop."""
+        semaphore = asyncio.Semaphore(self.fetch_concurrency)
+        await asyncio.gather(*(self._hash_item(semaphore, item) for item in items if item.image_url))
+        return items
+
+    async def _hash_item(self, semaphore, item):
+        loop = asyncio.get_running_loop()
+        try:
+            async with semaphore:
+                image_bytes = await asyncio.to_thread(_fetch_image, item.image_url, self.timeout)
+            item.phash = await loop.run_in_executor(self.executor, compute_phash, image_bytes)
+        except Exception as e:
+            logging.warning(f"Could not hash thumbnail for listing {item.id}: {e}")
+
+    def find_repost(self, item, pending=()):
+        """Return the ID of the nearest stored listing with a matching thumbnail, or None.
+
+        pending holds listings of the same batch that are not stored yet; they are checked after the index.
+        """
+        if item.phash is None:
+            return None
+        for _, item_id in self.index.search(item.phash):
+            if item_id != item.id:
+                return item_id
+        for other in pending:
+            if (other.phash is not None and other.id != item.id
+                    and (other.phash ^ item.phash).bit_count() <= self.index.max_distance):
+                return other.id
+        return None
+
+    def hash_row(self, item):
+        """The (id, phash, image_url) image_hashes row for a hashed listing."""
+        return item.id, to_signed64(item.phash), item.image_url
+
+    def remember(self, items):
+        """Make the thumbnails of listings whose rows were just committed searchable."""
+        for item in items:
+            if item.phash is not None:
+                self.index.add(item.id, item.phash)
+
+    async def add(self, item):
+        """Store a listing's thumbnail hash and make it searchable."""
+        if item.phash is None:
+            return False
+        self.index.add(item.id, item.phash)
+        return await self.db.add_image_hash(item.id, to_signed64(item.phash), item.image_url)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,67 @@
+import logging
+
+
+class PriceTracker:
+    """Spots price changes on stored listings without querying the database per listing.
+
+    The last known price of every stored listing is kept in memory, loaded once at startup, so
+    checking a page of results is a dict lookup per listing. Changes are written to the
+    price_history table in one batch. With drop_alert_percent set, a fall of at least that many
+    percent counts as a drop worth a notification.
+    """
+
+    def __init__(self, db, drop_alert_percent=0):
+        self.db = db
+        self.drop_alert_percent = drop_alert_percent
+        self.last_prices = {}
+
+    async def load(self):
+        self.last_prices = dict(await self.db.get_last_prices())
+        logging.info(f"Loaded last prices of {len(self.last_prices)} listings")
+
+    def changes(self, items):
+        """Return (item, old_price) for stored listings whose price differs from the last one recorded.
+        
+        Nothing is remembered here, so every query showing a changed listing sees the change
+        until apply() is called with it after the change is stored.
+        """
+        changed = {}
+        for item in items:
+            item_id = item.id
+            price = item.price
+            old_price = self.last_prices.get(item_id)
+            # A missing or zero price is usually a failed extraction, not a real change
+            if old_price is None or not price or price == old_price or item_id in changed:
+                continue
+            changed[item_id] = (item, old_price)
+        return list(changed.values())
+
+    def apply(self, changes):
+        """Take the prices of stored changes as the last known ones."""
+        self.last_prices.update((item.id, item.price) for item, _ in changes)
+
+    def remember(self, batch):
+        """Start tracking a newly stored ListingBatch."""
+        self.last_prices.update(zip(batch.ids, batch.prices))
+
+    def is_drop(self, old_price, new_price):
+        if not self.drop_alert_percent or not old_price:
+            return False
+        return (old_price - new_price) / old_price * 100 >= self.drop_alert_percent
+
+
+class PriceUpdate:
+    """The price changes seen over a search cycle, one per listing, and the drop alerts queued for them.
+
+    Each fetched page adds its changes before its searches are processed, and each search adds
+    alerts for its own recipients, so a listing shown to several of them alerts all of them.
+    """
+
+    def __init__(self, changes=()):
+        self.changes = {}
+        self.notifications = []
+        self.add(changes)
+
+    def add(self, changes):
+        for item, old_price in changes:
+            self.changes.setdefault(item.id, (item, old_price))
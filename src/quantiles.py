@@ -0,0 +1,143 @@
+import json
+import logging
+import math
+import random
+import struct
+from array import array
+
+from subscriptions import query_key
+
+_HEADER = struct.Struct("<HQH")
+_LEVEL = struct.Struct("<I")
+
+
+class KLLSketch:
+    """KLL quantile sketch: approximate ranks over a stream in space that grows only with log(n).
+
+    Level h holds values that each stand for 2**h observed ones. When the sketch is full, the
+    lowest full level is sorted and every other value (from a random offset) is promoted to the
+    next level, halving it. Lower levels get smaller capacities, so most of the space goes to
+    the top levels, which represent most of the stream.
+    """
+
+    def __init__(self, k=200, levels=None, n=0):
+        self.k = k
+        self.levels = levels or [[]]
+        self.n = n
+        self._rng = random.Random()
+
+    def __len__(self):
+        return self.n
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, math.ceil(self.k * (2 / 3) ** depth))
+
+    def update(self, value):
+        self.levels[0].append(value)
+        self.n += 1
+        if sum(map(len, self.levels)) >= sum(self._capacity(h) for h in range(len(self.levels))):
+            self._compress()
+
+    def _compress(self):
+        for h, items in enumerate(self.levels):
+            if len(items) < self._capacity(h):
+                continue
+            if h + 1 == len(self.levels):
+                self.levels.append([])
+            items.sort()
+            # An odd value out stays behind so the promoted half keeps the level's exact weight
+            leftover = [items.pop()] if len(items) % 2 else []
+            self.levels[h + 1].extend(items[self._rng.randrange(2)::2])
+            self.levels[h] = leftover
+            return
+
+    def rank(self, value):
+        """Fraction of observed values strictly below value."""
+        below = sum(sum(1 for item in items if item < value) << h for h, items in enumerate(self.levels))
+        total = sum(len(items) << h for h, items in enumerate(self.levels))
+        return below / total if total else 0.0
+
+    def quantile(self, fraction):
+        """The observed value with about fraction of the stream below it."""
+        weighted = sorted((item, 1 << h) for h, items in enumerate(self.levels) for item in items)
+        if not weighted:
+            return None
+        target = fraction * sum(weight for _, weight in weighted)
+        seen = 0
+        for item, weight in weighted:
+            seen += weight
+            if seen > target:
+                return item
+        return weighted[-1][0]
+
+    def to_bytes(self):
+        parts = [_HEADER.pack(self.k, self.n, len(self.levels))]
+        for items in self.levels:
+            parts.append(_LEVEL.pack(len(items)))
+            parts.append(array('d', items).tobytes())
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        k, n, level_count = _HEADER.unpack_from(data)
+        offset = _HEADER.size
+        levels = []
+        for _ in range(level_count):
+            (count,) = _LEVEL.unpack_from(data, offset)
+            offset += _LEVEL.size
+            items = array('d')
+            items.frombytes(data[offset:offset + count * items.itemsize])
+            offset += count * items.itemsize
+            levels.append(items.tolist())
+        return cls(k, levels, n)
+
+
+def _sketch_key(search_params):
+    return json.dumps(query_key(search_params))
+
+
+class DealScorer:
+    """Scores new listings by where their price falls among what each query has shown before.
+
+    Every query keeps a KLL sketch of the prices of the listings it has stored, persisted in
+    the price_sketches table. A listing's percentile is its rank in that sketch. Once a query has
+    min_samples prices, listings above max_percentile are not alerted on (0 alerts on every
+    listing, whatever its percentile).
+    """
+
+    def __init__(self, db, max_percentile=0, min_samples=30, sketch_size=200):
+        self.db = db
+        self.max_percentile = max_percentile
+        self.min_samples = min_samples
+        self.sketch_size = sketch_size
+        self.sketches = {}
+
+    async def load(self):
+        for key, data in await self.db.get_price_sketches():
+            try:
+                self.sketches[key] = KLLSketch.from_bytes(data)
+            except struct.error as e:
+                logging.warning(f"Discarding unreadable price sketch for {key}: {e}")
+        logging.info(f"Loaded price sketches for {len(self.sketches)} queries")
+
+    def percentile(self, search_params, price):
+        """Percent of the query's earlier prices below price, or None until it has min_samples of them."""
+        sketch = self.sketches.get(_sketch_key(search_params))
+        if sketch is None or len(sketch) < self.min_samples or not price:
+            return None
+        return round(sketch.rank(price) * 100, 1)
+
+    def is_deal(self, percentile):
+        return not self.max_percentile or percentile is None or percentile <= self.max_percentile
+
+    async def observe(self, search_params, prices):
+        """Add a batch of stored listings' prices to the query's sketch and persist it."""
+        prices = [price for price in prices if price]
+        if not prices:
+            return
+        key = _sketch_key(search_params)
+        sketch = self.sketches.setdefault(key, KLLSketch(self.sketch_size))
+        for price in prices:
+            sketch.update(float(price))
+        await self.db.save_price_sketch(key, sketch.to_bytes())
@@ -0,0 +1,73 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import zlib
+from datetime import datetime, timedelta
+
+
+class RetentionJob:
+    """Prunes rows past their retention period in the background, a small batch at a time.
+
+    policies maps a table in database.RETENTION_COLUMNS to the days its rows are kept. Each
+    batch is its own short write, with a pause between batches, so the scraper's writes are never
+    held up for long. After every pass, freed pages go back to the filesystem through incremental
+    vacuum. With archive_path, pruned rows are kept, compressed, in a separate archive database.
+    """
+
+    def __init__(self, db, policies, batch_size=500, batch_pause=0.2, interval_hours=6, vacuum_pages=2000,
+                 archive_path=None):
+        self.db = db
+        self.policies = policies
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.interval_hours = interval_hours
+        self.vacuum_pages = vacuum_pages
+        self.archive_path = archive_path
+        self.running = False
+
+    async def run_once(self):
+        """Prune every table once and return {table: rows pruned}."""
+        pruned = {}
+        for table, days in self.policies.items():
+            before = datetime.now() - timedelta(days=days)
+            pruned[table] = 0
+            while True:
+                count = await self.db.prune_rows(table, before, self.batch_size, self.archive_path)
+                pruned[table] += count
+                if count < self.batch_size:
+                    break
+                await asyncio.sleep(self.batch_pause)
+
+        freed = await self.db.incremental_vacuum(self.vacuum_pages)
+        if any(pruned.values()) or freed:
+            summary = ", ".join(f"{count} {table}" for table, count in pruned.items() if count)
+            logging.info(f"Retention pruned {summary or 'nothing'} and freed {freed} pages")
+        return pruned
+
+    async def run(self):
+        self.running = True
+        while self.running:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logging.error(f"Retention job error: {e}")
+            await asyncio.sleep(self.interval_hours * 3600)
+
+    def stop(self):
+        self.running = False
+
+
+def iter_archived_rows(archive_path, table):
+    """Yield the archived rows of one table as dicts, oldest batch first."""
+    conn = sqlite3.connect(archive_path)
+    try:
+        batches = conn.execute(
+            "SELECT columns, data FROM archived_rows WHERE table_name = ? ORDER BY id", (table,)
+        )
+        for columns, data in batches:
+            columns = json.loads(columns)
+            for row in json.loads(zlib.decompress(data)):
+                yield dict(zip(columns, row))
+    finally:
+        conn.close()
@@ -0,0 +1,118 @@
+import logging
+import re
+
+def tokenize(text):
+    """Lowercase word tokens used for keyword matching."""
+    return re.findall(r"[a-z0-9]+", (text or "").lower())
+
+
+def _split_list(value):
+    if not value:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(v).strip() for v in value if str(v).strip()]
+    return [part.strip() for part in str(value).split(',') if part.strip()]
+
+
+def _parse_price_band(band):
+    low, _, high = band.partition('-')
+    low = float(low) if low.strip() else 0.0
+    high = float(high) if high.strip() else float('inf')
+    return low, high
+
+
+class RuleSet:
+    """A search's include/exclude rules compiled into one matcher.
+
+    Keywords (single words or phrases) become sets of token tuples, so checking a title costs one
+    set lookup per title n-gram however many keywords there are. All regexes of a kind are joined
+    into a single alternation and compiled once.
+    """
+
+    def __init__(self, include=(), exclude=(), include_regex=(), exclude_regex=(),
+                 price_bands=(), min_title_length=0, max_title_length=0):
+        self.include = {tuple(tokenize(keyword)) for keyword in include if tokenize(keyword)}
+        self.exclude = {tuple(tokenize(keyword)) for keyword in exclude if tokenize(keyword)}
+        self.max_phrase_length = max((len(phrase) for phrase in self.include | self.exclude), default=0)
+        self.include_regex = self._combine(include_regex)
+        self.exclude_regex = self._combine(exclude_regex)
+        self.price_bands = sorted(price_bands)
+        self.min_title_length = min_title_length
+        self.max_title_length = max_title_length
+
+    @staticmethod
+    def _combine(patterns):
+        patterns = list(patterns)
+        if not patterns:
+            return None
+        return re.compile("|".join(f"(?:{pattern})" for pattern in patterns), re.IGNORECASE)
+
+    @classmethod
+    def from_mapping(cls, options):
+        """Build a rule set from string options such as a configparser section or a JSON object."""
+        def get(key, default=None):
+            value = options.get(key, default)
+            return default if value in (None, '') else value
+
+        try:
+            return cls(
+                include=_split_list(get('include')),
+                exclude=_split_list(get('exclude')),
+                # Regexes may contain commas, so they are one per line
+                include_regex=[line.strip() for line in str(get('include_regex', '')).splitlines() if line.strip()],
+                exclude_regex=[line.strip() for line in str(get('exclude_regex', '')).splitlines() if line.strip()],
+                price_bands=[_parse_price_band(band) for band in _split_list(get('price_bands'))],
+                min_title_length=int(get('min_title_length', 0)),
+                max_title_length=int(get('max_title_length', 0))
+            )
+        except (ValueError, re.error) as e:
+            raise ValueError(f"Invalid filter rule: {e}") from e
+
+    def is_empty(self):
+        return not (self.include or self.exclude or self.include_regex or self.exclude_regex
+                    or self.price_bands or self.min_title_length or self.max_title_length)
+
+    def _phrases(self, tokens):
+        for size in range(1, self.max_phrase_length + 1):
+            for start in range(len(tokens) - size + 1):
+                yield tuple(tokens[start:start + size])
+
+    def matches(self, item, tokens=None):
+        """Return True when the listing passes every rule.
+
+        Callers checking one listing against many rule sets can pass its tokens to avoid re-tokenizing.
+        """
+        title = item.title or ""
+
+        if self.min_title_length and len(title) < self.min_title_length:
+            return False
+        if self.max_title_length and len(title) > self.max_title_length:
+            return False
+
+        if self.price_bands:
+            price = item.price or 0
+            if not any(low <= price <= high for low, high in self.price_bands):
+                return False
+
+        if self.include or self.exclude:
+            phrases = set(self._phrases(tokens if tokens is not None else tokenize(title)))
+            if self.exclude and not phrases.isdisjoint(self.exclude):
+                return False
+            if self.include and phrases.isdisjoint(self.include):
+                return False
+
+        if self.exclude_regex and self.exclude_regex.search(title):
+            return False
+        if self.include_regex and not self.include_regex.search(title):
+            return False
+
+        return True
+
+    def filter(self, items):
+        """Return the listings that pass, logging how many were dropped."""
+        if self.is_empty():
+            return items
+        kept = [item for item in items if self.matches(item)]
+        if len(kept) != len(items):
+            logging.info("Filter rules dropped %d of %d listings", len(items) - len(kept), len(items))
+        return kept
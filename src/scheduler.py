@@ -0,0 +1,117 @@
+import logging
+import random
+from datetime import datetime, timedelta
+
+from subscriptions import query_id, query_key
+
+
+def _parse_timestamp(value):
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+
+class _ArrivalRate:
+    """EWMA of new listings per hour, one per time-of-day bucket plus an overall estimate."""
+
+    def __init__(self, buckets, alpha):
+        self.alpha = alpha
+        self.by_bucket = [None] * buckets
+        self.overall = None
+        self.last_run = None
+
+    def _blend(self, current, rate):
+        return rate if current is None else self.alpha * rate + (1 - self.alpha) * current
+
+    def observe(self, bucket, timestamp, new_items):
+        if self.last_run is not None and timestamp > self.last_run:
+            hours = (timestamp - self.last_run).total_seconds() / 3600
+            rate = (new_items or 0) / hours
+            self.by_bucket[bucket] = self._blend(self.by_bucket[bucket], rate)
+            self.overall = self._blend(self.overall, rate)
+        self.last_run = timestamp
+
+    def estimate(self, bucket):
+        rate = self.by_bucket[bucket]
+        return self.overall if rate is None else rate
+
+
+class AdaptiveScheduler:
+    """Gives each search its own next run time from how fast new listings have been arriving.
+
+    Arrival rates come from the searches log: new items found divided by the time since that
+    search's previous run. They are kept per query ID, so queries sharing keywords but not
+    location or price range, which may run moments apart, do not share one estimate. They are smoothed with an EWMA per time-of-day bucket. A search is
+    next due when target_new_per_run listings are expected, clamped to [min_interval, max_interval]
+    minutes. Searches without history run every base_interval minutes, as before. Up to
+    jitter_minutes of random delay is added so runs do not fall on a fixed beat.
+    """
+
+    def __init__(self, base_interval=15, min_interval=5, max_interval=60, target_new_per_run=1.0, bucket_hours=3,
+                 alpha=0.3, history_days=14, jitter_minutes=5, adaptive=True):
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_new_per_run = target_new_per_run
+        self.bucket_hours = bucket_hours
+        self.alpha = alpha
+        self.history_days = history_days
+        self.jitter_minutes = jitter_minutes
+        self.adaptive = adaptive
+        self.rates = {}
+        self.next_runs = {}
+
+    def _bucket(self, timestamp):
+        return timestamp.hour // self.bucket_hours
+
+    def _rate(self, query):
+        if query not in self.rates:
+            self.rates[query] = _ArrivalRate(-(-24 // self.bucket_hours), self.alpha)
+        return self.rates[query]
+
+    async def load(self, db):
+        """Replay recent search history so estimates survive restarts.
+
+        Searches logged before query IDs were recorded cannot be told apart, so they are skipped.
+        """
+        since = datetime.now() - timedelta(days=self.history_days)
+        rows = await db.get_search_history(since)
+        for timestamp, query, new_items, status in rows:
+            if status == 'completed' and query:
+                self.observe(query, _parse_timestamp(timestamp), new_items)
+        logging.info(f"Loaded {len(rows)} past searches for scheduling")
+
+    def observe(self, query, timestamp, new_items):
+        """Record a completed run of the query with the given query_id."""
+        self._rate(query).observe(self._bucket(timestamp), timestamp, new_items)
+
+    def interval(self, search_params, now=None):
+        """Minutes until the search should run again, before jitter."""
+        if not self.adaptive:
+            return self.base_interval
+        now = now or datetime.now()
+        rate = self._rate(query_id(search_params)).estimate(self._bucket(now))
+        if rate is None:
+            return self.base_interval
+        if rate <= 0:
+            return self.max_interval
+        minutes = self.target_new_per_run / rate * 60
+        return max(self.min_interval, min(self.max_interval, minutes))
+
+    def due(self, queries, now=None):
+        """The queries whose next run time has passed; queries never scheduled are due at once."""
+        now = now or datetime.now()
+        return [params for params in queries if self.next_runs.get(query_key(params), now) <= now]
+
+    def schedule(self, search_params, now=None):
+        now = now or datetime.now()
+        minutes = self.interval(search_params, now)
+        jitter = random.uniform(0, self.jitter_minutes)
+        next_run = now + timedelta(minutes=minutes + jitter)
+        self.next_runs[query_key(search_params)] = next_run
+        logging.info("Next run of '%s' at %s (interval %.1fm + random %.2fm)",
+                     search_params.get('keywords'), next_run.strftime('%H:%M:%S'), minutes, jitter)
+        return next_run
+
+    def next_run_time(self, queries, now=None):
+        """The earliest next run time among the given queries."""
+        now = now or datetime.now()
+        return min((self.next_runs.get(query_key(params), now) for params in queries), default=now)
@@ -1,12 +1,22 @@
 import asyncio
 import logging
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from urllib.parse import quote
 
 from browser import BrowserManager
+from deadlines import is_timeout, is_transient, stage
 from extraction import ExtractionManager
+from extraction_stats import StrategyStats
+from logging_setup import log_context
+from subscriptions import query_id, query_key
+from enrichment import DetailEnricher
 
 class MarketplaceScraper:
+    # Listings kept per search; a page with this many may have had more cut off
+    MAX_RESULTS = 20
+    
     # Map of supported cities to their Facebook Marketplace location identifiers
     SUPPORTED_LOCATIONS = {
         "vancouver": "vancouver/", 
@@ -23,17 +33,33 @@ class MarketplaceScraper:
         "melbourne": "melbourne/"
     }
     
-    def __init__(self, config_manager):
+    def __init__(self, config_manager, db=None):
         self.config = config_manager
+        self.db = db
         self.search_params = self.config.get_search_params()
+        self.base_url = self.config.get_base_url().rstrip('/') + '/'
         self.user_data_dir = "browser_data"
         self.storage_state_path = os.path.join(self.user_data_dir, "storage_state.json")
         
         if not os.path.exists(self.user_data_dir):
             os.makedirs(self.user_data_dir)
         
-        self.browser_manager = BrowserManager(self.user_data_dir, self.storage_state_path)
+        self.browser_manager = BrowserManager(self.user_data_dir, self.storage_state_path,
+                                              **self.config.get_browser_config())
         self.extraction_manager = None
+        self.timeouts = self.config.get_timeout_config()
+        self.last_outcome = None
+        self.outcomes = []
+        
+        extraction_config = self.config.get_extraction_config()
+        self.extraction_engine = extraction_config['engine']
+        self.parse_executor = None
+        if self.extraction_engine == "python":
+            self.parse_executor = ProcessPoolExecutor(max_workers=extraction_config['workers'])
+        # Without a database there is nowhere to keep the stats, so the default strategy order is used
+        self.strategy_stats = None
+        if db is not None:
+            self.strategy_stats = StrategyStats(db, exploration=extraction_config['exploration'])
     
     def _get_location_identifier(self, location_name):
         """Convert a location name from the config to the proper Facebook URL format."""
@@ -50,22 +76,23 @@ class MarketplaceScraper:
         # Try partial match
         for supported_location, identifier in self.SUPPORTED_LOCATIONS.items():
             if supported_location in location_name or location_name in supported_location:
-                logging.info(f"Using location '{supported_location}' for search parameter '{location_name}'")
+                logging.info("Using location '%s' for search parameter '%s'", supported_location, location_name)
                 return identifier
                 
         # If no match, log a warning and return empty string
         logging.warning(f"Location '{location_name}' not found in supported locations. Using default location.")
         return ""
     
-    def _build_search_url(self):
-        keywords = quote(self.search_params['keywords'])
-        location_name = self.search_params['location'] if 'location' in self.search_params else ""
+    def _build_search_url(self, search_params=None):
+        search_params = search_params or self.search_params
+        keywords = quote(search_params['keywords'])
+        location_name = search_params['location'] if 'location' in search_params else ""
         location_identifier = self._get_location_identifier(location_name)
-        min_price = int(self.search_params['min_price'])
-        max_price = int(self.search_params['max_price'])
+        min_price = int(float(search_params.get('min_price') or 0))
+        max_price = int(float(search_params.get('max_price') or 0))
         
         # Build URL with location if available
-        base_url = "https://www.facebook.com/marketplace/"
+        base_url = self.base_url
         if location_identifier:
             url = f"{base_url}{location_identifier}search?query={keywords}"
         else:
@@ -74,71 +101,169 @@ class MarketplaceScraper:
         if min_price > 0 or max_price > 0:
             url += f"&minPrice={min_price}&maxPrice={max_price}"
             
-        logging.info(f"Built search URL with location '{location_name}' → '{location_identifier}'")
+        logging.info("Built search URL with location '%s' → '%s'", location_name, location_identifier)
         return url
     
-    async def search_marketplace(self):
-        results = []
-        try:
-            search_url = self._build_search_url()
-            logging.info(f"Navigating to: {search_url}")
-            
-            page = self.browser_manager.page
+    async def search_marketplace(self, search_params=None):
+        """Run one search within its time budget, retrying transient failures on a fresh page.
+        
+        Sets self.last_outcome to (status, milliseconds) for the searches log: 'completed',
+        'timeout' when the last attempt ran out of time, or 'failed'. Only an error that would
+        repeat on every attempt deactivates searching.
+        """
+        search_params = search_params or self.search_params
+        start = time.perf_counter()
+        status, results = "failed", []
+        retries = self.timeouts['retries']
+        for attempt in range(retries + 1):
+            try:
+                async with stage("search", self.timeouts['search']):
+                    results = await self._search_page(search_params)
+                status = "completed"
+                break
+            except Exception as e:
+                if not is_transient(e):
+                    logging.error(f"Error during marketplace search: {e}")
+                    await self._screenshot("error.png")
+                    self.config.set_active(False)
+                    break
+                status = "timeout" if is_timeout(e) else "failed"
+                logging.warning(f"Search attempt {attempt+1} of {retries+1} failed, recycling the page: {e}")
+                await self.browser_manager.recycle_page()
+                if attempt < retries:
+                    await self.browser_manager.random_wait(3, 5, "before retrying the search")
+        self.last_outcome = (status, (time.perf_counter() - start) * 1000)
+        return results
+    
+    async def _search_page(self, search_params):
+        search_url = self._build_search_url(search_params)
+        logging.info("Navigating to: %s", search_url)
+        
+        page = self.browser_manager.page
+        async with stage("navigation", self.timeouts['navigation']):
             await page.goto(search_url, wait_until="domcontentloaded")
-            await self.browser_manager.random_wait(reason="after initial page load")
-            
+        await self.browser_manager.random_wait(reason="after initial page load")
+        
+        async with stage("dialogs", self.timeouts['dialogs']):
             await self.browser_manager.handle_initial_dialogs()
-            
-            self.extraction_manager = ExtractionManager(page)
-            
-            for attempt in range(3):
-                try:
+        
+        self.extraction_manager = ExtractionManager(page, self.extraction_engine, self.parse_executor,
+                                                    self.strategy_stats, (search_params.get('keywords') or "").lower())
+        
+        results = []
+        for attempt in range(3):
+            try:
+                async with stage("extraction", self.timeouts['extraction']):
                     await self.browser_manager.simulate_human_behavior()
-                    
                     results = await self.extraction_manager.extract_via_multiple_strategies()
-                    
-                    if results:
-                        logging.info(f"Successfully extracted data for {len(results)} listings on attempt {attempt+1}")
-                        break
-                    else:
-                        logging.warning(f"No results found on attempt {attempt+1}, retrying...")
-                        await self.browser_manager.random_wait(3, 5, "before retry")
-                except Exception as e:
-                    logging.warning(f"Error during extraction attempt {attempt+1}: {e}")
-                    await self.browser_manager.random_wait(3, 5, "after error")
-            
-            if not results:
-                await page.screenshot(path="no_results.png")
-                logging.error("All extraction attempts failed")
-            
-            # Results should already have cleaned URLs from extraction manager
-            # Remove duplicates by URL
-            unique_results = []
-            seen_urls = set()
-            for item in results[:20]:  # Limit to first 20 results
-                if item['url'] not in seen_urls:
-                    seen_urls.add(item['url'])
-                    unique_results.append(item)
-            
-            return unique_results
-            
+                
+                if results:
+                    logging.info("Successfully extracted data for %d listings on attempt %d", len(results), attempt + 1)
+                    break
+                else:
+                    logging.warning(f"No results found on attempt {attempt+1}, retrying...")
+                    await self.browser_manager.random_wait(3, 5, "before retry")
+            except Exception as e:
+                # A page that hung once will hang again; let search_marketplace replace it
+                if is_timeout(e):
+                    raise
+                logging.warning(f"Error during extraction attempt {attempt+1}: {e}")
+                await self.browser_manager.random_wait(3, 5, "after error")
+        
+        if not results:
+            await self._screenshot("no_results.png")
+            logging.error("All extraction attempts failed")
+        
+        # Results should already have cleaned URLs from extraction manager
+        # Remove duplicates by URL, keeping the first MAX_RESULTS distinct listings
+        unique_results = []
+        seen_urls = set()
+        for item in results:
+            if len(unique_results) == self.MAX_RESULTS:
+                break
+            if item.url not in seen_urls:
+                seen_urls.add(item.url)
+                unique_results.append(item)
+        
+        return unique_results
+    
+    async def _screenshot(self, path):
+        try:
+            async with stage("screenshot", 10):
+                await self.browser_manager.page.screenshot(path=path)
         except Exception as e:
-            logging.error(f"Error during marketplace search: {e}")
-            await self.browser_manager.page.screenshot(path="error.png")
-            self.config.set_active(False)
-            return []
+            logging.warning(f"Could not save {path}: {e}")
     
-    async def run_search(self):
+    async def enrich_new_listings(self, results, rules=None):
+        """Visit detail pages for wanted listings not yet in the database, reusing the open browser context."""
+        enrichment_config = self.config.get_enrichment_config()
+        if not enrichment_config.pop('enabled', True):
+            return results
+        
+        existing = await self.db.existing_ids([item.id for item in results])
+        new_items = [
+            item for item in results
+            if (rules is None or rules.matches(item)) and item.id not in existing
+        ]
+        if new_items:
+            enricher = DetailEnricher(self.browser_manager.context, self.db, **enrichment_config)
+            await enricher.enrich(new_items)
+        return results
+    
+    async def run_searches(self, queries, rules=None):
+        """Run several searches in one browser session and return the results for each, in order.
+        
+        rules holds, per query, what decides which new listings are enriched (None enriches them all);
+        by default only the configured search is filtered, by its own rules.
+        self.outcomes gets each search's (status, milliseconds), in the same order.
+        """
         if not self.config.is_active():
             logging.info("Search is not active. Skipping.")
-            return []
+            self.outcomes = [None] * len(queries)
+            return [[] for _ in queries]
         
+        self.outcomes = []
         try:
             await self.browser_manager.initialize()
-            results = await self.search_marketplace()
-            return results
+            all_results = []
+            for index, search_params in enumerate(queries):
+                if index and self.browser_manager.shared:
+                    # Other processes share this Chromium, so each search gets its own context
+                    await self.browser_manager.close_context()
+                    await self.browser_manager.open_context()
+                if rules is not None:
+                    search_rules = rules[index]
+                elif query_key(search_params) == query_key(self.search_params):
+                    search_rules = self.config.get_filter_rules()
+                else:
+                    search_rules = None
+                with log_context(search_id=query_id(search_params)):
+                    results = await self._search_and_enrich(search_params, search_rules)
+                all_results.append(results)
+            return all_results
         finally:
             await self.browser_manager.close()
+    
+    async def _search_and_enrich(self, search_params, rules=None):
+        results = await self.search_marketplace(search_params)
+        self.outcomes.append(self.last_outcome)
+        if results and self.db is not None:
+            try:
+                async with stage("enrichment", self.timeouts['enrichment']):
+                    await self.enrich_new_listings(results, rules)
+            except Exception as e:
+                if not is_transient(e):
+                    raise
+                # The listings are still worth processing without the rest of their details
+                logging.warning(f"Enrichment cut short: {e}")
+        return results
+    
+    async def run_search(self):
+        return (await self.run_searches([self.search_params]))[0]
+    
+    def close(self):
+        if self.parse_executor:
+            self.parse_executor.shutdown(wait=False, cancel_futures=True)
 
 if __name__ == "__main__":
     from config import ConfigManager
@@ -150,6 +275,6 @@ if __name__ == "__main__":
         scraper = MarketplaceScraper(config)
         results = await scraper.run_search()
         for item in results:
-            print(f"{item['title']} - ${item['price']} - {item['url']}")
+            print(f"{item.title} - ${item.price} - {item.url}")
     
     asyncio.run(test_scraper())
\ No newline at end of file
@@ -0,0 +1,26 @@
+"""Search stored listings by title and description words through the full-text index."""
+import json
+import sys
+from datetime import datetime
+
+
+def add_arguments(parser):
+    parser.add_argument("text", help="Words that must all appear in the title or description")
+    parser.add_argument("--min-price", type=float)
+    parser.add_argument("--max-price", type=float)
+    parser.add_argument("--since", type=datetime.fromisoformat, help="Only listings found since, e.g. 2024-05-01")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="Only listings found before this time")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="Print one JSON object per line")
+
+
+def run(args, db, out=sys.stdout):
+    rows = db.search_listings(args.text, args.limit, min_price=args.min_price, max_price=args.max_price,
+                              since=args.since, until=args.until)
+    for row in rows:
+        if args.json:
+            out.write(json.dumps(row, default=str) + "\n")
+        else:
+            out.write(f"${row['price'] or 0:>8.0f}  {str(row['discovered_at'])[:10]}  {row['title']}\n"
+                      f"           {row['url']}\n")
+    return len(rows)
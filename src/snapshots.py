@@ -0,0 +1,97 @@
+import json
+import logging
+from array import array
+from datetime import datetime
+
+from subscriptions import query_key
+
+
+def diff_snapshot(tracked_ids, misses, current_ids, missing_cycles, floor=0, present=frozenset()):
+    """Merge the sorted IDs a query showed this cycle into the sorted IDs it is tracking, in one pass.
+
+    misses[i] counts the consecutive cycles tracked_ids[i] has been absent for. A tracked ID still
+    on the page outside this query's results (in present) has its count reset, and one below floor,
+    older than anything a truncated page showed, keeps its count. Returns the new (tracked_ids,
+    misses), the IDs absent for missing_cycles cycles (dropped from tracking) and the IDs that were
+    not being tracked before.
+    """
+    new_ids, new_misses, removed, appeared = array('Q'), array('B'), [], []
+    i = j = 0
+    while i < len(tracked_ids) or j < len(current_ids):
+        if j == len(current_ids) or (i < len(tracked_ids) and tracked_ids[i] < current_ids[j]):
+            if tracked_ids[i] in present:
+                count = 0
+            elif tracked_ids[i] < floor:
+                count = misses[i]
+            else:
+                count = misses[i] + 1
+            if count >= missing_cycles:
+                removed.append(tracked_ids[i])
+            else:
+                new_ids.append(tracked_ids[i])
+                new_misses.append(count)
+            i += 1
+        elif i == len(tracked_ids) or current_ids[j] < tracked_ids[i]:
+            new_ids.append(current_ids[j])
+            new_misses.append(0)
+            appeared.append(current_ids[j])
+            j += 1
+        else:
+            new_ids.append(current_ids[j])
+            new_misses.append(0)
+            i += 1
+            j += 1
+    return new_ids, new_misses, removed, appeared
+
+
+class RemovalTracker:
+    """Notices listings that stop appearing in a query's results and marks them removed.
+
+    Each query's result IDs are kept as a sorted array of integers with a miss count per ID,
+    stored as two blobs in result_snapshots. A listing absent for missing_cycles consecutive
+    cycles gets removed_at set, unless another query has shown it since. Any query showing a
+    listing again clears it.
+
+    Only IDs the page should have shown count as missing. When the page was full, listings
+    older (lower IDs) than everything on it may just have been pushed off by newer ones.
+    """
+
+    def __init__(self, db, missing_cycles=3):
+        self.db = db
+        self.missing_cycles = missing_cycles
+        self.snapshots = {}
+
+    async def _snapshot(self, key):
+        if key not in self.snapshots:
+            ids, misses = array('Q'), array('B')
+            stored = await self.db.get_result_snapshot(key)
+            if stored:
+                ids.frombytes(stored[0])
+                misses.frombytes(stored[1])
+            self.snapshots[key] = (ids, misses)
+        return self.snapshots[key]
+
+    async def observe(self, search_params, results, page=None, page_full=False):
+        """Diff a query's results against its previous snapshot and store the outcome.
+
+        page is everything the fetch showed, when results were filtered from it for this query.
+        """
+        page = results if page is None else page
+        # An empty page is far more often a failed load than every listing selling at once
+        if not page:
+            return [], []
+        key = json.dumps(query_key(search_params))
+        current = sorted({int(item.id) for item in results if item.id.isdigit()})
+        present = {int(item.id) for item in page if item.id.isdigit()}
+        floor = min(present) if page_full and present else 0
+        tracked_ids, misses = await self._snapshot(key)
+
+        tracked_ids, misses, removed, appeared = diff_snapshot(tracked_ids, misses, current, self.missing_cycles,
+                                                               floor, present)
+        self.snapshots[key] = (tracked_ids, misses)
+        removed, appeared = [str(item_id) for item_id in removed], [str(item_id) for item_id in appeared]
+        await self.db.save_result_snapshot(key, tracked_ids.tobytes(), misses.tobytes(), removed,
+                                           [item.id for item in page], datetime.now())
+        if removed:
+            logging.info("%d listings gone from '%s' results", len(removed), search_params.get('keywords'))
+        return removed, appeared
@@ -0,0 +1,185 @@
+import argparse
+import hashlib
+import json
+import logging
+from collections import defaultdict
+
+from rules import RuleSet, tokenize
+
+
+def query_key(search_params):
+    """Identify a marketplace query, so subscriptions sharing one are scraped once."""
+    return (
+        str(search_params.get('keywords') or '').strip().lower(),
+        str(search_params.get('location') or '').strip().lower(),
+        float(search_params.get('min_price') or 0),
+        float(search_params.get('max_price') or 0)
+    )
+
+
+def query_id(search_params):
+    """A short ID that stays the same for a query across cycles, for tagging its log records."""
+    return hashlib.sha1(json.dumps(query_key(search_params)).encode()).hexdigest()[:8]
+
+
+def coalesce_queries(queries):
+    """Group queries sharing keywords and location, so each group is fetched with one page load.
+
+    Returns [(fetch_params, members)] in first-seen order. A group's fetch_params span the union
+    of its members' price ranges; a bound of 0 means unbounded, so it wins. A lone query is
+    fetched as itself.
+    """
+    groups = {}
+    for search_params in queries:
+        groups.setdefault(query_key(search_params)[:2], []).append(search_params)
+
+    plan = []
+    for members in groups.values():
+        if len(members) == 1:
+            plan.append((members[0], members))
+            continue
+        min_prices = [float(params.get('min_price') or 0) for params in members]
+        max_prices = [float(params.get('max_price') or 0) for params in members]
+        fetch_params = dict(members[0])
+        fetch_params['min_price'] = min(min_prices)
+        fetch_params['max_price'] = 0 if 0 in max_prices else max(max_prices)
+        plan.append((fetch_params, members))
+    return plan
+
+
+def in_price_range(item, search_params):
+    """Whether a listing falls in the query's price range, as the marketplace itself would filter it."""
+    price = item.price or 0
+    min_price = float(search_params.get('min_price') or 0)
+    max_price = float(search_params.get('max_price') or 0)
+    return price >= min_price and (not max_price or price <= max_price)
+
+
+class GroupFilter:
+    """Picks the listings of a coalesced page that some member query wants, for enrichment.
+
+    The configured search, recognized by owner_key, wants listings in its price range that pass
+    owner_rules. A subscribed query wants everything in its range; its rules are checked later.
+    """
+
+    def __init__(self, members, owner_key, owner_rules):
+        self.members = [
+            (search_params, owner_rules if query_key(search_params) == owner_key else None)
+            for search_params in members
+        ]
+
+    def matches(self, item):
+        return any(
+            in_price_range(item, search_params) and (rules is None or rules.matches(item))
+            for search_params, rules in self.members
+        )
+
+
+class _QuerySubscriptions:
+    def __init__(self):
+        self.by_token = defaultdict(list)
+        self.unconditional = []
+        self.rules = {}
+        self.recipients = {}
+
+
+class SubscriptionIndex:
+    """Matches listings against many recipients' rule sets through an inverted token index.
+
+    A subscription with include keywords is filed under the first token of each keyword, so a
+    listing only has its rules checked against subscriptions sharing at least one title token.
+    Subscriptions without include keywords are checked against every listing of their query.
+    """
+
+    def __init__(self, subscriptions):
+        self.queries = {}
+        self._by_query = defaultdict(_QuerySubscriptions)
+
+        for subscription in subscriptions:
+            try:
+                rules = RuleSet.from_mapping(json.loads(subscription.get('rules') or '{}'))
+            except ValueError as e:
+                logging.warning(f"Skipping subscription {subscription['id']} with invalid rules: {e}")
+                continue
+
+            key = query_key(subscription)
+            self.queries.setdefault(key, {
+                'keywords': subscription['keywords'],
+                'location': subscription.get('location') or '',
+                'min_price': subscription.get('min_price') or 0,
+                'max_price': subscription.get('max_price') or 0
+            })
+
+            entry = self._by_query[key]
+            entry.rules[subscription['id']] = rules
+            entry.recipients[subscription['id']] = subscription['recipient']
+            if rules.include:
+                for first_token in {phrase[0] for phrase in rules.include}:
+                    entry.by_token[first_token].append(subscription['id'])
+            else:
+                entry.unconditional.append(subscription['id'])
+
+    def __len__(self):
+        return sum(len(entry.rules) for entry in self._by_query.values())
+
+    def match(self, search_params, items):
+        """Return {recipient: [items]} for the listings each recipient subscribed to on this query."""
+        entry = self._by_query.get(query_key(search_params))
+        matches = defaultdict(list)
+        if entry is None:
+            return matches
+
+        for item in items:
+            tokens = tokenize(item.title)
+            candidates = set(entry.unconditional)
+            for token in set(tokens):
+                candidates.update(entry.by_token.get(token, ()))
+
+            recipients = {
+                entry.recipients[subscription_id]
+                for subscription_id in candidates
+                if entry.rules[subscription_id].matches(item, tokens)
+            }
+            for recipient in recipients:
+                matches[recipient].append(item)
+
+        return matches
+
+
+if __name__ == "__main__":
+    from database import DatabaseManager
+
+    parser = argparse.ArgumentParser(description="Manage notification subscriptions")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add_parser = commands.add_parser("add", help="Subscribe a recipient to a query")
+    add_parser.add_argument("recipient")
+    add_parser.add_argument("keywords")
+    add_parser.add_argument("--location", default="")
+    add_parser.add_argument("--min-price", type=float, default=0)
+    add_parser.add_argument("--max-price", type=float, default=0)
+    add_parser.add_argument("--rules", default="{}", help='Filter rules as JSON, e.g. \'{"exclude": "broken, wanted"}\'')
+
+    commands.add_parser("list", help="List subscriptions")
+
+    remove_parser = commands.add_parser("remove", help="Remove a subscription")
+    remove_parser.add_argument("id", type=int)
+
+    args = parser.parse_args()
+    db = DatabaseManager()
+
+    if args.command == "add":
+        RuleSet.from_mapping(json.loads(args.rules))
+        subscription_id = db.add_subscription(args.recipient, args.keywords, args.location,
+                                              args.min_price, args.max_price, args.rules)
+        print(f"Added subscription {subscription_id}")
+    elif args.command == "list":
+        for subscription in db.get_subscriptions():
+            print(f"{subscription['id']}: {subscription['recipient']} <- '{subscription['keywords']}' "
+                  f"in '{subscription['location']}' ${subscription['min_price']:.0f}-${subscription['max_price']:.0f} "
+                  f"{subscription['rules']}")
+    elif args.command == "remove":
+        db.remove_subscription(args.id)
+        print(f"Removed subscription {args.id}")
+
+    db.close()
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The application modules import each other as top-level modules (e.g. "from scraper import ..."),
+# so make src/ importable the same way it is when running "python main.py" from there.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
@@ -0,0 +1,128 @@
+"""Tests for the local read API."""
+import asyncio
+import json
+
+from api import ReadAPI
+from async_database import AsyncDatabase
+from database import DatabaseManager
+
+
+async def fetch(port, target, headers=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    lines = [f"GET {target} HTTP/1.1", "Host: localhost", "Connection: close"]
+    lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode())
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    status_line, *header_lines = head.decode().split("\r\n")
+    response_headers = dict(line.split(": ", 1) for line in header_lines)
+    return int(status_line.split()[1]), response_headers, json.loads(body) if body else None
+
+
+def make_db(tmp_path, count=5):
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    for i in range(count):
+        db.add_item(str(i), f"Chair {i}", 10 * i, f"https://example.com/{i}", "Vancouver")
+    db.log_search("chair", count, count)
+    db.close()
+    return AsyncDatabase(str(tmp_path / "test.db"))
+
+
+def test_listings_paginate_by_keyset_and_filter(tmp_path):
+    db = make_db(tmp_path)
+    api = ReadAPI(db, port=0)
+
+    async def scenario():
+        await api.start()
+        try:
+            seen = []
+            target = "/listings?limit=2"
+            while target:
+                status, _, page = await fetch(api.port, target)
+                assert status == 200
+                seen.extend(row['id'] for row in page['listings'])
+                target = f"/listings?limit=2&cursor={page['next_cursor']}" if page['next_cursor'] else None
+            assert seen == ["4", "3", "2", "1", "0"]
+
+            _, _, page = await fetch(api.port, "/listings?min_price=15&max_price=35&search=chair")
+            assert [row['id'] for row in page['listings']] == ["3", "2"]
+
+            _, _, page = await fetch(api.port, "/listings/search?q=chair+3&max_price=35")
+            assert [row['id'] for row in page['listings']] == ["3"]
+            status, _, error = await fetch(api.port, "/listings/search?q=%21%21")
+            assert status == 400 and "q" in error['error']
+
+            status, _, error = await fetch(api.port, "/listings?cursor=nonsense")
+            assert status == 400 and "cursor" in error['error']
+        finally:
+            await api.close()
+
+    asyncio.run(scenario())
+    db.close()
+
+
+def test_etag_is_revalidated_until_new_inserts(tmp_path):
+    db = make_db(tmp_path)
+    api = ReadAPI(db, port=0)
+
+    async def scenario():
+        await api.start()
+        try:
+            status, headers, stats = await fetch(api.port, "/searches/stats")
+            assert status == 200
+            assert stats['stats'][0]['runs'] == 1
+            etag = headers['ETag']
+
+            status, _, _ = await fetch(api.port, "/searches/stats", {'If-None-Match': etag})
+            assert status == 304
+
+            await db.log_search("chair", 3, 0)
+            status, headers, stats = await fetch(api.port, "/searches/stats", {'If-None-Match': etag})
+            assert status == 200
+            assert headers['ETag'] != etag
+            assert stats['stats'][0]['runs'] == 2
+        finally:
+            await api.close()
+
+    asyncio.run(scenario())
+    db.close()
+
+
+def test_repeated_requests_hit_the_cache_across_readers(tmp_path):
+    db = make_db(tmp_path)
+    db.close()
+    db = AsyncDatabase(str(tmp_path / "test.db"), readers=3)
+    api = ReadAPI(db, port=0)
+    handled = []
+    stats = api.routes['/searches/stats']
+
+    async def counting_stats(params):
+        handled.append(params)
+        return await stats(params)
+
+    api.routes['/searches/stats'] = counting_stats
+
+    async def versions():
+        return set(await asyncio.gather(*(db.get_data_version() for _ in range(12))))
+
+    async def scenario():
+        # Reader connections opened before and after a write still report the same version
+        await db.get_data_version()
+        await db.record_price_changes([("2", 15)])
+        assert len(await versions()) == 1
+        await api.start()
+        try:
+            for _ in range(6):
+                assert (await fetch(api.port, "/searches/stats"))[0] == 200
+            assert len(handled) == 1
+
+            # Updates change no row counts, but still invalidate the cache
+            await db.record_price_changes([("1", 5)])
+            await fetch(api.port, "/searches/stats")
+            assert len(handled) == 2
+        finally:
+            await api.close()
+
+    asyncio.run(scenario())
+    db.close()
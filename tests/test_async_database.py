@@ -0,0 +1,35 @@
+"""Tests for the async database facade."""
+import asyncio
+import concurrent.futures
+
+from async_database import AsyncDatabase
+
+
+def test_concurrent_writes_share_a_commit_and_fail_independently(tmp_path):
+    db = AsyncDatabase(str(tmp_path / "test.db"))
+
+    async def scenario():
+        results = await asyncio.gather(
+            *(db.add_item(str(i), f"Chair {i}", i, f"https://example.com/{i}", "Vancouver") for i in range(20)),
+            db.add_title_signature("x", b"", [], 0),
+            db.write("missing_method"),
+            return_exceptions=True
+        )
+        assert results[:20] == [True] * 20
+        assert isinstance(results[-1], AttributeError)
+        assert await db.existing_ids([str(i) for i in range(25)]) == {str(i) for i in range(20)}
+
+    asyncio.run(scenario())
+    db.close()
+
+
+def test_close_finishes_queued_writes(tmp_path):
+    path = str(tmp_path / "test.db")
+    db = AsyncDatabase(path)
+    # Queued straight onto the writer without waiting for it
+    db.writes.put((concurrent.futures.Future(), "log_search", ("chair", 3, 1), {}))
+    db.close()
+
+    db = AsyncDatabase(path)
+    assert asyncio.run(db.get_search_stats())[0]['runs'] == 1
+    db.close()
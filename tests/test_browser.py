@@ -0,0 +1,140 @@
+"""Tests for attaching to a shared browser, with Playwright replaced by stand-ins."""
+import asyncio
+import importlib
+import sys
+import types
+
+import pytest
+
+from config import ConfigManager
+from listing import Listing
+
+
+class FakeContext:
+    async def add_init_script(self, script):
+        pass
+
+    async def new_page(self):
+        return "page"
+
+
+class FakeBrowser:
+    version = "120.0"
+
+    async def new_context(self, **params):
+        return FakeContext()
+
+    def on(self, event, callback):
+        # Disconnect as soon as the server starts waiting, so serve() returns
+        asyncio.get_running_loop().call_soon(callback, None)
+
+    def is_connected(self):
+        return False
+
+
+class FakeChromium:
+    def __init__(self, cdp_error=None):
+        self.cdp_error = cdp_error
+        self.connected = []
+        self.launched = []
+
+    async def connect_over_cdp(self, endpoint, timeout):
+        self.connected.append((endpoint, timeout))
+        if self.cdp_error:
+            raise self.cdp_error
+        return FakeBrowser()
+
+    async def launch(self, **options):
+        self.launched.append(options)
+        return FakeBrowser()
+
+
+class FakePlaywright:
+    def __init__(self, chromium):
+        self.chromium = chromium
+
+    async def start(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+@pytest.fixture
+def playwright(monkeypatch):
+    """Install a stand-in playwright.async_api and return a function that imports a module against it."""
+    chromium = FakeChromium()
+    async_api = types.ModuleType("playwright.async_api")
+    async_api.async_playwright = lambda: FakePlaywright(chromium)
+    async_api.TimeoutError = type("TimeoutError", (Exception,), {})
+    package = types.ModuleType("playwright")
+    package.async_api = async_api
+    monkeypatch.setitem(sys.modules, "playwright", package)
+    monkeypatch.setitem(sys.modules, "playwright.async_api", async_api)
+
+    def load(name):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+        return importlib.import_module(name)
+
+    load.chromium = chromium
+    return load
+
+
+def write_config(tmp_path, browser_section):
+    path = tmp_path / "search_config.ini"
+    path.write_text(
+        "[Search]\nactive = True\nkeywords = chair\nmin_price = 0\nmax_price = 500\nlocation = Vancouver\n"
+        "search_radius = 10\nfrequency = 30\nemail = a@example.com\nsubject_template = s\nmessage_template = m\n"
+        + browser_section
+    )
+    return ConfigManager(str(path))
+
+
+def test_endpoint_comes_from_the_browser_section(tmp_path):
+    config = write_config(tmp_path, "[Browser]\nendpoint = http://127.0.0.1:9222\nconnect_timeout = 2.5\n")
+    assert config.get_browser_config() == {'endpoint': "http://127.0.0.1:9222", 'connect_timeout': 2.5}
+
+    (tmp_path / "blank").mkdir()
+    config = write_config(tmp_path / "blank", "[Browser]\nendpoint =\n")
+    assert config.get_browser_config() == {'endpoint': None, 'connect_timeout': 5}
+
+
+def test_the_standalone_config_compiles_the_filter_rules(tmp_path):
+    config = write_config(tmp_path, "[Filters]\ninclude = aeron\n")
+    assert config.get_filter_rules().matches(Listing("1", "Herman Miller Aeron", 300))
+    assert not config.get_filter_rules().matches(Listing("1", "Ikea Markus", 300))
+
+    (tmp_path / "unfiltered").mkdir()
+    assert write_config(tmp_path / "unfiltered", "").get_filter_rules().matches(Listing("1", "Ikea Markus", 300))
+
+
+def test_connects_to_the_shared_browser_and_falls_back_to_a_local_launch(playwright, tmp_path):
+    browser = playwright("browser")
+    chromium = playwright.chromium
+    storage = str(tmp_path / "storage_state.json")
+
+    shared = browser.BrowserManager(str(tmp_path), storage, endpoint="http://127.0.0.1:9222", connect_timeout=2)
+    asyncio.run(shared.initialize())
+    assert shared.shared and shared.page == "page"
+    assert chromium.connected == [("http://127.0.0.1:9222", 2000)] and chromium.launched == []
+
+    chromium.cdp_error = ConnectionRefusedError("connect ECONNREFUSED 127.0.0.1:9222")
+    fallback = browser.BrowserManager(str(tmp_path), storage, endpoint="http://127.0.0.1:9222")
+    asyncio.run(fallback.initialize())
+    assert not fallback.shared and fallback.page == "page"
+    assert chromium.launched == [{'headless': True}]
+
+    local = browser.BrowserManager(str(tmp_path), storage)
+    asyncio.run(local.initialize())
+    assert not local.shared and len(chromium.connected) == 2 and len(chromium.launched) == 2
+
+
+def test_server_launches_chromium_with_a_debugging_port(playwright):
+    browser_server = playwright("browser_server")
+
+    asyncio.run(browser_server.serve(9333))
+
+    assert playwright.chromium.launched == [{'headless': True, 'args': ["--remote-debugging-port=9333"]}]
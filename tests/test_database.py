@@ -0,0 +1,75 @@
+"""Tests for the database layer."""
+from datetime import datetime, timedelta
+
+from database import DatabaseManager
+
+
+def make_db(tmp_path):
+    return DatabaseManager(str(tmp_path / "test.db"))
+
+
+def test_listing_details_round_trip(tmp_path):
+    db = make_db(tmp_path)
+    db.save_listing_details("123", {'location': "Vancouver, BC", 'seller': "Sam", 'description': None, 'posted_at': "2 days ago"})
+
+    details = db.get_listing_details(["123", "456"])
+
+    assert list(details) == ["123"]
+    assert details["123"]['location'] == "Vancouver, BC"
+    assert details["123"]['seller'] == "Sam"
+    db.close()
+
+
+def test_listing_details_expire_after_ttl(tmp_path):
+    db = make_db(tmp_path)
+    db.save_listing_details("123", {'location': "Vancouver, BC"})
+    db.cursor.execute("UPDATE listing_details SET fetched_at = ?", (datetime.now() - timedelta(hours=2),))
+    db.conn.commit()
+
+    assert db.get_listing_details(["123"], ttl_hours=1) == {}
+    assert "123" in db.get_listing_details(["123"], ttl_hours=3)
+    db.close()
+
+
+def test_migrate_adds_tables_to_existing_database(tmp_path):
+    db = make_db(tmp_path)
+    db.cursor.execute("DROP TABLE listing_details")
+    db.conn.commit()
+    db.close()
+
+    db = make_db(tmp_path)
+    assert db.get_listing_details(["123"]) == {}
+    db.close()
+
+
+def test_full_text_search_follows_listings_and_descriptions(tmp_path):
+    db = make_db(tmp_path)
+    db.add_item("1", "Herman Miller Aeron chair", 250, "https://example.com/1", "Vancouver")
+    db.add_item("2", "Office chair", 150, "https://example.com/2", "Vancouver")
+    db.add_item("3", "Herman Miller Embody", 900, "https://example.com/3", "Vancouver")
+    db.save_listing_details("2", {'description': "Genuine Herman Miller, barely used"})
+    db.save_listing_details("4", {'description': "Herman Miller Sayl"})
+    db.add_item("4", "Desk chair", 200, "https://example.com/4", "Burnaby")
+
+    results = db.search_listings("herman miller", max_price=300)
+    assert sorted(row['id'] for row in results) == ["1", "2", "4"]
+    assert [row['id'] for row in db.search_listings("Aeron")] == ["1"]
+    assert db.search_listings("herman", since=datetime.now() + timedelta(days=1)) == []
+
+    db.cursor.execute("DELETE FROM listings WHERE id = '1'")
+    db.conn.commit()
+    assert db.search_listings("aeron") == []
+    db.close()
+
+
+def test_search_index_is_backfilled_for_existing_listings(tmp_path):
+    db = make_db(tmp_path)
+    db.add_item("1", "Steelcase Leap", 300, "https://example.com/1", "Vancouver")
+    db.cursor.execute("DROP TABLE listings_fts")
+    db.conn.commit()
+    db.close()
+
+    db = make_db(tmp_path)
+    assert [row['id'] for row in db.search_listings("leap")] == ["1"]
+    assert [row['id'] for row in db.get_listings_page(title="steelcase")] == ["1"]
+    db.close()
@@ -0,0 +1,58 @@
+"""Tests for stage time budgets and error classification."""
+import asyncio
+
+import pytest
+
+from database import DatabaseManager
+from deadlines import StageTimeout, is_timeout, is_transient, stage
+
+
+def test_the_stage_whose_budget_ran_out_is_named():
+    async def hang():
+        async with stage("search", 5):
+            async with stage("navigation", 0.01):
+                await asyncio.sleep(1)
+
+    async def slow_stages():
+        async with stage("cycle", 0.01):
+            async with stage("search", 5):
+                await asyncio.sleep(1)
+
+    async def unbounded():
+        async with stage("cycle", 0):
+            await asyncio.sleep(0.01)
+        return "done"
+
+    with pytest.raises(StageTimeout) as error:
+        asyncio.run(hang())
+    assert error.value.stage == "navigation"
+    with pytest.raises(StageTimeout) as error:
+        asyncio.run(slow_stages())
+    assert error.value.stage == "cycle"
+    assert asyncio.run(unbounded()) == "done"
+
+
+def test_only_errors_a_fresh_page_could_fix_are_transient():
+    class TimeoutError(Exception):
+        """Stands in for Playwright's TimeoutError, which does not subclass the built-in one."""
+
+    assert is_timeout(StageTimeout("navigation", 45)) and is_timeout(TimeoutError("Timeout 30000ms exceeded"))
+    assert is_transient(TimeoutError("Timeout 30000ms exceeded"))
+    assert is_transient(ConnectionResetError())
+    assert is_transient(Exception("page.goto: net::ERR_CONNECTION_RESET"))
+    assert is_transient(Exception("Target page, context or browser has been closed"))
+    assert not is_transient(KeyError("keywords"))
+    assert not is_transient(ValueError("Invalid URL"))
+
+
+def test_search_stats_report_timeouts_and_load_time_percentiles(tmp_path):
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    for duration_ms in range(10, 1010, 10):
+        db.log_search("chair", 5, 0, duration_ms=duration_ms)
+    db.log_search("chair", 0, 0, "timeout", 180000)
+
+    stats = db.get_search_stats()[0]
+    assert (stats['runs'], stats['failed_runs'], stats['timeouts']) == (101, 1, 1)
+    assert (stats['p50_ms'], stats['p99_ms']) == (510, 1000)
+    assert db.get_searches_page(1)[0]['status'] == "timeout"
+    db.close()
@@ -0,0 +1,78 @@
+"""Tests for repost detection."""
+import asyncio
+
+from async_database import AsyncDatabase
+from dedupe import RepostDetector, estimate_similarity, minhash_signature, normalize_title
+from listing import Listing
+
+
+def test_normalize_title_drops_punctuation_case_and_filler():
+    assert normalize_title("Herman Miller Aeron Chair - LIKE NEW, OBO!") == "herman miller aeron chair"
+
+
+def test_similar_titles_have_similar_signatures():
+    a = minhash_signature("Herman Miller Aeron chair size B")
+    b = minhash_signature("Aeron Herman Miller chair, size B")
+    c = minhash_signature("Kids bicycle with training wheels")
+
+    assert estimate_similarity(a, b) > 0.6
+    assert estimate_similarity(a, c) < 0.3
+
+
+def test_detects_repost_within_price_tolerance(tmp_path):
+    db = AsyncDatabase(str(tmp_path / "test.db"))
+    detector = RepostDetector(db)
+    original = Listing("1", "Herman Miller Aeron chair size B", 400)
+
+    async def scenario():
+        await db.add_item("1", original.title, 400, "https://example.com/1", "Vancouver")
+        await detector.add(original)
+
+        assert await detector.find_repost(Listing("2", "Herman Miller Aeron Chair Size B - must go", 380)) == "1"
+        assert await detector.find_repost(Listing("3", "Herman Miller Aeron chair size B", 150)) is None
+        assert await detector.find_repost(Listing("4", "Standing desk", 400)) is None
+
+    asyncio.run(scenario())
+    db.close()
+
+
+def test_index_missing_backfills_existing_listings(tmp_path):
+    db = AsyncDatabase(str(tmp_path / "test.db"))
+    detector = RepostDetector(db)
+
+    async def scenario():
+        await db.add_item("1", "Road bike 56cm", 500, "https://example.com/1", "Vancouver")
+        await db.add_item("2", None, 0, "https://example.com/2", "Vancouver")
+
+        assert await detector.index_missing(batch_size=1) == 2
+        assert await detector.index_missing() == 0
+        assert await detector.find_repost(Listing("3", "Road bike 56 cm", 480)) == "1"
+
+    asyncio.run(scenario())
+    db.close()
+
+
+def test_index_rows_commit_with_their_listings_and_batch_mates_are_checked(tmp_path):
+    db = AsyncDatabase(str(tmp_path / "test.db"))
+    detector = RepostDetector(db)
+    first = Listing("1", "Herman Miller Aeron chair size B", 400)
+    second = Listing("2", "Herman Miller Aeron Chair Size B - must go", 380)
+    row = ("1", first.title, 400, "https://example.com/1", "Vancouver")
+
+    async def scenario():
+        pending = [detector.index_entry(first)]
+        # The batch is not stored yet, but a repost within it is still caught
+        assert await detector.find_repost(second, pending) == "1"
+        assert await detector.find_repost(second) is None
+
+        # A batch that fails to commit leaves nothing in the index
+        assert not await db.add_items_with_notifications([row, row[:4]], [], pending)
+        assert not await db.existing_ids(["1"])
+        assert await detector.find_repost(second) is None
+
+        assert await db.add_items_with_notifications([row], [], pending, [("1", -5, "https://cdn.example.com/1.jpg")])
+        assert await detector.find_repost(second) == "1"
+        assert await db.get_image_hashes() == [("1", -5)]
+
+    asyncio.run(scenario())
+    db.close()
@@ -0,0 +1,217 @@
+"""Tests for notifier backends against local HTTP and SMTP stand-ins."""
+import asyncio
+import json
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from dispatcher import EmailBackend, JsonlNotifier, NotificationDispatcher, NtfyNotifier, WebhookNotifier
+from notifier import EmailNotifier
+
+ALERT = {'recipient': "a@example.com", 'subject': "Found: Chair at $100", 'body': "A chair", 'idempotency_key': "item:1:a"}
+
+
+class RecordingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        if self.path == "/slow":
+            time.sleep(1.5)
+        self.server.requests.append((self.path, dict(self.headers), body, self.client_address))
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class SMTPStandIn(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: EHLO, AUTH, MAIL, RCPT, DATA, QUIT."""
+
+    def handle(self):
+        self.wfile.write(b"220 localhost ready\r\n")
+        in_data, lines = False, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                break
+            if in_data:
+                if line == b".\r\n":
+                    self.server.messages.append(b"".join(lines).decode())
+                    in_data, lines = False, []
+                    self.wfile.write(b"250 OK\r\n")
+                else:
+                    lines.append(line)
+                continue
+            command = line[:4].upper()
+            if command == b"EHLO":
+                self.wfile.write(b"250-localhost\r\n250 AUTH PLAIN\r\n" if self.server.auth else b"250 localhost\r\n")
+            elif command == b"AUTH":
+                self.server.logins += 1
+                self.wfile.write(b"235 Authenticated\r\n")
+            elif command == b"DATA":
+                in_data = True
+                self.wfile.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+            elif command == b"QUIT":
+                self.wfile.write(b"221 Bye\r\n")
+                break
+            else:
+                self.wfile.write(b"250 OK\r\n")
+
+
+def serve(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+@pytest.fixture
+def http_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RecordingHandler)
+    server.requests = []
+    yield serve(server)
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def smtp_server():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), SMTPStandIn)
+    server.daemon_threads = True
+    server.messages = []
+    server.auth = True
+    server.logins = 0
+    yield serve(server)
+    server.shutdown()
+    server.server_close()
+
+
+def url(server, path):
+    return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+
+def test_webhook_reuses_keep_alive_connection(http_server):
+    backend = WebhookNotifier("slack", url(http_server, "/hook"))
+
+    async def send_twice():
+        await backend.deliver(ALERT)
+        await backend.deliver(ALERT)
+
+    asyncio.run(send_twice())
+    backend.close()
+
+    assert len(http_server.requests) == 2
+    assert json.loads(http_server.requests[0][2]) == {'text': "Found: Chair at $100\nA chair"}
+    assert http_server.requests[0][3] == http_server.requests[1][3]
+
+
+def test_slow_backend_does_not_delay_others(http_server, tmp_path):
+    dispatcher = NotificationDispatcher([
+        WebhookNotifier("slow", url(http_server, "/slow"), timeout=0.3),
+        NtfyNotifier("ntfy", url(http_server, "/topic"), token="secret"),
+        JsonlNotifier("jsonl", str(tmp_path / "alerts.jsonl")),
+    ], owner="a@example.com")
+
+    start = time.monotonic()
+    results = asyncio.run(dispatcher.dispatch(ALERT))
+    elapsed = time.monotonic() - start
+    dispatcher.close()
+
+    assert elapsed < 1.0
+    assert results == {'slow': "timed out", 'ntfy': None, 'jsonl': None}
+    path, headers, body, _ = next(request for request in http_server.requests if request[0] == "/topic")
+    assert headers['Title'] == ALERT['subject']
+    assert headers['Authorization'] == "Bearer secret"
+    assert body == b"A chair"
+    assert json.loads((tmp_path / "alerts.jsonl").read_text())['idempotency_key'] == "item:1:a"
+
+
+def test_shared_channels_only_get_the_owners_listing_alerts(tmp_path):
+    sent = []
+
+    class RecordingNotifier(JsonlNotifier):
+        def deliver_sync(self, alert):
+            sent.append((self.name, alert['idempotency_key']))
+
+    class Mailbox(RecordingNotifier):
+        addressed = True
+
+    dispatcher = NotificationDispatcher([Mailbox("email", None), RecordingNotifier("slack", None)],
+                                        owner="a@example.com")
+
+    async def dispatch_all():
+        for key, recipient in [("item:1:a", "a@example.com"), ("drop:1:90:a", "a@example.com"),
+                               ("item:1:b", "b@example.com"), ("digest:b:f00", "b@example.com"),
+                               ("error:2024-01-01", "a@example.com")]:
+            await dispatcher.dispatch({**ALERT, 'recipient': recipient, 'idempotency_key': key})
+
+    asyncio.run(dispatch_all())
+    dispatcher.close()
+
+    assert [key for name, key in sent if name == "slack"] == ["item:1:a", "drop:1:90:a"]
+    assert len([key for name, key in sent if name == "email"]) == 5
+
+
+def test_a_late_delivery_is_not_sent_again_on_retry():
+    release = threading.Event()
+    sent = []
+
+    class SlowNotifier(JsonlNotifier):
+        def deliver_sync(self, alert):
+            release.wait()
+            sent.append(alert['idempotency_key'])
+
+    backend = SlowNotifier("slow", None, timeout=0.05)
+
+    async def deliver_twice():
+        with pytest.raises(TimeoutError):
+            await backend.deliver(ALERT)
+        release.set()
+        await backend.deliver(ALERT)
+
+    asyncio.run(deliver_twice())
+    backend.close()
+
+    assert sent == ["item:1:a"]
+
+
+def test_email_backend_sends_through_smtp(smtp_server, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "password.ini").write_text("[Email]\nsender_email = scraper@example.com\nsender_password = secret\n")
+    email = EmailNotifier({
+        'recipient_email': "owner@example.com",
+        'smtp_server': "127.0.0.1",
+        'smtp_port': smtp_server.server_address[1],
+        'smtp_security': "none"
+    })
+    dispatcher = NotificationDispatcher([EmailBackend(email)])
+
+    results = asyncio.run(dispatcher.dispatch({**ALERT, 'message_id': "<abc@marketplace-scraper>"}))
+    dispatcher.close()
+
+    assert results == {'email': None}
+    assert "To: a@example.com" in smtp_server.messages[0]
+    assert "Message-ID: <abc@marketplace-scraper>" in smtp_server.messages[0]
+    assert smtp_server.logins == 1
+
+
+def test_local_relay_without_auth_is_sent_to_without_logging_in(smtp_server, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "password.ini").write_text("[Email]\nsender_email = scraper@example.com\n")
+    smtp_server.auth = False
+    email = EmailNotifier({
+        'recipient_email': "owner@example.com",
+        'smtp_server': "127.0.0.1",
+        'smtp_port': smtp_server.server_address[1],
+        'smtp_security': "none"
+    })
+
+    email.send_message("a@example.com", "Subject", "Body")
+
+    assert smtp_server.logins == 0
+    assert "To: a@example.com" in smtp_server.messages[0]
@@ -0,0 +1,60 @@
+"""Tests for streaming table exports."""
+import argparse
+import csv
+import json
+
+import pytest
+
+import export
+from database import DatabaseManager
+
+
+def make_db(tmp_path, count=5):
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    for i in range(count):
+        db.add_item(str(i), f"Chair {i}", 10 * i, f"https://example.com/{i}", "Vancouver")
+    return db
+
+
+def test_csv_export_streams_every_row_in_batches(tmp_path):
+    db = make_db(tmp_path)
+    output = tmp_path / "listings.csv"
+
+    rows, watermark = export.export_table(db, "listings", "csv", str(output), batch_size=2)
+
+    with open(output, newline="") as f:
+        records = list(csv.DictReader(f))
+    assert rows == 5
+    assert [record['id'] for record in records] == ["0", "1", "2", "3", "4"]
+    assert watermark == records[-1]['discovered_at']
+    db.close()
+
+
+def test_watermark_makes_exports_incremental(tmp_path):
+    db = make_db(tmp_path, count=2)
+    output = tmp_path / "listings.jsonl"
+    watermark_path = tmp_path / "listings.watermark"
+    parser = argparse.ArgumentParser()
+    export.add_arguments(parser)
+    args = parser.parse_args(["listings", "--format", "jsonl", "-o", str(output), "--watermark", str(watermark_path)])
+
+    assert export.run(args, db) == 2
+    db.add_item("new", "Desk", 50, "https://example.com/new", "Vancouver")
+    assert export.run(args, db) == 1
+    assert [json.loads(line)['id'] for line in output.read_text().splitlines()] == ["new"]
+    assert export.run(args, db) == 0
+    db.close()
+
+
+def test_parquet_export(tmp_path):
+    pytest.importorskip("pyarrow")
+    import pyarrow.parquet
+
+    db = make_db(tmp_path)
+    output = tmp_path / "listings.parquet"
+    export.export_table(db, "listings", "parquet", str(output), batch_size=2)
+
+    table = pyarrow.parquet.read_table(output)
+    assert table.num_rows == 5
+    assert table.column("price").to_pylist() == [0.0, 10.0, 20.0, 30.0, 40.0]
+    db.close()
@@ -0,0 +1,73 @@
+"""Tests for self-tuning extraction strategy order."""
+import asyncio
+import random
+
+from async_database import AsyncDatabase
+from extraction import IN_PAGE_STRATEGIES, ExtractionManager
+from extraction_stats import StrategyStats
+
+
+def test_strategies_are_ranked_by_success_per_millisecond():
+    stats = StrategyStats(None, exploration=0, min_attempts=2)
+    strategies = ["xpath:a", "xpath:b", "javascript"]
+    assert stats.order(strategies, "chair") == strategies
+
+    stats.totals = {
+        ("xpath:a", '*'): [10, 2, 1000.0],
+        ("xpath:b", '*'): [10, 9, 2000.0],
+        ("javascript", '*'): [10, 9, 500.0],
+        # On this search the slow XPath is the only one that works
+        ("xpath:b", "desk"): [3, 3, 600.0],
+        ("javascript", "desk"): [3, 0, 300.0],
+    }
+    assert stats.order(strategies, "chair") == ["javascript", "xpath:b", "xpath:a"]
+    assert stats.order(strategies, "desk") == ["xpath:b", "xpath:a", "javascript"]
+
+    exploring = StrategyStats(None, exploration=1, rng=random.Random(1))
+    assert exploring.order(strategies, "chair")[0] != "xpath:a"
+
+
+def test_extraction_stops_at_the_first_strategy_that_works_and_remembers_it(tmp_path):
+    db = AsyncDatabase(str(tmp_path / "test.db"))
+
+    class Manager(ExtractionManager):
+        async def _run_strategy(self, strategy):
+            if strategy != "javascript":
+                return []
+            return [{'id': "1", 'title': "Chair", 'price': 10, 'url': "https://example.com/1"}]
+
+    async def scenario():
+        stats = StrategyStats(db, exploration=0, min_attempts=1)
+        listings = await Manager(None, stats=stats, search_key="chair").extract_via_multiple_strategies()
+        assert [listing.id for listing in listings] == ["1"]
+        assert stats.order(IN_PAGE_STRATEGIES, "chair")[0] == "javascript"
+
+        restarted = StrategyStats(db, exploration=0, min_attempts=1)
+        await restarted.load()
+        assert restarted.order(IN_PAGE_STRATEGIES, "chair")[0] == "javascript"
+        rows = {(row['strategy'], row['search_key']): row for row in await db.get_extraction_stats()}
+        assert rows[("javascript", '*')]['successes'] == 1
+        assert rows[("xpath:article", "chair")]['attempts'] == 1
+        assert rows[("xpath:article", "chair")]['last_success_at'] is None
+
+    asyncio.run(scenario())
+    db.close()
+
+
+def test_an_empty_python_parse_falls_back_to_the_in_page_strategies(tmp_path):
+    db = AsyncDatabase(str(tmp_path / "test.db"))
+    stats = StrategyStats(db, exploration=0, min_attempts=1)
+
+    class Manager(ExtractionManager):
+        async def extract_listings_via_python(self):
+            return []
+
+        async def _run_strategy(self, strategy):
+            return [{'id': "1", 'title': "Chair", 'price': 10, 'url': "https://example.com/1"}]
+
+    listings = asyncio.run(Manager(None, engine="python", stats=stats, search_key="chair")._extract_raw())
+    db.close()
+
+    assert [listing['id'] for listing in listings] == ["1"]
+    assert stats.totals[("python", "chair")][:2] == [1, 0]
+    assert stats.totals[(IN_PAGE_STRATEGIES[0], "chair")][:2] == [1, 1]
@@ -0,0 +1,23 @@
+"""Tests for Python-side parsing of result pages."""
+from html_parser import parse_listings_html
+
+PAGE = """
+<html><body><div role="main">
+  <div><a href="/marketplace/item/111/?ref=search"><img src="https://cdn.example.com/111.jpg">
+    <div><span>CA$1,250</span></div><div><span>Herman Miller Aeron</span></div><div><span>Vancouver, BC</span></div></a></div>
+  <div><a href="/marketplace/item/222/"><div><span>$40</span></div><div><span>Desk lamp</span></div></a></div>
+  <div><a href="/marketplace/item/111/?ref=other"><div><span>CA$1,250</span></div></a></div>
+  <script>var x = "$99 fake";</script>
+</div></body></html>
+"""
+
+
+def test_parses_same_listing_dicts_as_in_page_strategy():
+    results = parse_listings_html(PAGE, "https://www.facebook.com/marketplace/vancouver/search?query=chair")
+
+    assert results == [
+        {'id': "111", 'title': "Herman Miller Aeron", 'price': 1250.0, 'currency': "CA$",
+         'url': "https://www.facebook.com/marketplace/item/111", 'image_url': "https://cdn.example.com/111.jpg"},
+        {'id': "222", 'title': "Desk lamp", 'price': 40.0, 'currency': "$",
+         'url': "https://www.facebook.com/marketplace/item/222", 'image_url': None},
+    ]
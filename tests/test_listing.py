@@ -0,0 +1,27 @@
+"""Tests for Listing records and columnar batches."""
+import pytest
+
+from listing import Listing, ListingBatch
+
+
+def test_listings_normalise_extractor_output():
+    listing = Listing.from_mapping({'id': 111, 'title': "", 'price': "40", 'currency': "$",
+                                    'url': "https://example.com/111", 'image_url': None})
+
+    assert (listing.id, listing.title, listing.price, listing.currency) == ("111", "Unknown Title", 40.0, "$")
+    assert listing.location is None and listing.url == "https://example.com/111"
+    listing.description = "Barely used"
+    assert listing.description == "Barely used"
+    with pytest.raises(AttributeError):
+        listing.colour = "red"
+    assert not hasattr(listing, '__dict__')
+
+
+def test_batches_yield_rows_for_executemany():
+    batch = ListingBatch([Listing("1", "Aeron", 400.0, url="https://example.com/1", location="Vancouver"),
+                          Listing("2", "Leap", None, url="https://example.com/2")])
+
+    assert len(batch) == 2
+    assert list(batch) == [("1", "Aeron", 400.0, "https://example.com/1", "Vancouver"),
+                           ("2", "Leap", 0.0, "https://example.com/2", "Unknown location")]
+    assert list(batch.prices) == [400.0, 0.0]
@@ -0,0 +1,82 @@
+"""Tests for queued, structured log output."""
+import asyncio
+import gzip
+import json
+import logging
+import queue
+import sys
+
+from logging_setup import DeferredQueueHandler, log_context, setup_logging, stop_logging
+
+
+def test_records_are_written_from_the_queue_with_their_context_ids(tmp_path):
+    path = tmp_path / "app.log"
+    root = logging.getLogger()
+    level = root.level
+    pages = ["page 1"]
+
+    async def search():
+        logging.info("Waiting for %.2f seconds: %s", 1.5, "scrolling the page")
+        logging.info("Scrolled past %s", pages)
+        pages.append("page 2")
+
+    listener = setup_logging(str(path), format="json", console=False)
+    try:
+        with log_context(cycle_id="c1"):
+            with log_context(search_id="s1"):
+                asyncio.run(search())
+            try:
+                raise KeyError("keywords")
+            except KeyError:
+                logging.exception("cycle failed")
+        logging.info("idle")
+    finally:
+        stop_logging(listener)
+        root.setLevel(level)
+
+    entries = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [entry['message'] for entry in entries] == [
+        "Waiting for 1.50 seconds: scrolling the page", "Scrolled past ['page 1']", "cycle failed", "idle"
+    ]
+    assert (entries[0]['cycle_id'], entries[0]['search_id']) == ("c1", "s1")
+    assert entries[2]['cycle_id'] == "c1" and 'search_id' not in entries[2]
+    assert "KeyError: 'keywords'" in entries[2]['exception']
+    assert 'cycle_id' not in entries[3]
+
+
+def test_only_records_with_immutable_arguments_are_left_unformatted():
+    handler = DeferredQueueHandler(queue.SimpleQueue())
+
+    def record(*args, exc_info=None):
+        return logging.LogRecord("root", logging.INFO, __file__, 1, "%s %s", args, exc_info)
+
+    deferred = handler.prepare(record("chair", 1.5))
+    assert (deferred.msg, deferred.args) == ("%s %s", ("chair", 1.5))
+
+    snapshot = handler.prepare(record("chair", {'price': 100}))
+    assert (snapshot.msg, snapshot.args) == ("chair {'price': 100}", None)
+
+    try:
+        raise ValueError("bad price")
+    except ValueError:
+        failed = handler.prepare(record("chair", 1, exc_info=sys.exc_info()))
+    assert failed.exc_info is None and "ValueError: bad price" in failed.exc_text
+
+
+def test_files_roll_over_by_size_into_gzipped_backups(tmp_path):
+    path = tmp_path / "app.log"
+    root = logging.getLogger()
+    level = root.level
+
+    listener = setup_logging(str(path), max_mb=0.001, backups=2, console=False)
+    try:
+        for i in range(100):
+            logging.info("listing %d stored", i)
+    finally:
+        stop_logging(listener)
+        root.setLevel(level)
+
+    assert sorted(file.name for file in tmp_path.iterdir()) == ["app.log", "app.log.1.gz", "app.log.2.gz"]
+    with gzip.open(tmp_path / "app.log.1.gz", "rt") as backup:
+        assert "listing" in backup.read()
+    assert path.read_text().rstrip().endswith("listing 99 stored")
@@ -1,5 +1,215 @@
-"""Tests for mpea."""
+"""Tests for the search cycle, with the scraper replaced by a stand-in that returns fixed pages."""
+import asyncio
+import importlib
+import sys
+import types
+from datetime import datetime, timedelta
 
-def test_example():
-    """Example test."""
-    assert True
\ No newline at end of file
+import pytest
+
+from async_database import AsyncDatabase
+from listing import Listing
+from quantiles import DealScorer
+from scheduler import AdaptiveScheduler
+from subscriptions import SubscriptionIndex, query_id
+
+CONFIG = (
+    "[Search]\nactive = True\nkeywords = chair\nmin_price = 0\nmax_price = 500\nlocation = Vancouver\n"
+    "search_radius = 10\nfrequency = 30\nemail = a@example.com\nsubject_template = Found: {item_title}\n"
+    "message_template = {item_title} at ${price}\n"
+    "[Filters]\nexclude = broken\n"
+)
+
+
+class FakeScraper:
+    MAX_RESULTS = 20
+
+    def __init__(self, search_params, listings=(), error=None):
+        self.search_params = search_params
+        self.listings = list(listings)
+        self.error = error
+        self.fetched = []
+        self.rules = None
+        self.outcomes = []
+
+    async def run_searches(self, queries, rules=None):
+        self.fetched.append(queries)
+        self.rules = rules
+        if self.error:
+            raise self.error
+        self.outcomes = [("completed", 5)] * len(queries)
+        return [list(self.listings) for _ in queries]
+
+
+class FakeTerminal:
+    status = None
+
+    def update_status(self, status):
+        self.status = status
+
+
+@pytest.fixture
+def main(monkeypatch):
+    """Import main against a stand-in playwright.async_api, which it only needs at import time here."""
+    async_api = types.ModuleType("playwright.async_api")
+    async_api.async_playwright = None
+    async_api.TimeoutError = type("TimeoutError", (Exception,), {})
+    package = types.ModuleType("playwright")
+    package.async_api = async_api
+    monkeypatch.setitem(sys.modules, "playwright", package)
+    monkeypatch.setitem(sys.modules, "playwright.async_api", async_api)
+    for name in ("main", "scraper", "browser"):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    return importlib.import_module("main")
+
+
+@pytest.fixture
+def make_app(main, tmp_path, monkeypatch):
+    """Build a MarketplaceApp on a temporary config and database, without its terminal or browser."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "password.ini").write_text("[Email]\nsender_email = bot@example.com\nsender_password = secret\n")
+    (tmp_path / "search_config.ini").write_text(CONFIG)
+    apps = []
+
+    def make(listings=(), error=None):
+        app = main.MarketplaceApp.__new__(main.MarketplaceApp)
+        app.config = main.ConfigManager()
+        app.db = AsyncDatabase(str(tmp_path / "test.db"))
+        app.email = main.EmailNotifier(app.config.get_email_config())
+        app.terminal = FakeTerminal()
+        app.scraper = FakeScraper(app.config.get_search_params(), listings, error)
+        app.timeouts = app.config.get_timeout_config()
+        app.repost_detector = None
+        app.image_detector = None
+        app.price_tracker = None
+        app.deal_scorer = None
+        app.removal_tracker = None
+        app.scheduler = AdaptiveScheduler(**app.config.get_schedule_config())
+        app.planned_queries = [app.scraper.search_params]
+        apps.append(app)
+        return app
+
+    yield make
+    for app in apps:
+        app.db.close()
+
+
+def keys(notifications):
+    """Idempotency keys of queued notifications, with the hash of listing IDs cut off digest keys."""
+    return sorted(
+        row['idempotency_key'].rsplit(":", 1)[0] if row['idempotency_key'].startswith("digest:")
+        else row['idempotency_key']
+        for row in notifications
+    )
+
+
+def test_new_listings_are_stored_and_alerted_once(make_app):
+    app = make_app()
+    search_params = app.scraper.search_params
+    results = [Listing("1", "Herman Miller Aeron", 300), Listing("2", "Ikea chair - broken", 150)]
+
+    async def scenario():
+        assert await app.process_search_results(results) == 1
+        assert await app.process_search_results(results) == 0
+        assert await app.process_search_results([]) == 0
+
+        notifications = await app.db.get_due_notifications()
+        assert [row['idempotency_key'] for row in notifications] == ["item:1:a@example.com"]
+        # Listings the owner's rules drop are not stored
+        assert await app.db.existing_ids({"1", "2"}) == {"1"}
+        history = await app.db.get_search_history(datetime.now() - timedelta(hours=1))
+        assert [(query, new_items) for _, query, new_items, _ in history] == [(query_id(search_params), 1),
+                                                                              (query_id(search_params), 0)]
+
+    asyncio.run(scenario())
+
+
+def test_searches_differing_in_price_share_one_page_load(make_app):
+    app = make_app([
+        Listing("1", "Herman Miller Aeron", 300),
+        Listing("2", "Ikea chair - broken", 150),
+        Listing("3", "Steelcase Leap", 600),
+    ])
+
+    async def scenario():
+        await app.db.add_subscription("b@example.com", "Chair", "vancouver", 0, 200)
+        assert await app.run_search_cycle(force=True)
+
+        [fetch_params] = app.scraper.fetched[0]
+        assert (fetch_params['min_price'], fetch_params['max_price']) == (0, 500)
+        # The owner's rules only hold back what no subscriber in range wants enriched
+        [group_filter] = app.scraper.rules
+        assert group_filter.matches(Listing("1", "Herman Miller Aeron", 300))
+        assert group_filter.matches(Listing("2", "Ikea chair - broken", 150))
+        assert not group_filter.matches(Listing("4", "Ikea chair - broken", 300))
+        assert not group_filter.matches(Listing("3", "Steelcase Leap", 600))
+
+        notifications = await app.db.get_due_notifications()
+        assert keys(notifications) == ["digest:b@example.com", "item:1:a@example.com"]
+        assert await app.db.existing_ids({"1", "2", "3"}) == {"1", "2"}
+        assert app.terminal.status == "Search completed, found 3 items (2 new)"
+
+    asyncio.run(scenario())
+
+
+def test_each_search_of_a_cycle_is_observed_by_the_scheduler(make_app):
+    app = make_app([Listing("1", "Herman Miller Aeron", 300)])
+    owner_id = query_id(app.scraper.search_params)
+
+    async def scenario():
+        subscription_id = await app.db.add_subscription("b@example.com", "chair", "Vancouver", 0, 200)
+        assert await app.run_search_cycle(force=True)
+        assert set(app.scheduler.rates) == {owner_id, query_id((await app.db.get_subscriptions())[0])}
+        assert app.scheduler.due(app.planned_queries) == []
+
+        # Nothing new turns up the second time, so the owner's search is spaced out as far as allowed
+        await app.db.remove_subscription(subscription_id)
+        assert await app.run_search_cycle(force=True)
+        assert app.scheduler.interval(app.scraper.search_params) == app.scheduler.max_interval
+
+    asyncio.run(scenario())
+
+
+def test_the_owners_deal_threshold_does_not_hold_back_subscribers(make_app):
+    app = make_app()
+    search_params = app.scraper.search_params
+    app.deal_scorer = DealScorer(app.db, max_percentile=50, min_samples=5)
+
+    async def scenario():
+        await app.deal_scorer.observe(search_params, [100, 110, 120, 130, 140])
+        await app.db.add_subscription("b@example.com", "chair", "Vancouver", 0, 500)
+        subscriptions = SubscriptionIndex(await app.db.get_subscriptions())
+        results = [Listing("1", "Herman Miller Aeron", 300), Listing("2", "Steelcase Leap", 50)]
+
+        assert await app.process_search_results(results, search_params, subscriptions) == 2
+
+        notifications = await app.db.get_due_notifications()
+        assert keys(notifications) == ["digest:b@example.com", "item:2:a@example.com"]
+        assert "Herman Miller Aeron" in next(row['body'] for row in notifications if row['recipient'] == "b@example.com")
+
+    asyncio.run(scenario())
+
+
+def test_an_unexpected_error_stops_searching_and_tells_the_owner(make_app, main):
+    app = make_app(error=TimeoutError("Navigation timed out"))
+
+    async def scenario():
+        # A timeout leaves searching on and the search due again
+        assert not await app.run_search_cycle(force=True)
+        assert app.config.is_active()
+        history = await app.db.get_search_history(datetime.now() - timedelta(hours=1))
+        assert [status for *_, status in history] == ["timeout"]
+
+        app.scraper.error = RuntimeError("Unexpected login page")
+        assert not await app.run_search_cycle(force=True)
+        assert not main.ConfigManager().is_active()
+        [notification] = await app.db.get_due_notifications()
+        assert notification['idempotency_key'].startswith("error:")
+        assert notification['recipient'] == "a@example.com"
+        assert "Unexpected login page" in notification['body']
+        assert app.terminal.status == "ERROR: Unexpected login page"
+
+        assert not await app.run_search_cycle(force=True)
+        assert len(app.scraper.fetched) == 2
+
+    asyncio.run(scenario())
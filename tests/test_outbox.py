@@ -0,0 +1,110 @@
+"""Tests for the notification outbox."""
+import asyncio
+
+from async_database import AsyncDatabase
+from database import DatabaseManager
+from dispatcher import EmailBackend, NotificationDispatcher
+from outbox import OutboxSender
+
+
+class FakeNotifier:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.sent = []
+
+    def send_message(self, recipient, subject, message_text, message_id=None):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("SMTP unavailable")
+        self.sent.append((recipient, subject, message_id))
+
+
+def make_sender(tmp_path, notifier, **kwargs):
+    db = AsyncDatabase(str(tmp_path / "test.db"))
+    dispatcher = NotificationDispatcher([EmailBackend(notifier)])
+    return db, OutboxSender(db, dispatcher, base_delay=0, per_recipient_interval=0, **kwargs)
+
+
+def query(tmp_path, sql):
+    db = DatabaseManager(str(tmp_path / "test.db"), read_only=True)
+    db.cursor.execute(sql)
+    row = db.cursor.fetchone()
+    db.close()
+    return row
+
+
+def test_listings_and_notifications_commit_together(tmp_path):
+    db, sender = make_sender(tmp_path, FakeNotifier())
+    items = [("1", "Chair", 100, "https://example.com/1", "Vancouver")]
+
+    assert asyncio.run(db.add_items_with_notifications(items, [("item:1:a", "a@example.com", "Found: Chair", "body")]))
+    # Same idempotency key again is ignored, and the duplicate listing does not fail the batch
+    assert asyncio.run(db.add_items_with_notifications(items, [("item:1:a", "a@example.com", "Found: Chair", "body")]))
+
+    assert asyncio.run(db.item_exists("1"))
+    assert asyncio.run(db.get_outbox_counts()) == {'pending': 1}
+    assert asyncio.run(sender.drain_once()) == 1
+    assert asyncio.run(db.get_outbox_counts()) == {'sent': 1}
+    assert sender.dispatcher.backends['email'].email.sent[0][2].startswith("<")
+    db.close()
+
+
+def test_failed_sends_are_retried_then_given_up(tmp_path):
+    db, sender = make_sender(tmp_path, FakeNotifier(failures=5), max_attempts=3)
+    asyncio.run(db.enqueue_notifications([("error:1", "a@example.com", "ERROR", "body")]))
+
+    for _ in range(3):
+        assert asyncio.run(sender.drain_once()) == 0
+
+    assert asyncio.run(db.get_outbox_counts()) == {'failed': 1}
+    assert query(tmp_path, "SELECT attempts, last_error FROM outbox") == (3, "email: SMTP unavailable")
+    db.close()
+
+
+def test_per_recipient_rate_limit_defers_without_using_attempts(tmp_path):
+    db, sender = make_sender(tmp_path, FakeNotifier())
+    sender.per_recipient_interval = 60
+    asyncio.run(db.enqueue_notifications([
+        ("item:1:a", "a@example.com", "one", "body"),
+        ("item:2:a", "a@example.com", "two", "body"),
+        ("item:3:b", "b@example.com", "three", "body"),
+    ]))
+
+    assert asyncio.run(sender.drain_once()) == 2
+    assert [subject for _, subject, _ in sender.dispatcher.backends['email'].email.sent] == ["one", "three"]
+    assert query(tmp_path, "SELECT status, attempts FROM outbox WHERE idempotency_key = 'item:2:a'") == ('pending', 0)
+    db.close()
+
+
+class FailingBackend:
+    name = "webhook"
+    addressed = False
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    async def deliver(self, alert):
+        self.calls += 1
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("HTTP 503")
+
+    def close(self):
+        pass
+
+
+def test_retries_only_go_to_backends_that_failed(tmp_path):
+    notifier = FakeNotifier()
+    webhook = FailingBackend(failures=1)
+    db = AsyncDatabase(str(tmp_path / "test.db"))
+    sender = OutboxSender(db, NotificationDispatcher([EmailBackend(notifier), webhook], owner="a@example.com"), base_delay=0, per_recipient_interval=0)
+    asyncio.run(db.enqueue_notifications([("item:1:a", "a@example.com", "one", "body")]))
+
+    assert asyncio.run(sender.drain_once()) == 0
+    assert asyncio.run(sender.drain_once()) == 1
+
+    assert len(notifier.sent) == 1
+    assert webhook.calls == 2
+    assert query(tmp_path, "SELECT status, delivered_to FROM outbox") == ('sent', "email,webhook")
+    db.close()
@@ -0,0 +1,41 @@
+"""Tests for thumbnail hash lookups."""
+import random
+
+from listing import Listing
+from phash import HammingIndex, ImageRepostDetector, from_signed64, to_signed64
+
+
+def test_hamming_index_finds_hashes_within_distance():
+    rng = random.Random(0)
+    index = HammingIndex(max_distance=4)
+    for i in range(1000):
+        index.add(str(i), rng.getrandbits(64))
+    target = rng.getrandbits(64)
+    index.add("near", target ^ 0b1011)  # 3 bits away
+    index.add("far", target ^ 0b111111)  # 6 bits away
+
+    matches = index.search(target)
+
+    assert (3, "near") in matches
+    assert all(item_id != "far" for _, item_id in matches)
+    assert all(distance <= 4 for distance, _ in matches)
+
+
+def test_signed64_round_trip():
+    for value in (0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1):
+        assert -(1 << 63) <= to_signed64(value) < (1 << 63)
+        assert from_signed64(to_signed64(value)) == value
+
+
+def test_batch_thumbnails_are_matched_before_they_are_indexed():
+    detector = ImageRepostDetector(None, max_distance=4, workers=1)
+    first, second = Listing("1"), Listing("2")
+    first.phash, second.phash = 0b1111 << 40, (0b1111 << 40) ^ 0b11
+
+    try:
+        assert detector.find_repost(second) is None
+        assert detector.find_repost(second, [first]) == "1"
+        detector.remember([first])
+        assert detector.find_repost(second) == "1"
+    finally:
+        detector.close()
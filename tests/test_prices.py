@@ -0,0 +1,58 @@
+"""Tests for price-change tracking."""
+from database import DatabaseManager
+from listing import Listing, ListingBatch
+from prices import PriceTracker
+
+
+def test_only_changed_prices_of_stored_listings_are_reported():
+    tracker = PriceTracker(None, drop_alert_percent=10)
+    tracker.remember(ListingBatch([Listing("1", "Aeron", 400.0), Listing("2", "Leap", 200.0)]))
+
+    changes = tracker.changes([
+        Listing("1", price=340.0),
+        Listing("1", price=340.0),
+        Listing("2", price=200.0),
+        Listing("3", price=50.0),
+        Listing("2", price=0),
+    ])
+
+    assert [(item.id, old_price) for item, old_price in changes] == [("1", 400.0)]
+    assert tracker.is_drop(400.0, 340.0)
+    assert not tracker.is_drop(400.0, 380.0)
+    assert not tracker.is_drop(400.0, 450.0)
+    # Nothing is remembered until the change is stored, so another query still sees it
+    assert [item.id for item, _ in tracker.changes([Listing("1", price=340.0)])] == ["1"]
+    tracker.apply(changes)
+    assert tracker.changes([Listing("1", price=340.0)]) == []
+
+
+def test_last_prices_follow_the_recorded_history(tmp_path):
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    db.add_item("1", "Aeron", 400, "https://example.com/1", "Vancouver")
+    db.add_item("2", "Leap", 200, "https://example.com/2", "Vancouver")
+
+    assert db.record_price_changes([("1", 350)], [("drop:1:350:a@example.com", "a@example.com", "Drop", "Body")])
+    db.record_price_changes([("1", 300)])
+
+    assert dict(db.get_last_prices()) == {"1": 300, "2": 200}
+    assert {row['id']: row['price'] for row in db.get_listings_page(limit=10)} == {"1": 300, "2": 200}
+    db.cursor.execute("SELECT price FROM price_history WHERE id = '1' ORDER BY seen_at")
+    # The price it was first stored with survives both changes
+    assert [row[0] for row in db.cursor.fetchall()] == [400, 350, 300]
+    assert db.get_outbox_counts() == {'pending': 1}
+    db.close()
+
+
+def test_listings_stored_before_first_prices_were_recorded_keep_their_original(tmp_path):
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    assert db.add_items_with_notifications([("1", "Aeron", 400, "https://example.com/1", "Vancouver")], [])
+    db.add_item("2", "Leap", 200, "https://example.com/2", "Vancouver")
+    db.cursor.execute("DELETE FROM price_history WHERE id = '2'")
+    db.conn.commit()
+
+    db.record_price_changes([("1", 350), ("2", 150)])
+    db.record_price_changes([("2", 120)])
+
+    db.cursor.execute("SELECT id, price FROM price_history ORDER BY id, seen_at")
+    assert db.cursor.fetchall() == [("1", 400), ("1", 350), ("2", 200), ("2", 150), ("2", 120)]
+    db.close()
@@ -0,0 +1,48 @@
+"""Tests for price quantile sketches and deal scoring."""
+import asyncio
+import random
+
+from async_database import AsyncDatabase
+from quantiles import DealScorer, KLLSketch
+
+QUERY = {'keywords': "office chair", 'location': "vancouver", 'min_price': 0, 'max_price': 0}
+
+
+def test_sketch_ranks_stay_accurate_in_bounded_space():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(5, 1) for _ in range(100000)]
+    sketch = KLLSketch(k=200)
+    for value in values:
+        sketch.update(value)
+
+    ordered = sorted(values)
+    for fraction in (0.05, 0.1, 0.5, 0.9):
+        assert abs(sketch.rank(ordered[int(fraction * len(ordered))]) - fraction) < 0.02
+    assert sum(map(len, sketch.levels)) < 1000
+    assert len(sketch) == 100000
+
+    restored = KLLSketch.from_bytes(sketch.to_bytes())
+    assert restored.levels == sketch.levels and len(restored) == len(sketch)
+    assert restored.quantile(0.5) == sketch.quantile(0.5)
+
+
+def test_only_bottom_percentile_listings_are_deals_once_history_exists(tmp_path):
+    db = AsyncDatabase(str(tmp_path / "test.db"))
+    scorer = DealScorer(db, max_percentile=10, min_samples=50)
+
+    async def scenario():
+        assert scorer.percentile(QUERY, 100) is None
+        await scorer.observe(QUERY, range(1, 101))
+
+        assert scorer.percentile(QUERY, 5) < 10
+        assert scorer.percentile(QUERY, 80) > 70
+        assert scorer.is_deal(scorer.percentile(QUERY, 5))
+        assert not scorer.is_deal(scorer.percentile(QUERY, 80))
+        assert scorer.is_deal(scorer.percentile({**QUERY, 'keywords': "desk"}, 80))
+
+        reloaded = DealScorer(db, max_percentile=10, min_samples=50)
+        await reloaded.load()
+        assert reloaded.percentile(QUERY, 80) == scorer.percentile(QUERY, 80)
+
+    asyncio.run(scenario())
+    db.close()
@@ -0,0 +1,86 @@
+"""Tests for retention pruning and archiving."""
+import asyncio
+from datetime import datetime, timedelta
+
+from async_database import AsyncDatabase
+from database import DatabaseManager
+from retention import RetentionJob, iter_archived_rows
+
+
+def test_old_rows_are_pruned_in_batches_and_archived(tmp_path):
+    path = str(tmp_path / "test.db")
+    archive_path = str(tmp_path / "archive.db")
+    old = datetime.now() - timedelta(days=100)
+    db = DatabaseManager(path)
+    for i in range(25):
+        db.add_item(str(i), f"Chair {i}", 10 * i, f"https://example.com/{i}", "Vancouver")
+        db.log_search("chair", 1, 1)
+    db.save_listing_details("3", {'description': "Old chair"})
+    db.cursor.execute("UPDATE listings SET discovered_at = ? WHERE CAST(id AS INTEGER) < 20", (old,))
+    db.cursor.execute("UPDATE searches SET timestamp = ? WHERE id <= 15", (old,))
+    db.enqueue_notifications([("pending", "a@example.com", "Subject", "Body")])
+    db.cursor.execute("UPDATE outbox SET created_at = ?", (old,))
+    db.conn.commit()
+    db.cursor.execute("PRAGMA auto_vacuum")
+    assert db.cursor.fetchone()[0] == 2
+    db.close()
+
+    db = AsyncDatabase(path)
+    job = RetentionJob(db, {'listings': 30, 'searches': 30, 'outbox': 30}, batch_size=8, batch_pause=0,
+                       archive_path=archive_path)
+
+    async def scenario():
+        assert await job.run_once() == {'listings': 20, 'searches': 15, 'outbox': 0}
+        assert await job.run_once() == {'listings': 0, 'searches': 0, 'outbox': 0}
+        rows = await db.get_listings_page(limit=50)
+        assert sorted(int(row['id']) for row in rows) == list(range(20, 25))
+        assert await db.get_listing_details(["3"]) == {}
+        assert len(await db.get_search_history(datetime.min)) == 10
+        assert await db.get_outbox_counts() == {'pending': 1}
+
+    asyncio.run(scenario())
+    db.close()
+
+    archived = list(iter_archived_rows(archive_path, 'listings'))
+    assert sorted(int(row['id']) for row in archived) == list(range(20))
+    assert archived[0]['title'].startswith("Chair")
+    assert len(list(iter_archived_rows(archive_path, 'searches'))) == 15
+
+
+def test_listings_still_shown_are_kept_and_a_retried_batch_is_archived_once(tmp_path):
+    archive_path = str(tmp_path / "archive.db")
+    old = datetime.now() - timedelta(days=100)
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    for i in range(4):
+        db.add_item(str(i), f"Chair {i}", 10 * i, f"https://example.com/{i}", "Vancouver")
+    db.cursor.execute("UPDATE listings SET discovered_at = ?", (old,))
+    db.conn.commit()
+    db.mark_listings_seen(["1"], datetime.now())
+    cutoff = datetime.now() - timedelta(days=30)
+
+    db.cursor.execute("CREATE TRIGGER block DELETE ON listings BEGIN SELECT RAISE(ABORT, 'locked'); END")
+    assert db.prune_rows('listings', cutoff, archive_path=archive_path) == 0
+    db.cursor.execute("DROP TRIGGER block")
+    assert db.prune_rows('listings', cutoff, archive_path=archive_path) == 3
+    assert [row['id'] for row in db.get_listings_page(limit=10)] == ["1"]
+    db.close()
+
+    archived = list(iter_archived_rows(archive_path, 'listings'))
+    assert sorted(row['id'] for row in archived) == ["0", "2", "3"]
+
+
+def test_existing_databases_are_switched_to_incremental_vacuum(tmp_path):
+    path = str(tmp_path / "test.db")
+    db = DatabaseManager(path)
+    db.add_item("1", "Steelcase Leap", 300, "https://example.com/1", "Vancouver")
+    db.cursor.execute("PRAGMA auto_vacuum = NONE")
+    db.cursor.execute("VACUUM")
+    db.cursor.execute("PRAGMA auto_vacuum")
+    assert db.cursor.fetchone()[0] == 0
+    db.close()
+
+    db = DatabaseManager(path)
+    db.cursor.execute("PRAGMA auto_vacuum")
+    assert db.cursor.fetchone()[0] == 2
+    assert [row['id'] for row in db.search_listings("leap")] == ["1"]
+    db.close()
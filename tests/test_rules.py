@@ -0,0 +1,47 @@
+"""Tests for listing filter rules."""
+import pytest
+
+from listing import Listing
+from rules import RuleSet
+
+
+def item(title, price=100):
+    return Listing("1", title, price)
+
+
+def test_exclude_keywords_and_phrases():
+    rules = RuleSet.from_mapping({'exclude': "broken, parts only, wanted"})
+
+    assert rules.matches(item("Aeron chair, great shape"))
+    assert not rules.matches(item("Aeron chair - BROKEN arm"))
+    assert not rules.matches(item("Aeron chair for parts only"))
+    assert rules.matches(item("Aeron chair, only used for parts of the day"))
+
+
+def test_include_regex_price_bands_and_title_length():
+    rules = RuleSet.from_mapping({
+        'include': "aeron, embody",
+        'exclude_regex': "\\bsize\\s*a\\b\n^iso\\b",
+        'price_bands': "50-200, 400-",
+        'min_title_length': "8"
+    })
+
+    assert rules.matches(item("Herman Miller Aeron", 150))
+    assert rules.matches(item("Herman Miller Embody", 900))
+    assert not rules.matches(item("Herman Miller Aeron", 300))
+    assert not rules.matches(item("Herman Miller Aeron size A", 150))
+    assert not rules.matches(item("ISO Aeron chair", 150))
+    assert not rules.matches(item("Aeron", 150))
+    assert not rules.matches(item("Steelcase Leap", 150))
+
+
+def test_empty_rules_keep_everything():
+    items = [item("anything"), item("")]
+    assert RuleSet().filter(items) is items
+
+
+def test_invalid_rules_raise_value_error():
+    with pytest.raises(ValueError):
+        RuleSet.from_mapping({'exclude_regex': "(unclosed"})
+    with pytest.raises(ValueError):
+        RuleSet.from_mapping({'price_bands': "cheap-expensive"})
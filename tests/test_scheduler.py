@@ -0,0 +1,78 @@
+"""Tests for adaptive search scheduling."""
+import asyncio
+from datetime import datetime, timedelta
+
+from async_database import AsyncDatabase
+from database import DatabaseManager
+from scheduler import AdaptiveScheduler
+from subscriptions import query_id
+
+BUSY = {'keywords': "road bike", 'location': "vancouver"}
+QUIET = {'keywords': "theremin", 'location': "vancouver"}
+
+
+def feed(scheduler, search_params, start, runs, minutes_apart, new_items):
+    for i in range(runs):
+        scheduler.observe(query_id(search_params), start + timedelta(minutes=minutes_apart * i), new_items)
+
+
+def test_busy_searches_run_sooner_than_quiet_ones_within_bounds():
+    scheduler = AdaptiveScheduler(base_interval=15, min_interval=5, max_interval=60, target_new_per_run=1)
+    start = datetime(2024, 5, 1, 12, 0)
+    feed(scheduler, BUSY, start, 8, 15, 6)
+    feed(scheduler, QUIET, start, 8, 15, 0)
+    now = start + timedelta(hours=2)
+
+    assert scheduler.interval(BUSY, now) == 5
+    assert scheduler.interval(QUIET, now) == 60
+    assert scheduler.interval({'keywords': "never searched"}, now) == 15
+    # 1 new listing every 30 minutes on average
+    feed(scheduler, {'keywords': "desk"}, start, 8, 15, 0.5)
+    assert 25 < scheduler.interval({'keywords': "desk"}, now) < 35
+
+
+def test_rates_are_kept_per_time_of_day():
+    scheduler = AdaptiveScheduler(min_interval=1, max_interval=240, bucket_hours=6)
+    night, day = datetime(2024, 5, 1, 2, 0), datetime(2024, 5, 1, 14, 0)
+    feed(scheduler, BUSY, night, 6, 30, 0.25)
+    feed(scheduler, BUSY, day, 6, 30, 4)
+
+    assert scheduler.interval(BUSY, night + timedelta(days=1)) > scheduler.interval(BUSY, day + timedelta(days=1))
+
+
+def test_due_searches_and_next_run_time():
+    scheduler = AdaptiveScheduler(jitter_minutes=0, adaptive=False, base_interval=15)
+    now = datetime(2024, 5, 1, 12, 0)
+
+    assert scheduler.due([BUSY, QUIET], now) == [BUSY, QUIET]
+    scheduler.schedule(BUSY, now)
+    assert scheduler.due([BUSY, QUIET], now + timedelta(minutes=1)) == [QUIET]
+    scheduler.schedule(QUIET, now + timedelta(minutes=5))
+    assert scheduler.next_run_time([BUSY, QUIET], now) == now + timedelta(minutes=15)
+
+
+def test_queries_sharing_keywords_keep_their_own_rates(tmp_path):
+    cheap = {'keywords': "road bike", 'location': "vancouver", 'max_price': 500}
+    pricey = {'keywords': "road bike", 'location': "vancouver", 'min_price': 500}
+    start = datetime(2024, 5, 1, 12, 0)
+    scheduler = AdaptiveScheduler(min_interval=5, max_interval=120, target_new_per_run=1)
+    # Coalesced members finish a few milliseconds apart, one new listing an hour each
+    for hour in range(6):
+        now = start + timedelta(hours=hour)
+        scheduler.observe(query_id(cheap), now, 1)
+        scheduler.observe(query_id(pricey), now + timedelta(milliseconds=3), 1)
+
+    assert round(scheduler.interval(cheap, start)) == round(scheduler.interval(pricey, start)) == 60
+
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    db.log_search("road bike", 1, 1, query_id=query_id(cheap))
+    db.log_search("road bike", 1, 1, query_id=query_id(pricey))
+    # Logged before query IDs were recorded
+    db.log_search("road bike", 1, 1)
+    db.close()
+    db = AsyncDatabase(str(tmp_path / "test.db"))
+    replayed = AdaptiveScheduler()
+    asyncio.run(replayed.load(db))
+    db.close()
+
+    assert set(replayed.rates) == {query_id(cheap), query_id(pricey)}
@@ -0,0 +1,92 @@
+"""Tests for removed-listing detection."""
+import asyncio
+from array import array
+
+from async_database import AsyncDatabase
+from listing import Listing
+from snapshots import RemovalTracker, diff_snapshot
+
+QUERY = {'keywords': "office chair", 'location': "vancouver", 'min_price': 0, 'max_price': 0}
+
+
+def test_diff_counts_misses_and_drops_listings_gone_long_enough():
+    tracked, misses = array('Q', [1, 3, 5, 7]), array('B', [0, 1, 0, 0])
+
+    tracked, misses, removed, appeared = diff_snapshot(tracked, misses, [2, 5, 7, 9], missing_cycles=2)
+
+    assert list(tracked) == [1, 2, 5, 7, 9]
+    assert list(misses) == [1, 0, 0, 0, 0]
+    assert removed == [3]
+    assert appeared == [2, 9]
+
+
+def test_ids_still_on_the_page_or_possibly_pushed_off_it_are_not_missed():
+    tracked, misses = array('Q', [1, 3, 5, 7]), array('B', [1, 1, 1, 0])
+
+    # 3 is on the page outside this query's price range; 1 is older than anything a full page showed
+    tracked, misses, removed, appeared = diff_snapshot(tracked, misses, [5], missing_cycles=2, floor=2,
+                                                       present={3, 5})
+
+    assert list(tracked) == [1, 3, 5, 7]
+    assert list(misses) == [1, 0, 0, 1]
+    assert removed == [] and appeared == []
+
+
+def test_listings_missing_for_several_cycles_are_marked_removed(tmp_path):
+    db = AsyncDatabase(str(tmp_path / "test.db"))
+    tracker = RemovalTracker(db, missing_cycles=2)
+
+    def results(*ids):
+        return [Listing(str(item_id)) for item_id in ids]
+
+    async def removed_at(item_id):
+        rows = await db.get_listings_page(limit=10)
+        return {row['id']: row['removed_at'] for row in rows}[item_id]
+
+    async def scenario():
+        for item_id in ("101", "102"):
+            await db.add_item(item_id, "Chair", 50, f"https://example.com/{item_id}", "Vancouver")
+
+        await tracker.observe(QUERY, results(101, 102))
+        await tracker.observe(QUERY, results(101))
+        await tracker.observe(QUERY, [])
+        assert await removed_at("102") is None
+        assert await tracker.observe(QUERY, results(101)) == (["102"], [])
+        assert await removed_at("102") is not None
+        assert await removed_at("101") is None
+
+        # A fresh tracker picks up the stored snapshot, and a listing that returns is no longer removed
+        restarted = RemovalTracker(db, missing_cycles=2)
+        assert await restarted.observe(QUERY, results(101, 102)) == ([], ["102"])
+        assert await removed_at("102") is None
+
+    asyncio.run(scenario())
+    db.close()
+
+
+def test_a_listing_another_query_still_shows_is_not_removed(tmp_path):
+    db = AsyncDatabase(str(tmp_path / "test.db"))
+    tracker = RemovalTracker(db, missing_cycles=1)
+    other_query = dict(QUERY, keywords="desk chair")
+
+    async def removed_at(item_id):
+        rows = await db.get_listings_page(limit=10)
+        return {row['id']: row['removed_at'] for row in rows}[item_id]
+
+    async def scenario():
+        for item_id in ("101", "102"):
+            await db.add_item(item_id, "Chair", 50, f"https://example.com/{item_id}", "Vancouver")
+
+        await tracker.observe(QUERY, [Listing("101"), Listing("102")])
+        await tracker.observe(other_query, [Listing("102")])
+        assert await tracker.observe(QUERY, [Listing("101")]) == (["102"], [])
+        assert await removed_at("102") is None
+
+        await tracker.observe(other_query, [Listing("101")])
+        assert await removed_at("102") is not None
+        # Seen by any query again, it is live again
+        await tracker.observe(dict(QUERY, keywords="office"), [Listing("102")])
+        assert await removed_at("102") is None
+
+    asyncio.run(scenario())
+    db.close()
@@ -0,0 +1,96 @@
+"""Tests for subscription matching."""
+import json
+
+from database import DatabaseManager
+from listing import Listing
+from rules import RuleSet
+from subscriptions import GroupFilter, SubscriptionIndex, coalesce_queries, in_price_range, query_key
+
+
+def subscription(subscription_id, recipient, keywords="office chair", rules=None, **query):
+    return {
+        'id': subscription_id, 'recipient': recipient, 'keywords': keywords,
+        'location': query.get('location', "Vancouver"), 'min_price': query.get('min_price', 0),
+        'max_price': query.get('max_price', 500), 'rules': json.dumps(rules or {})
+    }
+
+
+def test_matches_are_grouped_by_recipient_and_query():
+    index = SubscriptionIndex([
+        subscription(1, "a@example.com", rules={'include': "aeron"}),
+        subscription(2, "b@example.com", rules={'include': "leap, aeron", 'exclude': "broken"}),
+        subscription(3, "c@example.com"),
+        subscription(4, "d@example.com", keywords="bike"),
+    ])
+    items = [
+        Listing("1", "Herman Miller Aeron", 300),
+        Listing("2", "Steelcase Leap - broken arm", 100),
+    ]
+
+    matches = index.match(subscription(0, "", "Office Chair"), items)
+
+    assert [item.id for item in matches["a@example.com"]] == ["1"]
+    assert [item.id for item in matches["b@example.com"]] == ["1"]
+    assert [item.id for item in matches["c@example.com"]] == ["1", "2"]
+    assert "d@example.com" not in matches
+    assert len(index.queries) == 2
+
+
+def test_many_subscriptions_only_check_sharing_tokens():
+    subscriptions = [subscription(i, f"user{i}@example.com", rules={'include': f"model{i}"}) for i in range(5000)]
+    index = SubscriptionIndex(subscriptions)
+
+    matches = index.match(subscriptions[0], [Listing("1", "Chair model42 mint", 10)])
+
+    assert list(matches) == ["user42@example.com"]
+
+
+def test_subscriptions_are_stored_in_database(tmp_path):
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    subscription_id = db.add_subscription("a@example.com", "Office Chair", "Vancouver", 0, 500, '{"exclude": "broken"}')
+    db.add_subscription("b@example.com", "office chair ", "vancouver", 0, 500)
+
+    stored = db.get_subscriptions()
+    index = SubscriptionIndex(stored)
+
+    assert len(stored) == 2
+    assert list(index.queries) == [query_key(stored[0])]
+    db.remove_subscription(subscription_id)
+    assert len(db.get_subscriptions()) == 1
+    db.close()
+
+
+def test_queries_sharing_keywords_and_location_are_fetched_once():
+    cheap = subscription(1, "a@example.com", max_price=200)
+    pricey = subscription(2, "b@example.com", keywords="Office Chair ", min_price=300, max_price=900)
+    elsewhere = subscription(3, "c@example.com", location="Burnaby")
+
+    plan = coalesce_queries([cheap, pricey, elsewhere])
+
+    assert len(plan) == 2
+    fetch_params, members = plan[0]
+    assert members == [cheap, pricey]
+    assert (fetch_params['min_price'], fetch_params['max_price']) == (0, 900)
+    assert plan[1] == (elsewhere, [elsewhere])
+
+    unbounded = subscription(4, "d@example.com", min_price=100, max_price=0)
+    assert coalesce_queries([pricey, unbounded])[0][0]['max_price'] == 0
+
+    assert in_price_range(Listing("1", price=150), cheap)
+    assert not in_price_range(Listing("1", price=250), cheap)
+    assert not in_price_range(Listing("1", price=250), pricey)
+    assert in_price_range(Listing("1", price=5000), unbounded)
+
+
+def test_a_coalesced_page_is_enriched_for_each_members_own_wants():
+    owner = {'keywords': "office chair", 'location': "Vancouver", 'min_price': 0, 'max_price': 500}
+    subscribed = subscription(1, "a@example.com", min_price=400, max_price=900)
+    fetch_params, members = coalesce_queries([dict(owner), subscribed])[0]
+    assert fetch_params is not members[0]
+
+    wanted = GroupFilter(members, query_key(owner), RuleSet.from_mapping({'include': "aeron"}))
+
+    assert wanted.matches(Listing("1", "Herman Miller Aeron", 300))
+    assert not wanted.matches(Listing("1", "Ikea Markus", 300))
+    assert wanted.matches(Listing("1", "Ikea Markus", 450))
+    assert not wanted.matches(Listing("1", "Herman Miller Aeron", 1000))